@@ -0,0 +1,246 @@
+import os
+import sys
+import json
+import socket
+import tempfile
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ipc.fake import FakeHyprlandServer
+
+
+RESOLUTIONS = {
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+    "8k": (7680, 4320),
+}
+
+FAKE_GRIM = """#!{python}
+# Fake grim: writes the pre-generated frame for the requested output.
+import sys
+args = sys.argv[1:]
+output = args[args.index("-o") + 1] if "-o" in args else "{default_output}"
+with open("{frames_dir}/" + output + ".ppm", "rb") as f:
+    sys.stdout.buffer.write(f.read())
+"""
+
+FAKE_HYPRCTL = """#!{python}
+# Fake hyprctl: prints canned JSON replies.
+import sys
+with open("{replies_path}") as f:
+    replies = __import__("json").load(f)
+print(__import__("json").dumps(replies[sys.argv[1]]))
+"""
+
+
+def synthetic_frame(width, height):
+    """
+    Returns PPM bytes that look vaguely like a desktop: large flat areas,
+    gradient bars and bands of high-entropy "text", so encoders see a
+    realistic mix rather than a solid colour or pure noise.
+    """
+    stride = width * 3
+    noise = os.urandom(stride)
+    flat = bytes((40, 44, 52)) * width
+    gradient = bytes(value for x in range(width) for value in (x * 255 // width, 128, 255 - x * 255 // width))
+    # Text rows: mostly background with noisy glyph-sized runs.
+    text = bytearray(flat)
+    for start in range(0, stride, 96):
+        text[start:start + 30] = noise[start:start + 30]
+    rows = [flat] * 6 + [bytes(text)] * 2 + [gradient]
+
+    header = f"P6\n{width} {height}\n255\n".encode()
+    return header + b"".join(rows[(y // 12) % len(rows)] for y in range(height))
+
+
+class FakeDesktop:
+    """
+    A fake Hyprland session for benchmarks and tests: fake grim and hyprctl
+    executables on PATH, a fake Hyprland IPC socket, and synthetic frames
+    for each monitor.
+
+    Usage:
+        with FakeDesktop("4k", monitors=2) as desktop:
+            ...
+    """
+
+    def __init__(self, resolution="1080p", monitors=1):
+        self.width, self.height = RESOLUTIONS[resolution]
+        self.monitors = {
+            f"FAKE-{index + 1}": (index * self.width, 0, self.width, self.height)
+            for index in range(monitors)
+        }
+        self.active_monitor = next(iter(self.monitors))
+
+        self._tmp_dir = None
+        self._server = None
+        self._saved_env = {}
+
+    @property
+    def replies(self):
+        return {
+            "activeworkspace": {"id": 1, "monitor": self.active_monitor},
+            "monitors": [
+                {"name": name, "x": x, "y": y, "width": width, "height": height, "scale": 1.0,
+                 "focused": name == self.active_monitor, "activeWorkspace": {"id": index + 1},
+                 "specialWorkspace": {"id": 0}}
+                for index, (name, (x, y, width, height)) in enumerate(self.monitors.items())
+            ],
+            "clients": self.clients,
+        }
+
+    @property
+    def clients(self):
+        """
+        A tiled two-column layout per monitor plus a few overlapping
+        floating windows, like a busy desktop.
+        """
+        clients = []
+        for index, (x, y, width, height) in enumerate(self.monitors.values()):
+            workspace = {"id": index + 1}
+            half = width // 2
+            for column in range(2):
+                clients.append({"at": [x + column * half + 10, y + 10], "size": [half - 20, height - 20],
+                                "workspace": workspace, "floating": False})
+            for step in range(4):
+                clients.append({"at": [x + width // 5 + step * 60, y + height // 5 + step * 40],
+                                "size": [width // 3, height // 3], "workspace": workspace, "floating": True})
+        for history, client in enumerate(reversed(clients)):
+            client.update(mapped=True, hidden=False, focusHistoryID=history)
+        return clients
+
+    def __enter__(self):
+        self._tmp_dir = tempfile.TemporaryDirectory(prefix="screen-short-bench-")
+        root = Path(self._tmp_dir.name)
+        frames_dir = root / "frames"
+        bin_dir = root / "bin"
+        frames_dir.mkdir()
+        bin_dir.mkdir()
+
+        frame = synthetic_frame(self.width, self.height)
+        for name in self.monitors:
+            (frames_dir / f"{name}.ppm").write_bytes(frame)
+
+        replies_path = root / "replies.json"
+        replies_path.write_text(json.dumps(self.replies))
+
+        grim_path = bin_dir / "grim"
+        grim_path.write_text(FAKE_GRIM.format(
+            python=sys.executable, frames_dir=frames_dir, default_output=self.active_monitor
+        ))
+        hyprctl_path = bin_dir / "hyprctl"
+        hyprctl_path.write_text(FAKE_HYPRCTL.format(python=sys.executable, replies_path=replies_path))
+        for path in (grim_path, hyprctl_path):
+            path.chmod(0o755)
+
+        self._server = FakeHyprlandServer(self.replies)
+        self._server.start()
+
+        self._set_env("PATH", f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+        self._set_env("SCREEN_SHORT_GRIM", str(grim_path))
+        self.grim_path = grim_path
+        self.socket_path = self._server.socket_path
+        return self
+
+    def __exit__(self, *exc_info):
+        for key, value in self._saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        self._saved_env.clear()
+
+        self._server.stop()
+        self._tmp_dir.cleanup()
+
+    def _set_env(self, key, value):
+        self._saved_env.setdefault(key, os.environ.get(key))
+        os.environ[key] = value
+
+
+class _ImageHostHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep the connection open between uploads.
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body are written separately; without this, Nagle's
+        # algorithm and delayed ACKs add 40 ms to every kept-alive reply.
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.host.connections += 1
+
+    def do_POST(self):
+        host = self.server.host
+        remaining = int(self.headers.get("Content-Length", 0))
+        received = 0
+        while remaining:
+            chunk = self.rfile.read(min(remaining, 64 * 1024))
+            if not chunk:
+                break
+            received += len(chunk)
+            remaining -= len(chunk)
+
+        with host.lock:
+            failing = host.fail_next > 0
+            if failing:
+                host.fail_next -= 1
+            else:
+                host.uploads.append((self.headers.get("X-Filename"), received))
+                number = len(host.uploads)
+
+        if failing:
+            body = b"unavailable"
+            self.send_response(503)
+            self.send_header("Content-Type", "text/plain")
+        else:
+            body = json.dumps({"url": f"{host.url}i/{number}/{self.headers.get('X-Filename')}"}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_PUT = do_POST
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeImageHost:
+    """
+    A local stand-in for an HTTP image host, for testing uploads.
+
+    It accepts POST/PUT uploads, replies with {"url": ...}, and records
+    each upload's file name and size, and how many connections were
+    opened. Setting fail_next makes that many uploads fail with 503.
+
+    Usage:
+        with FakeImageHost() as host:
+            conf["upload"]["url"] = host.url
+    """
+
+    def __init__(self):
+        self.uploads = []
+        self.connections = 0
+        self.fail_next = 0
+        self.lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def __enter__(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _ImageHostHandler)
+        self._server.daemon_threads = True
+        self._server.host = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-image-host", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
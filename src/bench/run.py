@@ -0,0 +1,402 @@
+"""
+Headless benchmarks for the capture, paint and save paths.
+
+Run from the src directory:
+
+    python -m bench.run --resolutions 1080p,4k --output bench.json
+    python -m bench.run --baseline bench.json
+
+Results are written as JSON; with --baseline, every benchmark whose median
+got slower than the baseline by more than --threshold is reported and the
+exit code is 1.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import statistics
+from datetime import datetime
+
+# Must be set before Qt is imported.
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from .fakes import FakeDesktop, FakeImageHost, RESOLUTIONS
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "runs": len(ordered),
+        "min_ms": ordered[0] * 1000,
+        "median_ms": statistics.median(ordered) * 1000,
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def timed(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def default_conf(save_dir):
+    from config.config import get_default_config
+
+    # Benchmarks must not depend on (or create) the user's config file.
+    conf = get_default_config()
+    conf["paths"]["save_dir"] = str(save_dir)
+    conf["behavior"]["copy_to_clipboard"] = False
+    return conf
+
+
+def bench_monitor_query(desktop, repeat):
+    from ipc.hyprland import HyprlandIPC
+
+    # ttl=0 so every run is a real round-trip to the fake socket.
+    client = HyprlandIPC(socket_path=desktop.socket_path, ttl=0)
+    return timed(lambda: client.query("activeworkspace", "monitors"), repeat)
+
+
+def bench_capture(desktop, repeat):
+    from capture.backend import GrimBackend
+
+    backend = GrimBackend(str(desktop.grim_path))
+    return timed(lambda: backend.capture(desktop.active_monitor), repeat)
+
+
+def bench_overlay_init(desktop, conf, frame, repeat):
+    from ui.overlay import ScreenshotOverlay
+
+    overlays = []
+
+    def create():
+        overlays.append(ScreenshotOverlay(frame, conf, persistent=True))
+
+    result = timed(create, repeat)
+    for overlay in overlays:
+        overlay.deleteLater()
+    return result
+
+
+def bench_window_hit_test(desktop, repeat):
+    from utils.utils import get_visible_windows
+    from ui.windows import WindowIndex
+
+    windows, focused = get_visible_windows()
+    x, y, _, _ = desktop.monitors[desktop.active_monitor]
+    index = WindowIndex(windows, x, y, focused)
+
+    def hit_test():
+        for step in range(1000):
+            index.window_at((step * 37) % desktop.width, (step * 53) % desktop.height)
+
+    return timed(hit_test, repeat)
+
+
+def bench_edge_map(frame, repeat):
+    from utils.edges import EdgeMap
+
+    edge_map = EdgeMap.from_frame(frame)
+
+    def snap():
+        for step in range(1000):
+            edge_map.snap((step * 37) % frame.width, (step * 53) % frame.height)
+
+    return {
+        "build": timed(lambda: EdgeMap.from_frame(frame), repeat),
+        "snap_1000": timed(snap, repeat),
+    }
+
+
+def bench_paint_drag(app, conf, frame, moves):
+    """
+    Drags out a selection and then an arrow, repainting after every mouse
+    move, and returns the paint times collected by the overlay itself.
+    """
+    from PySide6.QtCore import QPoint
+    from ui.overlay import ScreenshotOverlay
+
+    overlay = ScreenshotOverlay(frame, conf, persistent=True)
+    overlay.frame_stats.enabled = True
+    overlay.setGeometry(0, 0, frame.width, frame.height)
+    overlay.show()
+    app.processEvents()
+    overlay.frame_stats.durations.clear()
+
+    start = QPoint(frame.width // 8, frame.height // 8)
+    overlay.current_action = 'selecting'
+    overlay.drag_start_position = start
+    for step in range(1, moves + 1):
+        overlay._handle_move(start + QPoint(step * frame.width // (moves * 2), step * frame.height // (moves * 2)))
+        overlay.repaint()
+
+    overlay.current_action = None
+    overlay.drag_start_position = None
+    overlay.set_active_tool('draw_arrow')
+    from ui.annotations import Shape
+    overlay.current_drawing_shape = Shape.from_points('arrow', start, start)
+    overlay.drag_start_position = start
+    for step in range(1, moves + 1):
+        overlay._handle_move(start + QPoint(step * 3, step * 2))
+        overlay.repaint()
+
+    samples = list(overlay.frame_stats.durations)
+    overlay.hide()
+    overlay.deleteLater()
+    return summarize(samples)
+
+
+def many_shapes(count, width, height):
+    from ui.annotations import Shape
+
+    shapes = []
+    for index in range(count):
+        x = (index * 97) % max(1, width - 200)
+        y = (index * 61) % max(1, height - 200)
+        shape_type = ('rect', 'arrow', 'circle')[index % 3]
+        shapes.append(Shape(shape_type, x, y, x + 150, y + 100))
+    return shapes
+
+
+def bench_draw_shapes(conf, width, height, count, repeat):
+    from PySide6.QtCore import QSize
+    from PySide6.QtGui import QImage, QPainter
+    from ui.render import draw_shape, shape_pen
+    from ui.annotations import AnnotationLayer
+
+    shapes = many_shapes(count, width, height)
+    pen = shape_pen(conf)
+    target = QImage(width, height, QImage.Format.Format_ARGB32_Premultiplied)
+
+    def draw_all():
+        painter = QPainter(target)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(pen)
+        for shape in shapes:
+            draw_shape(painter, shape)
+        painter.end()
+
+    layer = AnnotationLayer()
+    for shape in shapes:
+        layer.add(shape)
+    size = QSize(width, height)
+
+    def rebuild_layer():
+        layer._cache_dirty = True
+        layer.cached_pixmap(size, pen)
+
+    def hit_test():
+        for index in range(1000):
+            layer.shape_at((index * 37) % width, (index * 53) % height)
+
+    return {
+        "draw_shape": timed(draw_all, repeat),
+        "layer_rebuild": timed(rebuild_layer, repeat),
+        "hit_test_1000": timed(hit_test, repeat),
+    }
+
+
+def bench_redaction(conf, frame, repeat):
+    """
+    Times painting a quarter-screen pixelate and blur redaction, with the
+    tile cache cold (the first drag over an area) and warm (every frame
+    after that).
+    """
+    from PySide6.QtCore import QRect
+    from PySide6.QtGui import QImage, QPainter, QPixmap
+    from ui.redact import Redactor
+    from ui.render import frame_to_image
+
+    background = QPixmap.fromImage(frame_to_image(frame))
+    area = QRect(frame.width // 4, frame.height // 4, frame.width // 2, frame.height // 2)
+    target = QImage(frame.width, frame.height, QImage.Format.Format_ARGB32_Premultiplied)
+
+    def paint(redactor, kind):
+        painter = QPainter(target)
+        redactor.draw(painter, kind, area)
+        painter.end()
+
+    results = {}
+    for kind in ('pixelate', 'blur'):
+        results[f"{kind}_cold"] = timed(lambda: paint(Redactor(background, conf), kind), repeat)
+        warm = Redactor(background, conf)
+        paint(warm, kind)
+        results[f"{kind}_warm"] = timed(lambda: paint(warm, kind), repeat)
+    return results
+
+
+def bench_export(conf, frame, save_dir, repeat):
+    """
+    Times the stages of capture_and_exit separately: rendering the
+    annotated crop, encoding it and writing it atomically.
+    """
+    from pathlib import Path
+    from PySide6.QtCore import QRect
+    from PySide6.QtGui import QPixmap
+    from ui.render import render_selection, frame_to_image, shape_pen
+    from storage.encoders import get_file_encoder
+    from storage.saver import write_atomic
+
+    background = QPixmap.fromImage(frame_to_image(frame))
+    selection = QRect(frame.width // 8, frame.height // 8, frame.width * 3 // 4, frame.height * 3 // 4)
+    shapes = many_shapes(50, frame.width, frame.height)
+    pen = shape_pen(conf)
+    encoder = get_file_encoder(conf)
+
+    image = render_selection(background, selection, shapes, pen)
+    data = encoder.encode(image)
+    directory = Path(save_dir)
+
+    return {
+        "render": timed(lambda: render_selection(background, selection, shapes, pen), repeat),
+        "encode": timed(lambda: encoder.encode(image), repeat),
+        "write": timed(lambda: write_atomic(directory, "bench", encoder.extension, data), repeat),
+    }
+
+
+def bench_upload(save_dir, repeat):
+    """
+    Times uploading a 1 MB file to a local stand-in host, over a kept
+    connection and over a new connection each time.
+    """
+    from pathlib import Path
+    from storage.upload import ConnectionPool
+
+    path = Path(save_dir) / "upload.png"
+    path.write_bytes(os.urandom(1024 * 1024))
+    headers = {"Content-Type": "image/png", "Content-Length": str(path.stat().st_size), "X-Filename": path.name}
+
+    with FakeImageHost() as host:
+        pool = ConnectionPool()
+        pooled = timed(lambda: pool.send_file("POST", host.url, path, headers), repeat)
+        pool.close()
+
+        def fresh():
+            single = ConnectionPool()
+            single.send_file("POST", host.url, path, headers)
+            single.close()
+        return {"pooled": pooled, "fresh": timed(fresh, repeat)}
+
+
+def run(resolutions, repeat, moves, shape_count):
+    from PySide6 import __version__ as pyside_version
+    from PySide6.QtCore import QEvent
+    from PySide6.QtWidgets import QApplication
+    from capture.backend import GrimBackend
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    results = {}
+    for resolution in resolutions:
+        with FakeDesktop(resolution) as desktop, tempfile.TemporaryDirectory() as save_dir:
+            conf = default_conf(save_dir)
+            frame = GrimBackend(str(desktop.grim_path)).capture(desktop.active_monitor)
+
+            results[resolution] = {
+                "monitor_query": bench_monitor_query(desktop, repeat),
+                "capture": bench_capture(desktop, repeat),
+                "overlay_init": bench_overlay_init(desktop, conf, frame, repeat),
+                "paint_drag": bench_paint_drag(app, conf, frame, moves),
+                "window_hit_test_1000": bench_window_hit_test(desktop, repeat),
+                **{
+                    f"edge_map_{name}": value
+                    for name, value in bench_edge_map(frame, repeat).items()
+                },
+                **{
+                    f"shapes_{name}": value
+                    for name, value in bench_draw_shapes(conf, desktop.width, desktop.height, shape_count, repeat).items()
+                },
+                **{
+                    f"redact_{name}": value
+                    for name, value in bench_redaction(conf, frame, repeat).items()
+                },
+                **{
+                    f"export_{name}": value
+                    for name, value in bench_export(conf, frame, save_dir, repeat).items()
+                },
+                **{
+                    f"upload_{name}": value
+                    for name, value in bench_upload(save_dir, repeat).items()
+                },
+            }
+            # Destroy this resolution's widgets now rather than during
+            # interpreter shutdown.
+            app.sendPostedEvents(None, QEvent.Type.DeferredDelete)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pyside": pyside_version,
+            "platform": platform.platform(),
+            "qpa": os.environ.get("QT_QPA_PLATFORM"),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline, threshold):
+    """
+    Returns a list of (resolution, benchmark, baseline_ms, current_ms) for
+    every benchmark whose median regressed by more than threshold.
+    """
+    regressions = []
+    for resolution, benchmarks in report["results"].items():
+        for name, current in benchmarks.items():
+            previous = baseline.get("results", {}).get(resolution, {}).get(name)
+            if previous is None:
+                continue
+            if current["median_ms"] > previous["median_ms"] * (1 + threshold):
+                regressions.append((resolution, name, previous["median_ms"], current["median_ms"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.run", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resolutions", default="1080p,4k",
+                        help=f"comma separated, from {', '.join(RESOLUTIONS)} (default: 1080p,4k)")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per benchmark (default: 5)")
+    parser.add_argument("--moves", type=int, default=200, help="mouse moves per simulated drag (default: 200)")
+    parser.add_argument("--shapes", type=int, default=100, help="annotations for the shape benchmarks (default: 100)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="a previous JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown before a benchmark counts as a regression (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    resolutions = [resolution.strip().lower() for resolution in args.resolutions.split(",") if resolution.strip()]
+    unknown = [resolution for resolution in resolutions if resolution not in RESOLUTIONS]
+    if unknown:
+        parser.error(f"unknown resolution(s): {', '.join(unknown)}")
+
+    report = run(resolutions, args.repeat, args.moves, args.shapes)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for resolution, name, previous, current in regressions:
+            print(f"REGRESSION {resolution} {name}: {previous:.2f} ms -> {current:.2f} ms", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+import os
+import threading
+import subprocess
+from concurrent.futures import Future
+from logging import getLogger
+
+from utils.tracing import tracer
+
+
+logger = getLogger(__name__)
+
+
+class CaptureError(Exception):
+    pass
+
+
+class Frame:
+    """
+    An uncompressed capture. The pixels live in a single writable buffer
+    so they can be wrapped by a QImage (or anything else) without a copy.
+    """
+
+    __slots__ = ("width", "height", "stride", "format", "buffer")
+
+    def __init__(self, width, height, stride, pixel_format, buffer):
+        self.width = width
+        self.height = height
+        self.stride = stride
+        # Currently always "RGB888": three bytes per pixel, no padding.
+        self.format = pixel_format
+        self.buffer = buffer
+
+
+def _read_exactly(stream, buffer):
+    view = memoryview(buffer)
+    filled = 0
+    while filled < len(view):
+        count = stream.readinto(view[filled:])
+        if not count:
+            raise CaptureError(f"Capture ended after {filled} of {len(view)} bytes")
+        filled += count
+
+
+def _read_ppm_header(stream):
+    """
+    Reads a binary PPM (P6) header and returns (width, height, maxval).
+    """
+    fields = []
+    token = b""
+    while len(fields) < 4:
+        char = stream.read(1)
+        if not char:
+            raise CaptureError("Truncated PPM header")
+        if char == b"#":
+            while char not in (b"\n", b""):
+                char = stream.read(1)
+            continue
+        if char.isspace():
+            if token:
+                fields.append(token)
+                token = b""
+            continue
+        token += char
+
+    if fields[0] != b"P6":
+        raise CaptureError(f"Expected a binary PPM (P6), got {fields[0][:8]!r}")
+
+    try:
+        width, height, maxval = (int(field) for field in fields[1:])
+    except ValueError as e:
+        raise CaptureError(f"Invalid PPM header: {e}") from e
+
+    if maxval != 255:
+        raise CaptureError(f"Unsupported PPM maxval {maxval}")
+    return width, height, maxval
+
+
+def read_ppm(stream):
+    """Reads a binary PPM image from a stream straight into a Frame.
+
+    The pixel data is read into one preallocated buffer, so the frame is
+    never assembled from intermediate chunks.
+
+    Args:
+        stream: a binary file object, e.g. a subprocess pipe.
+
+    Returns:
+        Frame: the decoded RGB888 frame.
+    """
+    width, height, _ = _read_ppm_header(stream)
+    stride = width * 3
+    buffer = bytearray(stride * height)
+    _read_exactly(stream, buffer)
+    return Frame(width, height, stride, "RGB888", buffer)
+
+
+def crop_frame(frame, x, y, width, height):
+    """Copies a rectangle out of a frame.
+
+    The rectangle is clipped to the frame, so a region hanging off the
+    edge just yields a smaller frame.
+
+    Args:
+        frame (Frame): the source frame.
+        x, y, width, height (int): the rectangle, in frame pixels.
+
+    Returns:
+        Frame: a new, tightly packed frame.
+
+    Raises:
+        CaptureError: if the rectangle doesn't overlap the frame.
+    """
+    left, top = max(0, x), max(0, y)
+    right, bottom = min(frame.width, x + width), min(frame.height, y + height)
+    if right <= left or bottom <= top:
+        raise CaptureError(f"Region {width}x{height}+{x}+{y} is outside the {frame.width}x{frame.height} frame")
+
+    row_bytes = (right - left) * 3
+    buffer = bytearray(row_bytes * (bottom - top))
+    source = memoryview(frame.buffer)
+    target = memoryview(buffer)
+    offset = 0
+    for row in range(top, bottom):
+        start = row * frame.stride + left * 3
+        target[offset:offset + row_bytes] = source[start:start + row_bytes]
+        offset += row_bytes
+    return Frame(right - left, bottom - top, row_bytes, frame.format, buffer)
+
+
+def start_in_background(function, *args):
+    """
+    Runs function(*args) on a daemon thread and returns a Future for its
+    result, so a capture can run while the caller does other work.
+    """
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(function(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="capture", daemon=True).start()
+    return future
+
+
+class CaptureBackend:
+    """
+    The interface every capture backend implements.
+    """
+
+    def start(self, output):
+        """
+        Starts capturing an output in the background and returns a Future
+        resolving to the Frame (or raising CaptureError).
+        """
+        return start_in_background(self.capture, output)
+
+    def capture(self, output):
+        """Captures a single output.
+
+        Args:
+            output (str): the compositor's name for the monitor, e.g. "DP-1".
+
+        Returns:
+            Frame: the uncompressed capture.
+
+        Raises:
+            CaptureError: if the capture failed.
+        """
+        raise NotImplementedError
+
+
+class GrimBackend(CaptureBackend):
+    """
+    Captures with grim, asking for uncompressed PPM so neither side pays
+    for PNG compression.
+
+    The grim executable can be overridden (e.g. with a fake for tests)
+    through grim_path or the SCREEN_SHORT_GRIM environment variable.
+    """
+
+    def __init__(self, grim_path=None):
+        self.grim_path = grim_path or os.environ.get("SCREEN_SHORT_GRIM", "grim")
+
+    def capture(self, output):
+        with tracer.span("grim", output=output):
+            return self._capture(output)
+
+    def _capture(self, output):
+        capture_command = [self.grim_path, '-t', 'ppm', '-o', output, '-']
+        try:
+            process = subprocess.Popen(capture_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except FileNotFoundError as e:
+            raise CaptureError(f"Failed to run grim: {e}") from e
+
+        try:
+            frame = read_ppm(process.stdout)
+        except CaptureError:
+            process.kill()
+            process.wait()
+            stderr = process.stderr.read().decode(errors="replace").strip()
+            raise CaptureError(f"grim failed: {stderr or 'no usable output'}")
+        finally:
+            process.stdout.close()
+
+        stderr = process.stderr.read()
+        process.stderr.close()
+        if process.wait() != 0:
+            raise CaptureError(f"grim exited with {process.returncode}: {stderr.decode(errors='replace').strip()}")
+
+        return frame
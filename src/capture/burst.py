@@ -0,0 +1,204 @@
+import time
+import queue
+import threading
+from logging import getLogger
+
+from .backend import CaptureError, crop_frame
+from storage.archive import BurstArchiveWriter, tile_grid, read_tile
+
+
+logger = getLogger(__name__)
+
+# Marks the end of the stream between pipeline stages.
+_DONE = object()
+
+
+def changed_tiles(previous, current, tiles, tile_size):
+    """Finds the tiles that differ between two frames of the same size.
+
+    Whole bands of tile rows are compared first, so a mostly static screen
+    costs little more than one memcmp per band.
+
+    Args:
+        previous (Frame | None): the last frame, or None for a keyframe.
+        current (Frame): the new frame.
+        tiles (list[tuple[int, int, int, int]]): from tile_grid().
+        tile_size (int): the tile size tiles was built with.
+
+    Returns:
+        list[tuple[int, bytes]]: (tile index, raw tile pixels) per change.
+    """
+    if previous is None:
+        return [(index, read_tile(current, tile)) for index, tile in enumerate(tiles)]
+
+    old, new = previous.buffer, current.buffer
+    stride = current.stride
+    columns = -(-current.width // tile_size)
+    changes = []
+    for band_start in range(0, len(tiles), columns):
+        band_top = tiles[band_start][1]
+        band_bottom = band_top + tiles[band_start][3]
+        if old[band_top * stride:band_bottom * stride] == new[band_top * stride:band_bottom * stride]:
+            continue
+        for index in range(band_start, band_start + columns):
+            x, y, width, height = tiles[index]
+            for row in range(y, y + height):
+                start = row * stride + x * 3
+                end = start + width * 3
+                if old[start:end] != new[start:end]:
+                    changes.append((index, read_tile(current, tiles[index])))
+                    break
+    return changes
+
+
+def _drain(source, last_item):
+    # Every stage consumes its input up to the end marker, even after a
+    # failure, so the stage before it is never left blocked on a full queue.
+    while last_item is not _DONE:
+        last_item = source.get()
+
+
+class BurstRecorder:
+    """
+    Captures an output every interval for a given duration into a burst
+    archive.
+
+    Capturing, diffing and compressing run on their own threads connected
+    by small queues, so grim is already producing the next frame while the
+    previous one is being diffed and written. When a stage falls behind,
+    capture ticks are skipped rather than queued up.
+    """
+
+    def __init__(self, backend, output, path, interval=0.5, duration=10.0, region=None, tile_size=64):
+        self.backend = backend
+        self.output = output
+        self.path = path
+        self.interval = interval
+        self.duration = duration
+        # (x, y, w, h) in the output's frame pixels, or None for all of it.
+        self.region = region
+        self.tile_size = tile_size
+
+        self.frames_captured = 0
+        self.ticks_skipped = 0
+        self.bytes_changed = 0
+
+        self._stop = threading.Event()
+        self._error = None
+
+    def stop(self):
+        """Ends the burst early; run() returns once the pipeline drains."""
+        self._stop.set()
+
+    def run(self):
+        """Records the burst, blocking until it's finished.
+
+        Returns:
+            int: the number of frames written to the archive.
+
+        Raises:
+            CaptureError: if a capture failed or the frame size changed.
+        """
+        frames = queue.Queue(maxsize=2)
+        deltas = queue.Queue(maxsize=2)
+        result = {}
+
+        stages = [
+            threading.Thread(target=self._guard, args=(self._diff_stage, frames, deltas), name="burst-diff"),
+            threading.Thread(target=self._guard, args=(self._write_stage, deltas, result), name="burst-write"),
+        ]
+        for stage in stages:
+            stage.start()
+        try:
+            self._guard(self._capture_stage, frames)
+        finally:
+            for stage in stages:
+                stage.join()
+
+        if self._error is not None:
+            raise self._error
+        logger.info(
+            f"Burst finished: {result.get('frames', 0)} frames, {self.ticks_skipped} ticks skipped, "
+            f"{self.bytes_changed / 1e6:.1f} MB of changed pixels"
+        )
+        return result.get('frames', 0)
+
+    def _guard(self, stage, *args):
+        try:
+            stage(*args)
+        except Exception as e:
+            if self._error is None:
+                self._error = e
+            self._stop.set()
+
+    def _capture_stage(self, frames):
+        try:
+            started = time.monotonic()
+            deadline = started + self.duration
+            next_tick = started
+            while not self._stop.is_set():
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+                if now < next_tick:
+                    self._stop.wait(next_tick - now)
+                    continue
+
+                frame = self.backend.capture(self.output)
+                if self.region is not None:
+                    frame = crop_frame(frame, *self.region)
+                frames.put((now - started, frame))
+                self.frames_captured += 1
+
+                missed = int((time.monotonic() - next_tick) // self.interval)
+                self.ticks_skipped += missed
+                next_tick += (missed + 1) * self.interval
+        finally:
+            frames.put(_DONE)
+
+    def _diff_stage(self, frames, deltas):
+        previous = None
+        tiles = None
+        item = None
+        try:
+            while True:
+                item = frames.get()
+                if item is _DONE:
+                    return
+                timestamp, frame = item
+                if previous is None:
+                    tiles = tile_grid(frame.width, frame.height, self.tile_size)
+                    deltas.put(("start", frame.width, frame.height))
+                elif (frame.width, frame.height) != (previous.width, previous.height):
+                    raise CaptureError(
+                        f"Frame size changed from {previous.width}x{previous.height} to {frame.width}x{frame.height}"
+                    )
+                changes = changed_tiles(previous, frame, tiles, self.tile_size)
+                self.bytes_changed += sum(len(data) for _, data in changes)
+                deltas.put((timestamp, changes))
+                previous = frame
+        finally:
+            _drain(frames, item)
+            deltas.put(_DONE)
+
+    def _write_stage(self, deltas, result):
+        writer = None
+        item = None
+        try:
+            while True:
+                item = deltas.get()
+                if item is _DONE:
+                    break
+                if item[0] == "start":
+                    _, width, height = item
+                    writer = BurstArchiveWriter(
+                        self.path, width, height, self.tile_size,
+                        output=self.output, interval=self.interval, region=self.region,
+                    )
+                    continue
+                writer.write_frame(*item)
+        finally:
+            _drain(deltas, item)
+            if writer is not None:
+                writer.close()
+                result['frames'] = writer.frame_count
@@ -0,0 +1,176 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+from .backend import Frame, CaptureError, crop_frame
+from utils.tracing import tracer
+
+
+def capture_outputs(backend, outputs, max_workers=None):
+    """Captures several outputs concurrently.
+
+    Every capture is its own grim process, so a thread pool is enough to
+    run them in parallel; the threads only wait on pipes.
+
+    Args:
+        backend (CaptureBackend): the backend used for every output.
+        outputs (Iterable[str]): the output names to capture.
+        max_workers (int, optional): defaults to one thread per output.
+
+    Returns:
+        dict[str, Frame]: the captured frames by output name.
+
+    Raises:
+        CaptureError: if any output failed to capture.
+    """
+    outputs = list(outputs)
+    if not outputs:
+        raise CaptureError("No outputs to capture")
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(outputs), thread_name_prefix="grim") as pool:
+        frames = pool.map(backend.capture, outputs)
+        return dict(zip(outputs, frames))
+
+
+def desktop_bounds(monitors):
+    """
+    Returns the (x, y, w, h) rectangle, in logical desktop coordinates,
+    spanned by the monitors returned by get_monitor_data().
+    """
+    left = min(x for x, _, _, _, _ in monitors.values())
+    top = min(y for _, y, _, _, _ in monitors.values())
+    right = max(x + width for x, _, width, _, _ in monitors.values())
+    bottom = max(y + height for _, y, _, height, _ in monitors.values())
+    return left, top, right - left, bottom - top
+
+
+def to_frame_rect(x, y, width, height, origin_x, origin_y, scale):
+    """
+    Maps a rectangle in logical desktop coordinates to the smallest pixel
+    rectangle covering it in a frame whose top-left corner is at
+    (origin_x, origin_y) and which has scale pixels per logical unit.
+    """
+    left = math.floor((x - origin_x) * scale)
+    top = math.floor((y - origin_y) * scale)
+    right = math.ceil((x + width - origin_x) * scale)
+    bottom = math.ceil((y + height - origin_y) * scale)
+    return left, top, right - left, bottom - top
+
+
+def capture_all_outputs(backend, monitors):
+    """
+    Captures every monitor in parallel and stitches them together.
+    monitors is the geometry mapping returned by get_monitor_data().
+
+    Returns:
+        tuple[Frame, tuple[int, int]]: see stitch_frames().
+    """
+    frames = capture_outputs(backend, monitors.keys())
+    with tracer.span("stitch", outputs=len(frames)):
+        return stitch_frames(frames, monitors)
+
+
+def _resize_frame(frame, width, height):
+    # Only needed when outputs with different scales are stitched.
+    from PIL import Image
+
+    image = Image.frombuffer("RGB", (frame.width, frame.height), frame.buffer, "raw", "RGB", frame.stride, 1)
+    resized = image.resize((width, height), Image.Resampling.BILINEAR)
+    return Frame(width, height, width * 3, "RGB888", bytearray(resized.tobytes()))
+
+
+def stitch_frames(frames, geometry):
+    """Combines per-output frames into one virtual-desktop frame.
+
+    Outputs are laid out in logical coordinates, but captured in their own
+    pixels. The canvas uses the largest output scale, so the sharpest
+    output keeps every pixel; frames of outputs with a smaller scale are
+    scaled up to match. Each frame lands at its output's logical position,
+    relative to the top-left-most output, times that scale; areas not
+    covered by any output stay black.
+
+    Args:
+        frames (dict[str, Frame]): the captured frames by output name.
+        geometry (dict[str, tuple[int, int, int, int, float]]): (x, y, w, h,
+            scale) per output, as returned by get_monitor_data().
+
+    Returns:
+        tuple[Frame, tuple[int, int]]: the stitched frame and the logical
+        desktop coordinates of its top-left corner. The frame has the
+        canvas scale's pixels per logical unit.
+    """
+    origin_x = min(geometry[name][0] for name in frames)
+    origin_y = min(geometry[name][1] for name in frames)
+    scale = max(geometry[name][4] for name in frames)
+
+    placements = []
+    width = height = 0
+    for name, frame in frames.items():
+        if frame.format != "RGB888":
+            raise CaptureError(f"Cannot stitch {frame.format} frames")
+        x, y, logical_width, logical_height, _ = geometry[name]
+        offset_x, offset_y, target_width, target_height = to_frame_rect(
+            x, y, logical_width, logical_height, origin_x, origin_y, scale
+        )
+        if (frame.width, frame.height) != (target_width, target_height):
+            frame = _resize_frame(frame, target_width, target_height)
+        placements.append((frame, offset_x, offset_y))
+        width = max(width, offset_x + frame.width)
+        height = max(height, offset_y + frame.height)
+
+    stride = width * 3
+    canvas = bytearray(stride * height)
+    target = memoryview(canvas)
+
+    for frame, offset_x, offset_y in placements:
+        source = memoryview(frame.buffer)
+        row_bytes = frame.width * 3
+        start = offset_y * stride + offset_x * 3
+        for row in range(frame.height):
+            source_start = row * frame.stride
+            target[start:start + row_bytes] = source[source_start:source_start + row_bytes]
+            start += stride
+
+    return Frame(width, height, stride, "RGB888", canvas), (origin_x, origin_y)
+
+
+def capture_region(backend, monitors, x, y, width, height):
+    """Captures a rectangle of the virtual desktop.
+
+    Only the outputs the rectangle overlaps are captured, so a region on
+    one monitor costs a single grim run.
+
+    Args:
+        backend (CaptureBackend): the backend used for every output.
+        monitors (dict[str, tuple[int, int, int, int, float]]): (x, y, w,
+            h, scale) per output, as returned by get_monitor_data().
+        x, y, width, height (int): the rectangle in desktop coordinates,
+            e.g. as printed by slurp.
+
+    Returns:
+        tuple[Frame, str | None]: the cropped frame, and the output it
+        came from, or None if it spans several.
+
+    Raises:
+        CaptureError: if the rectangle is on no output or a capture failed.
+    """
+    overlapping = {
+        name: geometry for name, geometry in monitors.items()
+        if geometry[0] < x + width and x < geometry[0] + geometry[2]
+        and geometry[1] < y + height and y < geometry[1] + geometry[3]
+    }
+    if not overlapping:
+        raise CaptureError(f"Region {width}x{height}+{x}+{y} is not on any output")
+
+    if len(overlapping) == 1:
+        (name, (origin_x, origin_y, logical_width, _, _)), = overlapping.items()
+        frame = backend.capture(name)
+        # The frame's own width gives the exact scale, whatever rounding
+        # the compositor applied.
+        scale = frame.width / logical_width
+    else:
+        name = None
+        frames = capture_outputs(backend, overlapping)
+        with tracer.span("stitch", outputs=len(frames)):
+            frame, (origin_x, origin_y) = stitch_frames(frames, overlapping)
+        scale = max(geometry[4] for geometry in overlapping.values())
+    return crop_frame(frame, *to_frame_rect(x, y, width, height, origin_x, origin_y, scale)), name
@@ -1,23 +1,17 @@
 import tomllib
-import toml
 from pathlib import Path
 from logging import getLogger
 
 
 logger = getLogger(__name__)
 
-def load_config():
+def get_default_config():
     """
-    Loads the config file from '~/.config/screen-short/config.toml'.
-    If the file is missing, corrupt, or incomplete, it loads and fills
-    in default values.
-
-    Returns:
-        dict: A dictionary containing the fully validated configuration.
+    Returns a fresh copy of the default configuration.
     """
     # Note: I've corrected the spelling of "appearance" for best practice.
     # You should update this in your config.toml file as well.
-    default_conf = {
+    return {
         "paths": {
             "ask_before_save": False,
             "save_dir": "~/Pictures/Screenshots"
@@ -31,7 +25,11 @@ def load_config():
         },
         "behavior": {
             "copy_to_clipboard": True,
-            "open_after_save": False
+            "clipboard_keep_alive": 30,
+            "open_after_save": False,
+            "fsync_on_save": False,
+            "snap_to_edges": False,
+            "snap_distance": 8
         },
         "editing": {
             "shape_border_color": "#1E90FF",
@@ -39,10 +37,58 @@ def load_config():
             "shape_rect": True,
             "shape_arrow": True,
             "shape_circle": True,
-
+            "shape_pixelate": True,
+            "shape_blur": True,
+            "pixelate_block_size": 12,
+            "blur_radius": 8
+        },
+        "output": {
+            "format": "png",
+            "preset": "default",
+            "png_compression_level": 6,
+            "jpeg_quality": 90,
+            "clipboard_format": "png",
+            "clipboard_preset": "fast"
+        },
+        "storage": {
+            "dedup": "off",
+            "perceptual_distance": 4
+        },
+        "history": {
+            "enabled": False,
+            "thumbnail_size": 256
+        },
+        "upload": {
+            "enabled": False,
+            "url": "",
+            "method": "POST",
+            "authorization": "",
+            "response_url_key": "url",
+            "copy_url": True,
+            "timeout": 30,
+            "chunk_size": 65536,
+            "max_attempts": 8,
+            "retry_backoff": 30
+        },
+        "tracing": {
+            "enabled": False,
+            "histogram_samples": 1000,
+            "keep_traces": 20
         }
     }
 
+
+def load_config():
+    """
+    Loads the config file from '~/.config/screen-short/config.toml'.
+    If the file is missing, corrupt, or incomplete, it loads and fills
+    in default values.
+
+    Returns:
+        dict: A dictionary containing the fully validated configuration.
+    """
+    default_conf = get_default_config()
+
     config_path = Path.home() / ".config/screen-short/config.toml"
     logger.info(f"Loading config file from: {config_path}")
 
@@ -53,6 +99,9 @@ def load_config():
     except FileNotFoundError:
         logger.warning("Config file not found. Creating a default one and continuing.")
         config_path.parent.mkdir(parents=True, exist_ok=True)
+        # Only needed to write the default file, so don't import it on
+        # every start.
+        import toml
         with open(config_path, "w") as f:
             toml.dump(default_conf, f)
         return default_conf
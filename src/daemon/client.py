@@ -0,0 +1,64 @@
+import os
+import socket
+from pathlib import Path
+from logging import getLogger
+
+
+logger = getLogger(__name__)
+
+SOCKET_NAME = "screen-short.sock"
+
+# The daemon runs grim before it replies to a capture, so those commands
+# get longer than the default timeout.
+CAPTURE_TIMEOUT = 10.0
+
+
+def get_socket_path():
+    """
+    Returns the path of the daemon's Unix domain socket, placed in
+    $XDG_RUNTIME_DIR when available.
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if not runtime_dir:
+        runtime_dir = f"/tmp/screen-short-{os.getuid()}"
+    return Path(runtime_dir) / SOCKET_NAME
+
+
+def send_command(command, socket_path=None, timeout=2.0):
+    """Sends a single command to a running daemon and returns its reply.
+
+    This deliberately only uses the standard library so that triggering a
+    capture doesn't pay for importing Qt.
+
+    Args:
+        command (str): the command to send, e.g. "capture", "ping" or "quit".
+        socket_path (Path, optional): overrides the default socket path.
+        timeout (float): seconds to wait for the connection and the reply.
+
+    Returns:
+        str | None: the daemon's reply, or None if no daemon is listening.
+        A daemon that is listening but fails to answer in time yields an
+        "error: ..." reply rather than None, so callers don't start a
+        second capture next to it.
+    """
+    socket_path = socket_path or get_socket_path()
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(socket_path))
+            sock.sendall(f"{command}\n".encode())
+
+            reply = b""
+            while not reply.endswith(b"\n"):
+                chunk = sock.recv(1024)
+                if not chunk:
+                    break
+                reply += chunk
+            return reply.decode().strip()
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
+    except socket.timeout:
+        return f"error: no reply within {timeout:g} s"
+    except OSError as e:
+        return f"error: {e}"
@@ -0,0 +1,182 @@
+from logging import getLogger
+
+from PySide6.QtCore import QObject, QRect, Signal
+from PySide6.QtNetwork import QLocalServer
+
+from utils.utils import get_active_monitor_name, get_monitor_data, get_visible_windows
+from utils.tracing import tracer
+from capture.backend import GrimBackend, CaptureError, start_in_background
+from capture.multi import capture_all_outputs, desktop_bounds
+from ui.overlay import ScreenshotOverlay, find_screen
+from .client import get_socket_path, send_command
+
+
+logger = getLogger(__name__)
+
+
+class ScreenShortDaemon(QObject):
+    """
+    Keeps a hidden ScreenshotOverlay ready and shows it whenever a client
+    sends a "capture" command over the daemon socket.
+
+    Captures run in the background and the client is only answered once
+    the overlay is up, so the event loop (and with it the socket server)
+    keeps running while grim works.
+    """
+
+    # Emitted from the capture thread with (future, show, reply) when a
+    # capture finishes; delivered on the GUI thread.
+    capture_finished = Signal(object)
+
+    def __init__(self, app, conf, socket_path=None, backend=None):
+        super().__init__()
+        self.app = app
+        self.conf = conf
+        self.backend = backend or GrimBackend()
+        self.socket_path = socket_path or get_socket_path()
+        self._capturing = False
+        self.capture_finished.connect(self._on_capture_finished)
+
+        self.overlay = ScreenshotOverlay(None, conf, persistent=True)
+        # Creating the native window up front means the first capture
+        # doesn't pay for it.
+        self.overlay.winId()
+        if conf['upload'].get('enabled', False):
+            # Starts retrying uploads queued by earlier runs.
+            self.overlay.uploader
+
+        self.server = QLocalServer(self)
+        self.server.newConnection.connect(self._on_new_connection)
+
+    def start(self):
+        """
+        Starts listening on the daemon socket.
+
+        Returns:
+            bool: False if another daemon is already running or the socket
+            could not be created.
+        """
+        if send_command("ping", self.socket_path) is not None:
+            logger.error(f"A daemon is already listening on {self.socket_path}")
+            return False
+
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        # Clean up a stale socket left behind by a crashed daemon.
+        QLocalServer.removeServer(str(self.socket_path))
+        self.server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
+
+        if not self.server.listen(str(self.socket_path)):
+            logger.error(f"Failed to listen on {self.socket_path}: {self.server.errorString()}")
+            return False
+
+        logger.info(f"Daemon listening on {self.socket_path}")
+        return True
+
+    def stop(self):
+        self.server.close()
+        QLocalServer.removeServer(str(self.socket_path))
+
+    def _on_new_connection(self):
+        while self.server.hasPendingConnections():
+            connection = self.server.nextPendingConnection()
+            connection.readyRead.connect(lambda conn=connection: self._on_ready_read(conn))
+            connection.disconnected.connect(connection.deleteLater)
+
+    def _on_ready_read(self, connection):
+        if not connection.canReadLine():
+            return
+
+        command = bytes(connection.readLine()).decode(errors="replace").strip()
+        self.handle_command(command, lambda reply: self._send_reply(connection, reply))
+
+    def _send_reply(self, connection, reply):
+        try:
+            connection.write(f"{reply}\n".encode())
+            connection.flush()
+            connection.disconnectFromServer()
+        except RuntimeError:
+            # The client gave up and the connection was deleted meanwhile.
+            pass
+
+    def handle_command(self, command, reply):
+        """
+        Runs a command and calls reply(text) exactly once with the answer,
+        right away or, for captures, once the capture is on screen.
+        """
+        if command == "ping":
+            reply("pong")
+        elif command == "capture":
+            self.capture(reply)
+        elif command == "capture-all":
+            self.capture_all(reply)
+        elif command == "quit":
+            self.stop()
+            self.app.quit()
+            reply("ok")
+        else:
+            logger.warning(f"Unknown daemon command: {command!r}")
+            reply("error: unknown command")
+
+    def capture(self, reply):
+        if self.overlay.isVisible() or self._capturing:
+            reply("busy")
+            return
+        # Each capture gets its own trace; spans of a cancelled one are
+        # written out here.
+        tracer.flush()
+
+        active_monitor = get_active_monitor_name()
+        if not active_monitor:
+            logger.error("Failed to identify an active monitor.")
+            reply("error: no active monitor")
+            return
+
+        logger.info(f"Capturing active monitor: {active_monitor}")
+
+        pending_frame = self.backend.start(active_monitor)
+        windows, focused = get_visible_windows()
+
+        def show(frame):
+            self.overlay.load_capture(frame)
+            self.overlay.set_windows(windows, focused)
+            self.overlay.show_on_screen(find_screen(active_monitor))
+
+        self._when_captured(pending_frame, show, reply)
+
+    def capture_all(self, reply):
+        if self.overlay.isVisible() or self._capturing:
+            reply("busy")
+            return
+        tracer.flush()
+
+        monitors = get_monitor_data()
+        if not monitors:
+            reply("error: no monitors")
+            return
+
+        pending_capture = start_in_background(capture_all_outputs, self.backend, monitors)
+        windows, focused = get_visible_windows()
+
+        def show(capture):
+            frame, _ = capture
+            self.overlay.load_capture(frame)
+            self.overlay.set_windows(windows, focused)
+            self.overlay.show_spanning(QRect(*desktop_bounds(monitors)))
+
+        self._when_captured(pending_capture, show, reply)
+
+    def _when_captured(self, future, show, reply):
+        self._capturing = True
+        future.add_done_callback(lambda future: self.capture_finished.emit((future, show, reply)))
+
+    def _on_capture_finished(self, finished):
+        future, show, reply = finished
+        self._capturing = False
+        try:
+            result = future.result()
+        except CaptureError as e:
+            logger.error(f"Capture failed: {e}")
+            reply("error: capture failed")
+            return
+        show(result)
+        reply("ok")
@@ -0,0 +1,92 @@
+import json
+import socket
+import threading
+import tempfile
+from pathlib import Path
+
+from .hyprland import BATCH_PREFIX, BATCH_SEPARATOR
+
+
+class FakeHyprlandServer:
+    """
+    A stand-in for Hyprland's request socket, for tests and benchmarks.
+
+    It answers "j/<command>" requests (and batches of them) from a dict
+    mapping command names to JSON-serializable replies, and records every
+    raw request it receives.
+
+    Usage:
+        with FakeHyprlandServer({"monitors": [...]}) as server:
+            client = HyprlandIPC(socket_path=server.socket_path)
+    """
+
+    def __init__(self, responses, socket_path=None):
+        self.responses = responses
+        self.requests = []
+
+        if socket_path is None:
+            self._tmp_dir = tempfile.TemporaryDirectory(prefix="fake-hypr-")
+            socket_path = Path(self._tmp_dir.name) / ".socket.sock"
+        else:
+            self._tmp_dir = None
+        self.socket_path = Path(socket_path)
+
+        self._server = None
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(str(self.socket_path))
+        self._server.listen()
+        self._thread = threading.Thread(target=self._serve, name="fake-hyprland", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._server is not None:
+            # shutdown() wakes the accept() in the serving thread.
+            try:
+                self._server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._server.close()
+            self._server = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.socket_path.unlink(missing_ok=True)
+        if self._tmp_dir is not None:
+            self._tmp_dir.cleanup()
+
+    def _reply(self, request):
+        flags, _, command = request.partition("/")
+        if not command:
+            flags, command = "", request
+        if command not in self.responses:
+            return "unknown request"
+        value = self.responses[command]
+        return json.dumps(value) if "j" in flags else str(value)
+
+    def _serve(self):
+        while True:
+            try:
+                connection, _ = self._server.accept()
+            except OSError:
+                return
+
+            with connection:
+                request = connection.recv(8192).decode()
+                self.requests.append(request)
+
+                if request.startswith(BATCH_PREFIX):
+                    parts = request[len(BATCH_PREFIX):].split(";")
+                    reply = "".join(self._reply(part) + BATCH_SEPARATOR for part in parts)
+                else:
+                    reply = self._reply(request)
+                connection.sendall(reply.encode())
@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import socket
+import threading
+from pathlib import Path
+from logging import getLogger
+
+
+logger = getLogger(__name__)
+
+BATCH_PREFIX = "[[BATCH]]"
+# Hyprland separates the replies of a batch with three newlines.
+BATCH_SEPARATOR = "\n\n\n"
+
+
+class HyprlandIPCError(Exception):
+    pass
+
+
+def get_socket_path():
+    """
+    Returns the path of Hyprland's request socket for the current instance,
+    or None if Hyprland doesn't seem to be running.
+    """
+    signature = os.environ.get("HYPRLAND_INSTANCE_SIGNATURE")
+    if not signature:
+        return None
+
+    candidates = []
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        candidates.append(Path(runtime_dir) / "hypr" / signature / ".socket.sock")
+    # Hyprland before 0.40 kept its sockets in /tmp.
+    candidates.append(Path("/tmp/hypr") / signature / ".socket.sock")
+
+    for candidate in candidates:
+        if candidate.exists():
+            return candidate
+    return None
+
+
+class HyprlandIPC:
+    """
+    A small client for Hyprland's request socket, used instead of forking
+    hyprctl.
+
+    JSON replies are cached per command for `ttl` seconds, and queries for
+    several commands are sent as a single batched request.
+    """
+
+    def __init__(self, socket_path=None, ttl=0.5, timeout=1.0):
+        self.socket_path = socket_path
+        self.ttl = ttl
+        self.timeout = timeout
+
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _resolve_socket_path(self):
+        socket_path = self.socket_path or get_socket_path()
+        if socket_path is None:
+            raise HyprlandIPCError("Hyprland socket not found (is HYPRLAND_INSTANCE_SIGNATURE set?)")
+        return socket_path
+
+    def request(self, request):
+        """Sends a raw request and returns the raw reply.
+
+        Args:
+            request (str): the request, e.g. "j/monitors".
+
+        Returns:
+            str: everything Hyprland replied before closing the connection.
+        """
+        socket_path = self._resolve_socket_path()
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(str(socket_path))
+                sock.sendall(request.encode())
+
+                chunks = []
+                while True:
+                    chunk = sock.recv(65536)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+        except OSError as e:
+            raise HyprlandIPCError(f"Request {request!r} to {socket_path} failed: {e}") from e
+
+        return b"".join(chunks).decode(errors="replace")
+
+    def query(self, *commands):
+        """Runs one or more JSON queries in a single round-trip.
+
+        Args:
+            *commands (str): hyprctl command names, e.g. "monitors", "clients".
+
+        Returns:
+            list: the parsed JSON reply of each command, in order.
+
+        Raises:
+            HyprlandIPCError: if the socket is unreachable or a reply isn't JSON.
+        """
+        now = time.monotonic()
+        results = {}
+        missing = []
+
+        with self._lock:
+            for command in commands:
+                cached = self._cache.get(command)
+                if cached and now - cached[0] < self.ttl:
+                    results[command] = cached[1]
+                elif command not in missing:
+                    missing.append(command)
+
+        if missing:
+            if len(missing) == 1:
+                replies = [self.request(f"j/{missing[0]}")]
+            else:
+                reply = self.request(BATCH_PREFIX + ";".join(f"j/{command}" for command in missing))
+                replies = [part for part in reply.split(BATCH_SEPARATOR) if part.strip()]
+                if len(replies) != len(missing):
+                    raise HyprlandIPCError(f"Expected {len(missing)} batch replies, got {len(replies)}")
+
+            fetched_at = time.monotonic()
+            for command, reply in zip(missing, replies):
+                try:
+                    value = json.loads(reply)
+                except json.JSONDecodeError as e:
+                    raise HyprlandIPCError(f"Invalid JSON reply to {command!r}: {e}") from e
+                results[command] = value
+                with self._lock:
+                    self._cache[command] = (fetched_at, value)
+
+        return [results[command] for command in commands]
+
+    def invalidate(self):
+        with self._lock:
+            self._cache.clear()
+
+
+_client = None
+
+
+def get_client():
+    """
+    Returns the process-wide client, so its cache is shared by every caller.
+    """
+    global _client
+    if _client is None:
+        _client = HyprlandIPC()
+    return _client
@@ -1,50 +1,477 @@
-from config.config import load_config
-from utils.utils import get_active_monitor_name
-from ui.overlay import ScreenshotOverlay
 from logging import getLogger
-import subprocess
+import logging
+import argparse
 import sys
 
-from PySide6.QtWidgets import QApplication
+from utils.profiling import StartupProfiler
+from utils.tracing import tracer
 
 
 logger = getLogger(__name__)
 
 
-if __name__ == "__main__":
+def parse_args():
+    parser = argparse.ArgumentParser(prog="screen-short", description="A Simple Screenshot tool for Linux")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--daemon", action="store_true",
+                      help="stay resident and wait for capture requests on a Unix socket")
+    mode.add_argument("--trigger", action="store_true",
+                      help="ask a running daemon to capture, starting a one-shot capture if none is running")
+    mode.add_argument("--stop-daemon", action="store_true", help="ask a running daemon to exit")
+    mode.add_argument("--burst", type=float, metavar="SECONDS",
+                      help="capture the active monitor repeatedly for SECONDS into a burst archive")
+    mode.add_argument("--export-burst", metavar="ARCHIVE",
+                      help="export a burst archive to the path given with --to")
+    mode.add_argument("--history", action="store_true",
+                      help="list recent screenshots from the history index")
+    mode.add_argument("--reindex", action="store_true",
+                      help="bring the history index up to date with the screenshot directory")
+    mode.add_argument("--timings", action="store_true",
+                      help="report p50/p95 stage timings recorded by tracing")
+    parser.add_argument("--all", action="store_true",
+                        help="capture every output into one image and allow selections across them")
+    parser.add_argument("--interval", type=int, default=500, metavar="MS",
+                        help="time between burst captures in milliseconds (default: 500)")
+    parser.add_argument("--region", metavar="'X,Y WxH'",
+                        help="only record this part of the monitor in a burst, in slurp's format")
+    parser.add_argument("--to", metavar="PATH",
+                        help="where --export-burst writes (a .gif/.png/.webp animation, or a directory of frames), "
+                             "or the file a non-interactive capture is written to")
+    capture = parser.add_argument_group(
+        "non-interactive capture",
+        "Any of these options captures, crops and saves without showing the overlay or loading Qt.")
+    capture.add_argument("--geometry", metavar="'X,Y WxH'",
+                         help="capture this region of the desktop, in slurp's format")
+    capture.add_argument("--output", metavar="NAME", help="capture this monitor instead of the active one")
+    capture.add_argument("--stdout", action="store_true", help="write the encoded image to stdout")
+    capture.add_argument("--format", metavar="FORMAT",
+                         help="image format, e.g. png, jpeg, webp or qoi (default: from the --to extension, else [output] format)")
+    parser.add_argument("--limit", type=int, default=20, metavar="N",
+                        help="how many screenshots --history lists (default: 20)")
+    parser.add_argument("--since", metavar="WHEN",
+                        help="only list screenshots since WHEN: e.g. 30m, 2h, 7d, or an ISO date")
+    parser.add_argument("--monitor", metavar="NAME", help="only list screenshots of this output")
+    parser.add_argument("--match", metavar="TEXT", help="only list screenshots whose path contains TEXT")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print how long each startup phase took once the overlay is painted")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log progress messages, not just problems")
+    return parser.parse_args()
+
+
+def show_overlay(pending_frame, profiler, show):
+    """
+    Builds the QApplication and the overlay around a capture that is
+    already in flight, then runs the event loop.
+
+    pending_frame is a Future resolving to the capture Frame, and
+    show(overlay) puts the overlay on screen.
+    """
+    # The capture is already running in the background, so parsing the
+    # config, importing Qt and creating the QApplication overlap with it.
+    from capture.backend import CaptureError
+    from config.config import load_config
     conf = load_config()
-    
+    tracer.configure(conf)
+    profiler.mark("load config")
+
+    from PySide6.QtWidgets import QApplication
+    from ui.overlay import ScreenshotOverlay
+    from ui.clipboard import release_clipboard
+    profiler.mark("import Qt and overlay")
+
+    app = QApplication(sys.argv)
+    app.setStyle("Fusion")
+    profiler.mark("create QApplication")
+
+    try:
+        frame = pending_frame.result()
+    except CaptureError as e:
+        logger.error(f"Capture failed: {e}")
+        return 1
+    profiler.mark("wait for capture")
+
+    overlay = ScreenshotOverlay(frame, conf)
+    profiler.mark("create overlay")
+
+    def on_first_paint():
+        profiler.mark("first paint")
+        profiler.report()
+    overlay.on_first_paint = on_first_paint
+
+    show(overlay)
+    exit_code = app.exec()
+
+    # Let the background save finish before the process goes away.
+    overlay.shutdown_saver()
+    overlay.shutdown_uploader()
+    release_clipboard()
+    # Whatever wasn't flushed with a save, e.g. a cancelled capture.
+    tracer.flush()
+    return exit_code
+
+
+def run_oneshot(profiler):
+    from utils.utils import get_active_monitor_name, get_visible_windows
+    from capture.backend import GrimBackend
+
     active_monitor = get_active_monitor_name()
     if not active_monitor:
         logger.error("Failed to identify an active monitor. Exiting.")
-        sys.exit(1)
-    
+        return 1
+    profiler.mark("query active monitor")
+
     logger.info(f"Capturing active monitor: {active_monitor}")
+    pending_frame = GrimBackend().start(active_monitor)
+    # Runs while grim is capturing.
+    windows, focused = get_visible_windows()
+    profiler.mark("query windows")
+
+    def show(overlay):
+        from ui.overlay import find_screen
+        overlay.set_windows(windows, focused)
+        overlay.show_on_screen(find_screen(active_monitor))
+
+    return show_overlay(pending_frame, profiler, show)
+
+
+def run_oneshot_all(profiler):
+    from utils.utils import get_monitor_data, get_visible_windows
+    from capture.backend import GrimBackend, start_in_background
+    from capture.multi import capture_all_outputs, desktop_bounds
+
+    monitors = get_monitor_data()
+    if not monitors:
+        logger.error("Failed to list monitors. Exiting.")
+        return 1
+    profiler.mark("query monitors")
+
+    logger.info(f"Capturing all monitors: {', '.join(monitors)}")
+    pending_frame = start_in_background(lambda: capture_all_outputs(GrimBackend(), monitors)[0])
+    windows, focused = get_visible_windows()
+    profiler.mark("query windows")
+
+    # In logical units; the stitched frame may have more pixels.
+    bounds = desktop_bounds(monitors)
+
+    def show(overlay):
+        from PySide6.QtCore import QRect
+        overlay.set_windows(windows, focused)
+        overlay.show_spanning(QRect(*bounds))
+
+    return show_overlay(pending_frame, profiler, show)
+
+
+def run_capture(args):
+    """
+    Captures without the overlay: grim, an optional crop and an encode,
+    written to --to, stdout or the screenshot directory.
+    """
+    from config.config import load_config
+    from capture.backend import CaptureError, GrimBackend, crop_frame
+    from pathlib import Path
+    from capture.multi import capture_all_outputs, capture_region, to_frame_rect
+    from storage.encoders import EncoderError, create_encoder, format_for_extension
+    from utils.utils import get_active_monitor_name, get_monitor_data, parse_slurp_output
+
+    region = None
+    if args.geometry is not None:
+        try:
+            region = parse_slurp_output(args.geometry)
+        except IndexError:
+            logger.error(f"Invalid geometry '{args.geometry}', expected 'X,Y WxH'.")
+            return 1
+    if args.output == "":
+        logger.error("Invalid output '', expected a monitor name.")
+        return 1
+    if args.all and args.output:
+        logger.error("--all and --output are mutually exclusive.")
+        return 1
+
+    conf = load_config()
+    tracer.configure(conf)
+    # Without --format, a known --to extension picks the format.
+    image_format = args.format
+    if image_format is None and args.to is not None:
+        image_format = format_for_extension(Path(args.to).suffix)
+    try:
+        encoder = create_encoder(conf, image_format or conf['output']['format'], conf['output']['preset'])
+    except EncoderError as e:
+        logger.error(e)
+        return 1
+
+    backend = GrimBackend()
+    try:
+        if args.all or (region is not None and args.output is None):
+            # Monitor positions are only needed to place the region or
+            # stitch the outputs.
+            monitors = get_monitor_data()
+            if not monitors:
+                logger.error("Failed to list monitors. Exiting.")
+                return 1
+            if region is not None:
+                frame, monitor = capture_region(backend, monitors, *region)
+            else:
+                frame, _ = capture_all_outputs(backend, monitors)
+                monitor = "all"
+        else:
+            monitor = args.output or get_active_monitor_name()
+            if not monitor:
+                logger.error("Failed to identify an active monitor. Exiting.")
+                return 1
+            frame = backend.capture(monitor)
+            if region is not None:
+                # The geometry is in desktop coordinates, like slurp's.
+                monitors = get_monitor_data() or {}
+                if monitor not in monitors:
+                    logger.error(f"Unknown monitor '{monitor}'.")
+                    return 1
+                origin_x, origin_y, logical_width, _, _ = monitors[monitor]
+                frame = crop_frame(
+                    frame, *to_frame_rect(*region, origin_x, origin_y, frame.width / logical_width)
+                )
+    except CaptureError as e:
+        logger.error(f"Capture failed: {e}")
+        return 1
+
+    if args.stdout or args.to is not None:
+        try:
+            with tracer.span("encode", format=encoder.extension):
+                data = encoder.encode(frame)
+        except EncoderError as e:
+            logger.error(e)
+            return 1
+        tracer.flush()
+
+    if args.stdout:
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+        return 0
+
+    if args.to is not None:
+        import os
+        tmp_path = f"{args.to}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, args.to)
+        except OSError as e:
+            logger.error(f"Could not write {args.to}: {e}")
+            return 1
+        print(args.to)
+        return 0
+
+    # The screenshot directory goes through the save worker, so dedup and
+    # the history apply just as for interactive captures.
+    from storage.saver import SaveWorker
+
+    saved = []
+    saver = SaveWorker(conf)
+    saver.submit(frame, encoder.encode, encoder.extension, monitor, lambda path, error: saved.append(path))
+    saver.shutdown()
+    if saved[0] is None:
+        return 1
+    print(saved[0])
+    return 0
+
+
+def run_burst(duration, interval_ms, region):
+    from datetime import datetime
+    from config.config import load_config
+    from capture.backend import CaptureError, GrimBackend
+    from capture.burst import BurstRecorder
+    from capture.multi import to_frame_rect
+    from storage.archive import EXTENSION
+    from storage.saver import resolve_save_dir, TIMESTAMP_FORMAT
+    from utils.utils import get_active_monitor_name, get_monitor_data, parse_slurp_output
+
+    if region is not None:
+        try:
+            region = parse_slurp_output(region)
+        except IndexError:
+            logger.error(f"Invalid region '{region}', expected 'X,Y WxH'.")
+            return 1
+
+    conf = load_config()
+    tracer.configure(conf)
+    active_monitor = get_active_monitor_name()
+    if not active_monitor:
+        logger.error("Failed to identify an active monitor. Exiting.")
+        return 1
+
+    if region is not None:
+        # slurp gives logical desktop coordinates; the recorder crops the
+        # monitor's physical frames.
+        monitors = get_monitor_data()
+        if not monitors or active_monitor not in monitors:
+            logger.error(f"No geometry for monitor {active_monitor}. Exiting.")
+            return 1
+        origin_x, origin_y, _, _, scale = monitors[active_monitor]
+        region = to_frame_rect(*region, origin_x, origin_y, scale)
+
+    path = resolve_save_dir(conf) / f"burst-{datetime.now().strftime(TIMESTAMP_FORMAT)}.{EXTENSION}"
+    recorder = BurstRecorder(GrimBackend(), active_monitor, path, interval_ms / 1000, duration, region)
+    logger.info(f"Recording {active_monitor} every {interval_ms} ms for {duration:g} s to: {path}")
+    try:
+        recorder.run()
+    except CaptureError as e:
+        logger.error(f"Burst failed: {e}")
+        return 1
+    except KeyboardInterrupt:
+        logger.info(f"Burst stopped early, {recorder.frames_captured} frames kept.")
+    finally:
+        tracer.flush()
+    return 0
+
+
+def run_export_burst(archive, target):
+    from pathlib import Path
+    from config.config import load_config
+    from storage.archive import ArchiveError, export_animation, export_frames
+    from storage.encoders import EncoderError, get_file_encoder
+
+    if target is None:
+        logger.error("--export-burst needs --to.")
+        return 1
+
+    conf = load_config()
+    # Nothing here is traced; this just settles the tracer so that it
+    # stops buffering.
+    tracer.configure(conf)
+    try:
+        if Path(target).suffix.lower() in (".gif", ".png", ".webp"):
+            count = export_animation(archive, target)
+        else:
+            count = export_frames(archive, target, get_file_encoder(conf))
+    except (OSError, ArchiveError, EncoderError) as e:
+        logger.error(f"Export failed: {e}")
+        return 1
+    logger.info(f"Exported {count} frames to: {target}")
+    return 0
+
+
+def run_history(args):
+    from datetime import datetime
+    from config.config import load_config
+    from storage.history import HistoryIndex, parse_since
+    from storage.saver import resolve_save_dir
 
     try:
-        capture_command = ['grim', '-o', active_monitor, '-']
-        result = subprocess.run(capture_command, capture_output=True, check=True)
-        fullscreen_capture_data = result.stdout
-    except (subprocess.CalledProcessError, FileNotFoundError) as e:
-        logger.error(f"Failed to run grim: {e}")
-        sys.exit(1)
+        since = parse_since(args.since) if args.since else None
+    except ValueError:
+        logger.error(f"Invalid time '{args.since}', expected e.g. 30m, 2h, 7d or an ISO date.")
+        return 1
+
+    conf = load_config()
+    tracer.configure(conf)
+    history = HistoryIndex(thumbnail_size=conf['history']['thumbnail_size'])
+    try:
+        if args.reindex:
+            save_dir = resolve_save_dir(conf)
+            indexed, removed = history.scan(save_dir)
+            print(f"History of {save_dir}: {indexed} files indexed, {removed} removed.")
+            return 0
+
+        if not conf['history']['enabled']:
+            logger.warning("[history] enabled is false, so new saves aren't recorded; "
+                           "--reindex indexes the screenshot directory.")
+        for row in history.query(args.limit, since=since, monitor=args.monitor, match=args.match):
+            when = datetime.fromtimestamp(row["captured_at"]).strftime("%Y-%m-%d %H:%M:%S")
+            size = f"{row['width']}x{row['height']}" if row["width"] else "?"
+            print(f"{when}  {size:>9}  {row['monitor'] or '-':<10}  {row['path']}")
+    finally:
+        history.close()
+    return 0
+
+
+def run_timings():
+    from utils.tracing import load_samples, timing_summary
+
+    summary = timing_summary(load_samples())
+    if not summary:
+        logger.error("No timings recorded yet; enable [tracing] or set SCREEN_SHORT_TRACE=1.")
+        return 1
+
+    width = max(len(stage) for stage in summary)
+    print(f"{'stage':<{width}}  {'runs':>6}  {'p50 ms':>9}  {'p95 ms':>9}  {'max ms':>9}")
+    for stage, stats in sorted(summary.items(), key=lambda item: -item[1]["p50_ms"]):
+        print(
+            f"{stage:<{width}}  {stats['count']:>6}  {stats['p50_ms']:>9.2f}  "
+            f"{stats['p95_ms']:>9.2f}  {stats['max_ms']:>9.2f}"
+        )
+    return 0
+
+
+def run_daemon():
+    from config.config import load_config
+    from daemon.server import ScreenShortDaemon
+    from ui.clipboard import release_clipboard
+    from PySide6.QtWidgets import QApplication
+
+    conf = load_config()
+    tracer.configure(conf)
 
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
+    app.setQuitOnLastWindowClosed(False)
+
+    daemon = ScreenShortDaemon(app, conf)
+    if not daemon.start():
+        return 1
+    exit_code = app.exec()
+
+    daemon.overlay.shutdown_saver()
+    daemon.overlay.shutdown_uploader()
+    release_clipboard()
+    tracer.flush()
+    return exit_code
+
+
+if __name__ == "__main__":
+    profiler = StartupProfiler()
+    args = parse_args()
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING, format="%(levelname)s %(name)s: %(message)s"
+    )
+    profiler.enabled = args.profile_startup
+    profiler.mark("parse arguments")
+
+    if args.trigger or args.stop_daemon:
+        # Keep the client path free of Qt and config parsing so that a
+        # keybind only costs a socket round-trip.
+        from daemon.client import CAPTURE_TIMEOUT, send_command
+
+        if args.stop_daemon:
+            reply = send_command("quit")
+        else:
+            reply = send_command("capture-all" if args.all else "capture", timeout=CAPTURE_TIMEOUT)
+        if reply is not None:
+            if reply not in ("ok", "busy"):
+                logger.error(f"Daemon replied: {reply}")
+                sys.exit(1)
+            profiler.mark("daemon round-trip")
+            profiler.report()
+            sys.exit(0)
+        if args.stop_daemon:
+            logger.error("No daemon is running.")
+            sys.exit(1)
+        logger.warning("No daemon is running, falling back to a one-shot capture.")
 
-    all_screens = app.screens()
-    target_screen = None
-    for screen in all_screens:
-        if screen.name() == active_monitor:
-            target_screen = screen
-            break
-
-    if not target_screen:
-        logger.warning(f"Could not find a screen named '{active_monitor}'. Defaulting to primary screen.")
-        target_screen = app.primaryScreen()
-
-    overlay = ScreenshotOverlay(fullscreen_capture_data, conf) 
-    overlay.setScreen(target_screen)
-    overlay.setGeometry(target_screen.geometry())
-    overlay.showFullScreen()
-    sys.exit(app.exec())
\ No newline at end of file
+    if args.daemon:
+        sys.exit(run_daemon())
+    if args.burst is not None:
+        sys.exit(run_burst(args.burst, args.interval, args.region))
+    if args.export_burst:
+        sys.exit(run_export_burst(args.export_burst, args.to))
+    if args.history or args.reindex:
+        sys.exit(run_history(args))
+    if args.timings:
+        sys.exit(run_timings())
+    # An empty value (e.g. from a slurp that was cancelled) still asks for
+    # a non-interactive capture, and is rejected there.
+    if args.stdout or any(value is not None for value in (args.geometry, args.output, args.format, args.to)):
+        sys.exit(run_capture(args))
+    # The capture is started before Qt is imported or the config is parsed,
+    # so grim runs in parallel with the slowest part of startup.
+    if args.all:
+        sys.exit(run_oneshot_all(profiler))
+    sys.exit(run_oneshot(profiler))
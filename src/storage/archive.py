@@ -0,0 +1,275 @@
+import os
+import json
+import zlib
+import struct
+from itertools import islice
+from pathlib import Path
+from logging import getLogger
+
+from capture.backend import Frame
+
+
+logger = getLogger(__name__)
+
+MAGIC = b"SSBURST1"
+EXTENSION = "ssb"
+
+_HEADER_LENGTH = struct.Struct("<I")
+_FRAME_HEADER = struct.Struct("<dI")
+_TILE_HEADER = struct.Struct("<II")
+
+# Pillow holds every frame of an animation in memory while writing it, so
+# longer exports are refused rather than exhausting RAM.
+MAX_ANIMATION_BYTES = 1 << 30
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def tile_grid(width, height, tile_size):
+    """
+    Returns the (x, y, w, h) of every tile covering a width x height frame,
+    row by row; edge tiles are cropped to the frame.
+    """
+    return [
+        (x, y, min(tile_size, width - x), min(tile_size, height - y))
+        for y in range(0, height, tile_size)
+        for x in range(0, width, tile_size)
+    ]
+
+
+def read_tile(frame, tile):
+    x, y, width, height = tile
+    source = memoryview(frame.buffer)
+    row_bytes = width * 3
+    return b"".join(
+        source[row * frame.stride + x * 3:row * frame.stride + x * 3 + row_bytes]
+        for row in range(y, y + height)
+    )
+
+
+def write_tile(frame, tile, data):
+    x, y, width, height = tile
+    target = memoryview(frame.buffer)
+    row_bytes = width * 3
+    for index, row in enumerate(range(y, y + height)):
+        start = row * frame.stride + x * 3
+        target[start:start + row_bytes] = data[index * row_bytes:(index + 1) * row_bytes]
+
+
+class BurstArchiveWriter:
+    """
+    Writes a burst of frames as a stream of changed tiles.
+
+    The file is the magic, a length-prefixed JSON header, then one record
+    per frame: its timestamp and tile count followed by the zlib-compressed
+    tiles that changed since the previous frame. The first frame stores
+    every tile.
+    """
+
+    def __init__(self, path, width, height, tile_size=64, compression_level=1, **metadata):
+        self.path = Path(path)
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.compression_level = compression_level
+        self.frame_count = 0
+
+        header = json.dumps({
+            "width": width,
+            "height": height,
+            "tile_size": tile_size,
+            "format": "RGB888",
+            **metadata,
+        }).encode()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "wb")
+        self._file.write(MAGIC + _HEADER_LENGTH.pack(len(header)) + header)
+
+    def write_frame(self, timestamp, tiles):
+        """Appends one frame.
+
+        Args:
+            timestamp (float): seconds since the start of the burst.
+            tiles (list[tuple[int, bytes]]): (tile index, raw tile pixels)
+                for every tile that changed.
+        """
+        chunks = [_FRAME_HEADER.pack(timestamp, len(tiles))]
+        for index, data in tiles:
+            compressed = zlib.compress(data, self.compression_level)
+            chunks.append(_TILE_HEADER.pack(index, len(compressed)))
+            chunks.append(compressed)
+        self._file.write(b"".join(chunks))
+        self.frame_count += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _read_exactly(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise ArchiveError("Truncated burst archive")
+    return data
+
+
+def read_header(f):
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ArchiveError("Not a screen-short burst archive")
+    length, = _HEADER_LENGTH.unpack(_read_exactly(f, _HEADER_LENGTH.size))
+    try:
+        return json.loads(_read_exactly(f, length))
+    except ValueError as e:
+        raise ArchiveError(f"Invalid burst archive header: {e}") from e
+
+
+def iter_frames(path):
+    """Replays a burst archive.
+
+    A truncated final frame (e.g. from a burst that was killed) ends the
+    replay with a warning instead of an error.
+
+    Args:
+        path (str | Path): the archive.
+
+    Yields:
+        tuple[float, Frame]: the timestamp and the full frame. The same
+        Frame object is updated in place for every step, so copy its
+        buffer if you need to keep one.
+    """
+    with open(path, "rb") as f:
+        header = read_header(f)
+        width, height = header["width"], header["height"]
+        tiles = tile_grid(width, height, header["tile_size"])
+        frame = Frame(width, height, width * 3, "RGB888", bytearray(width * 3 * height))
+
+        while True:
+            record = f.read(_FRAME_HEADER.size)
+            if not record:
+                return
+            try:
+                if len(record) != _FRAME_HEADER.size:
+                    raise ArchiveError("Truncated burst archive")
+                timestamp, count = _FRAME_HEADER.unpack(record)
+                for _ in range(count):
+                    index, length = _TILE_HEADER.unpack(_read_exactly(f, _TILE_HEADER.size))
+                    write_tile(frame, tiles[index], zlib.decompress(_read_exactly(f, length)))
+            except (ArchiveError, zlib.error) as e:
+                logger.warning(f"Stopping at damaged frame in {path}: {e}")
+                return
+            yield timestamp, frame
+
+
+def read_timestamps(path):
+    """
+    Returns the timestamp of every complete frame in a burst archive,
+    skipping over the tile data without decompressing it.
+    """
+    timestamps = []
+    with open(path, "rb") as f:
+        read_header(f)
+        size = os.fstat(f.fileno()).st_size
+        while True:
+            record = f.read(_FRAME_HEADER.size)
+            if len(record) != _FRAME_HEADER.size:
+                return timestamps
+            timestamp, count = _FRAME_HEADER.unpack(record)
+            for _ in range(count):
+                tile_header = f.read(_TILE_HEADER.size)
+                if len(tile_header) != _TILE_HEADER.size:
+                    return timestamps
+                _, length = _TILE_HEADER.unpack(tile_header)
+                f.seek(length, os.SEEK_CUR)
+            if f.tell() > size:
+                return timestamps
+            timestamps.append(timestamp)
+
+
+class _AnimationFrames:
+    """
+    The frames of an archive as PIL images, decoded one at a time as they
+    are iterated. Re-iterable, since Pillow may walk append_images twice.
+    """
+
+    def __init__(self, path, start=0):
+        self.path = path
+        self.start = start
+
+    def __iter__(self):
+        from storage.encoders import to_pil_image
+
+        for _, frame in islice(iter_frames(self.path), self.start, None):
+            # iter_frames reuses its frame, so each step has to be copied.
+            yield to_pil_image(frame).copy()
+
+
+def export_frames(path, directory, encoder):
+    """Writes every frame of a burst archive as its own image.
+
+    Args:
+        path (str | Path): the archive.
+        directory (str | Path): where to write 'frame-NNNNN.<ext>' files.
+        encoder (Encoder): the image encoder, e.g. from create_encoder().
+
+    Returns:
+        int: the number of frames written.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    count = 0
+    for count, (_, frame) in enumerate(iter_frames(path), start=1):
+        (directory / f"frame-{count:05d}.{encoder.extension}").write_bytes(encoder.encode(frame))
+    return count
+
+
+def export_animation(path, target):
+    """Writes a burst archive as an animation, timed like the capture.
+
+    Args:
+        path (str | Path): the archive.
+        target (str | Path): the output file; the format follows its
+            extension (.gif, .png for APNG, or .webp).
+
+    Returns:
+        int: the number of frames written.
+
+    Raises:
+        ArchiveError: if the archive is empty or the animation would need
+            more than MAX_ANIMATION_BYTES of memory to write.
+    """
+    timestamps = read_timestamps(path)
+    if not timestamps:
+        raise ArchiveError(f"{path} has no frames")
+
+    with open(path, "rb") as f:
+        header = read_header(f)
+    needed = len(timestamps) * header["width"] * header["height"] * 3
+    if needed > MAX_ANIMATION_BYTES:
+        raise ArchiveError(
+            f"{path} is too long to export as an animation: {len(timestamps)} frames of "
+            f"{header['width']}x{header['height']} would need about {needed / 1e9:.1f} GB of memory. "
+            f"Export it to a directory of frames instead."
+        )
+
+    durations = [max(1, round((later - earlier) * 1000)) for earlier, later in zip(timestamps, timestamps[1:])]
+    durations.append(durations[-1] if durations else 100)
+
+    first = next(iter(_AnimationFrames(path)))
+    options = {
+        "save_all": True, "append_images": _AnimationFrames(path, start=1), "duration": durations, "loop": 0,
+    }
+    if Path(target).suffix.lower() == ".webp":
+        options["lossless"] = True
+    try:
+        first.save(target, **options)
+    except (KeyError, ValueError, OSError) as e:
+        raise ArchiveError(f"Failed to write animation {target}: {e}") from e
+    return len(timestamps)
@@ -0,0 +1,190 @@
+import io
+
+
+PRESETS = ("default", "fast", "archive")
+
+ENCODERS = {}
+
+
+class EncoderError(Exception):
+    pass
+
+
+def register_encoder(name):
+    """
+    Class decorator that makes an Encoder available under name, e.g. in
+    the [output] format config keys.
+    """
+    def decorator(cls):
+        cls.name = name
+        ENCODERS[name] = cls
+        return cls
+    return decorator
+
+
+def to_pil_image(image):
+    """Wraps raw pixels in a PIL image. Frames are wrapped without a copy.
+
+    Args:
+        image: either a capture Frame or a QImage. QImages are detected by
+            duck typing so this module never has to import Qt.
+
+    Returns:
+        PIL.Image.Image: an RGB or RGBA image.
+    """
+    from PIL import Image
+
+    if hasattr(image, "constBits"):
+        from PySide6.QtGui import QImage
+
+        if image.hasAlphaChannel():
+            image = image.convertToFormat(QImage.Format.Format_RGBA8888)
+            mode = "RGBA"
+        else:
+            image = image.convertToFormat(QImage.Format.Format_RGB888)
+            mode = "RGB"
+        # frombuffer shares the QImage's memory, so copy before the
+        # converted QImage goes out of scope.
+        return Image.frombuffer(
+            mode, (image.width(), image.height()), image.constBits(), "raw", mode, image.bytesPerLine(), 1
+        ).copy()
+
+    if image.format != "RGB888":
+        raise EncoderError(f"Unsupported frame format {image.format}")
+    return Image.frombuffer("RGB", (image.width, image.height), image.buffer, "raw", "RGB", image.stride, 1)
+
+
+class Encoder:
+    """
+    Turns a finished image (a Frame or QImage) into file bytes.
+
+    Subclasses set extension and mime_type and build their PIL save options
+    from the config and a speed/size preset.
+    """
+
+    name = None
+    extension = None
+    mime_type = None
+    pil_format = None
+
+    def __init__(self, conf, preset="default"):
+        if preset not in PRESETS:
+            raise EncoderError(f"Unknown preset '{preset}', expected one of {', '.join(PRESETS)}")
+        self.preset = preset
+        self.options = self.build_options(conf['output'], preset)
+
+    def build_options(self, output_conf, preset):
+        return {}
+
+    def prepare(self, pil_image):
+        return pil_image
+
+    def encode(self, image):
+        pil_image = self.prepare(to_pil_image(image))
+        buffer = io.BytesIO()
+        try:
+            pil_image.save(buffer, format=self.pil_format, **self.options)
+        except (KeyError, OSError) as e:
+            raise EncoderError(f"Failed to encode {self.name}: {e}") from e
+        return buffer.getvalue()
+
+
+@register_encoder("png")
+class PNGEncoder(Encoder):
+    extension = "png"
+    mime_type = "image/png"
+    pil_format = "PNG"
+
+    def build_options(self, output_conf, preset):
+        if preset == "fast":
+            return {"compress_level": 1}
+        if preset == "archive":
+            return {"compress_level": 9, "optimize": True}
+        return {"compress_level": output_conf['png_compression_level']}
+
+
+@register_encoder("webp")
+class WebPEncoder(Encoder):
+    """
+    Lossless WebP. In lossless mode 'quality' is the compression effort.
+    """
+
+    extension = "webp"
+    mime_type = "image/webp"
+    pil_format = "WEBP"
+
+    def build_options(self, output_conf, preset):
+        if preset == "fast":
+            return {"lossless": True, "quality": 0, "method": 0}
+        if preset == "archive":
+            return {"lossless": True, "quality": 100, "method": 6}
+        return {"lossless": True, "quality": 70, "method": 4}
+
+
+@register_encoder("jpeg")
+class JPEGEncoder(Encoder):
+    extension = "jpg"
+    mime_type = "image/jpeg"
+    pil_format = "JPEG"
+
+    def build_options(self, output_conf, preset):
+        options = {"quality": output_conf['jpeg_quality']}
+        if preset == "archive":
+            options.update(optimize=True, progressive=True)
+        return options
+
+    def prepare(self, pil_image):
+        # JPEG has no alpha channel.
+        return pil_image.convert("RGB") if pil_image.mode != "RGB" else pil_image
+
+
+@register_encoder("qoi")
+class QOIEncoder(Encoder):
+    """
+    QOI trades size for very fast lossless encoding; it has no knobs, so
+    every preset is the same. Needs a Pillow build that can write QOI.
+    """
+
+    extension = "qoi"
+    mime_type = "image/qoi"
+    pil_format = "QOI"
+
+
+def create_encoder(conf, image_format, preset="default"):
+    """Builds a configured encoder.
+
+    Args:
+        conf (dict): the full configuration.
+        image_format (str): a registered encoder name, e.g. "png".
+        preset (str): "default", "fast" or "archive".
+
+    Returns:
+        Encoder: the encoder.
+
+    Raises:
+        EncoderError: if the format or preset is unknown.
+    """
+    encoder_class = ENCODERS.get(image_format.lower())
+    if encoder_class is None:
+        raise EncoderError(f"Unknown image format '{image_format}', expected one of {', '.join(ENCODERS)}")
+    return encoder_class(conf, preset)
+
+
+def format_for_extension(extension):
+    """
+    Returns the name of the encoder that writes files with extension
+    (e.g. "jpg" or ".jpeg"), or None if no encoder does.
+    """
+    extension = extension.lower().lstrip(".")
+    for name, encoder_class in ENCODERS.items():
+        if extension in (name, encoder_class.extension):
+            return name
+    return None
+
+
+def get_file_encoder(conf):
+    return create_encoder(conf, conf['output']['format'], conf['output']['preset'])
+
+
+def get_clipboard_encoder(conf):
+    return create_encoder(conf, conf['output']['clipboard_format'], conf['output']['clipboard_preset'])
@@ -0,0 +1,298 @@
+import os
+import re
+import time
+import hashlib
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from logging import getLogger
+
+
+logger = getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".qoi"}
+
+# Matches the names SaveWorker gives screenshots, with or without a -N
+# collision suffix.
+SCREENSHOT_NAME = re.compile(r"screenshot-(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    path TEXT PRIMARY KEY,
+    directory TEXT NOT NULL,
+    hash TEXT,
+    width INTEGER,
+    height INTEGER,
+    monitor TEXT,
+    captured_at REAL NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    thumbnail TEXT
+);
+CREATE INDEX IF NOT EXISTS captures_by_time ON captures (captured_at);
+CREATE INDEX IF NOT EXISTS captures_by_directory ON captures (directory);
+CREATE INDEX IF NOT EXISTS captures_by_hash ON captures (hash);
+"""
+
+
+def get_cache_dir():
+    cache_home = os.environ.get("XDG_CACHE_HOME")
+    base = Path(cache_home) if cache_home else Path.home() / ".cache"
+    return base / "screen-short"
+
+
+def file_hash(path):
+    hasher = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def save_thumbnail(pil_image, thumbnail_dir, digest, size):
+    """
+    Writes a thumbnail of pil_image (modified in place) and returns its path.
+    Thumbnails are named by the file hash, so identical captures share one.
+    """
+    thumbnail_path = Path(thumbnail_dir) / f"{digest}.png"
+    if not thumbnail_path.exists():
+        pil_image.thumbnail((size, size))
+        if pil_image.mode not in ("RGB", "RGBA"):
+            pil_image = pil_image.convert("RGBA")
+        tmp_path = thumbnail_path.with_name(f".{thumbnail_path.name}.{os.getpid()}.tmp")
+        pil_image.save(tmp_path, format="PNG", compress_level=1)
+        os.replace(tmp_path, thumbnail_path)
+    return str(thumbnail_path)
+
+
+def index_file(path, thumbnail_dir, thumbnail_size):
+    """Hashes an image file and thumbnails it. Runs in a worker process.
+
+    Returns:
+        tuple: (path, hash, width, height, thumbnail path), with None for
+        whatever couldn't be read.
+    """
+    from PIL import Image
+
+    try:
+        digest = file_hash(path)
+        with Image.open(path) as image:
+            width, height = image.size
+            # Lets JPEG decode at a fraction of the size.
+            image.draft("RGB", (thumbnail_size, thumbnail_size))
+            thumbnail = save_thumbnail(image, thumbnail_dir, digest, thumbnail_size)
+        return path, digest, width, height, thumbnail
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not index {path}: {e}")
+        return path, None, None, None, None
+
+
+def capture_time(path, mtime):
+    """
+    Returns when a screenshot was taken: from its name if SaveWorker named
+    it, else its modification time.
+    """
+    match = SCREENSHOT_NAME.match(Path(path).name)
+    if match:
+        try:
+            return datetime.strptime(match.group(1), "%Y-%m-%d_%H-%M-%S").timestamp()
+        except ValueError:
+            pass
+    return mtime
+
+
+class HistoryIndex:
+    """
+    A SQLite index of saved screenshots with cached thumbnails.
+
+    New saves are recorded by the save worker when [history] enabled is
+    set; existing directories are brought up to date with scan(), which
+    only looks at files whose mtime or size changed and decodes those in a
+    process pool.
+
+    A connection is bound to the thread that opened it, so each thread
+    should use its own HistoryIndex.
+    """
+
+    def __init__(self, db_path=None, thumbnail_dir=None, thumbnail_size=256):
+        cache_dir = get_cache_dir()
+        self.db_path = Path(db_path) if db_path else cache_dir / "history.sqlite3"
+        self.thumbnail_dir = Path(thumbnail_dir) if thumbnail_dir else cache_dir / "thumbnails"
+        self.thumbnail_size = thumbnail_size
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.thumbnail_dir.mkdir(parents=True, exist_ok=True)
+
+        # The daemon's save worker and the CLI may use the index at the
+        # same time; WAL lets readers run alongside a writer.
+        self.db = sqlite3.connect(self.db_path, timeout=5.0)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def record(self, path, image=None, monitor=None, captured_at=None):
+        """Adds a freshly saved screenshot.
+
+        Args:
+            path (Path): the saved file.
+            image: the Frame or QImage that was saved; its size is recorded
+                and the thumbnail is made from it rather than by decoding
+                the file again.
+            monitor (str, optional): the output it was captured from.
+            captured_at (float, optional): a Unix timestamp; defaults to
+                the file's modification time.
+        """
+        path = Path(path)
+        stat = path.stat()
+        digest = file_hash(path)
+
+        width = height = thumbnail = None
+        if image is not None:
+            from storage.encoders import to_pil_image
+
+            pil_image = to_pil_image(image)
+            width, height = pil_image.size
+            thumbnail = save_thumbnail(pil_image, self.thumbnail_dir, digest, self.thumbnail_size)
+
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO captures VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (str(path), str(path.parent), digest, width, height, monitor,
+                 captured_at if captured_at is not None else stat.st_mtime, stat.st_mtime, stat.st_size, thumbnail),
+            )
+
+    def scan(self, directory, max_workers=None):
+        """Brings the index up to date with a directory's images.
+
+        Unchanged files (same mtime and size) are skipped without being
+        opened; new or changed ones are hashed and thumbnailed in a process
+        pool; files that disappeared are dropped from the index.
+
+        Args:
+            directory (Path): the directory to scan (not recursively).
+            max_workers (int, optional): worker processes, defaults to the
+                CPU count.
+
+        Returns:
+            tuple[int, int]: the number of files (re)indexed and removed.
+        """
+        directory = Path(directory)
+        known = {
+            row["path"]: (row["mtime"], row["size"])
+            for row in self.db.execute("SELECT path, mtime, size FROM captures WHERE directory = ?", (str(directory),))
+        }
+
+        changed = []
+        seen = set()
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            entries = []
+        for entry in entries:
+            if entry.name.startswith(".") or os.path.splitext(entry.name)[1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+            seen.add(entry.path)
+            if known.get(entry.path) != (stat.st_mtime, stat.st_size):
+                changed.append((entry.path, stat))
+
+        removed = [path for path in known if path not in seen]
+        with self.db:
+            self.db.executemany("DELETE FROM captures WHERE path = ?", ((path,) for path in removed))
+
+        if changed:
+            self._index_files(directory, changed, max_workers)
+        return len(changed), len(removed)
+
+    def _index_files(self, directory, changed, max_workers):
+        from functools import partial
+        from concurrent.futures import ProcessPoolExecutor
+
+        stats = dict(changed)
+        work = partial(index_file, thumbnail_dir=str(self.thumbnail_dir), thumbnail_size=self.thumbnail_size)
+        started = time.perf_counter()
+
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = pool.map(work, stats, chunksize=32)
+            rows = []
+            for path, digest, width, height, thumbnail in results:
+                stat = stats[path]
+                rows.append((
+                    path, str(directory), digest, width, height, None,
+                    capture_time(path, stat.st_mtime), stat.st_mtime, stat.st_size, thumbnail,
+                ))
+                # Commit in batches so an interrupted scan keeps its progress.
+                if len(rows) >= 500:
+                    self._insert_scanned(rows)
+                    rows.clear()
+            self._insert_scanned(rows)
+
+        logger.info(f"Indexed {len(stats)} files in {time.perf_counter() - started:.1f}s")
+
+    def _insert_scanned(self, rows):
+        with self.db:
+            # Scanning can't know the monitor, so keep one recorded at save
+            # time if the file is re-indexed.
+            self.db.executemany(
+                """
+                INSERT INTO captures VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (path) DO UPDATE SET
+                    hash = excluded.hash, width = excluded.width, height = excluded.height,
+                    captured_at = excluded.captured_at, mtime = excluded.mtime, size = excluded.size,
+                    thumbnail = excluded.thumbnail
+                """,
+                rows,
+            )
+
+    def query(self, limit=20, since=None, until=None, monitor=None, match=None, directory=None):
+        """Lists indexed screenshots, newest first.
+
+        Args:
+            limit (int): the maximum number of results.
+            since, until (float, optional): Unix timestamp bounds.
+            monitor (str, optional): only captures from this output.
+            match (str, optional): a substring of the file's path.
+            directory (Path, optional): only captures in this directory.
+
+        Returns:
+            list[sqlite3.Row]: rows with the captures table's columns.
+        """
+        clauses, parameters = [], []
+        if since is not None:
+            clauses.append("captured_at >= ?")
+            parameters.append(since)
+        if until is not None:
+            clauses.append("captured_at < ?")
+            parameters.append(until)
+        if monitor is not None:
+            clauses.append("monitor = ?")
+            parameters.append(monitor)
+        if match is not None:
+            clauses.append("instr(path, ?) > 0")
+            parameters.append(match)
+        if directory is not None:
+            clauses.append("directory = ?")
+            parameters.append(str(directory))
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        parameters.append(limit)
+        return self.db.execute(
+            f"SELECT * FROM captures {where} ORDER BY captured_at DESC LIMIT ?", parameters
+        ).fetchall()
+
+
+def parse_since(value):
+    """
+    Turns '30m', '2h', '7d' (ago) or an ISO date/time into a Unix timestamp.
+    """
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+    match = re.fullmatch(r"(\d+)([smhdw])", value.strip())
+    if match:
+        return time.time() - int(match.group(1)) * units[match.group(2)]
+    return datetime.fromisoformat(value).timestamp()
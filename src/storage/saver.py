@@ -0,0 +1,246 @@
+import os
+import queue
+import tempfile
+import threading
+from contextlib import suppress
+from datetime import datetime
+from pathlib import Path
+from logging import getLogger
+
+from utils.tracing import tracer
+
+
+logger = getLogger(__name__)
+
+TIMESTAMP_FORMAT = "%Y-%m-%d_%H-%M-%S"
+
+
+def resolve_save_dir(conf):
+    """
+    Returns the absolute screenshot directory from the config. Relative
+    paths are taken relative to the home directory.
+    """
+    save_path_obj = Path(conf['paths']['save_dir']).expanduser()
+    if not save_path_obj.is_absolute():
+        return Path.home() / save_path_obj
+    return save_path_obj
+
+
+def _current_umask():
+    # The umask can only be read by setting it; done once, at import.
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+# What open() would give a new file, rather than mkstemp's 0600.
+FILE_MODE = 0o666 & ~_current_umask()
+
+
+def create_temp_file(directory):
+    """
+    Creates a hidden temp file in directory with the permissions a plainly
+    created file would have, and returns (fd, path).
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix=".screen-short-", suffix=".tmp", dir=directory)
+    try:
+        os.fchmod(fd, FILE_MODE)
+    except OSError:
+        os.close(fd)
+        os.unlink(tmp_path)
+        raise
+    return fd, tmp_path
+
+
+def _link_unique(tmp_path, directory, stem, extension, fallback=os.replace):
+    """
+    Publishes tmp_path under the first free '<stem>[-N].<extension>' name.
+    os.link never replaces an existing file, so two captures landing in the
+    same second can't clobber each other. fallback(tmp_path, target) is used
+    where hard links aren't supported.
+    """
+    suffix = 0
+    while True:
+        name = f"{stem}.{extension}" if suffix == 0 else f"{stem}-{suffix}.{extension}"
+        target = directory / name
+        try:
+            os.link(tmp_path, target)
+            return target
+        except FileExistsError:
+            suffix += 1
+        except OSError:
+            # Filesystems without hard links (e.g. some FUSE mounts) fall
+            # back to a plain rename, which is atomic but may race.
+            if target.exists():
+                suffix += 1
+                continue
+            fallback(tmp_path, target)
+            return target
+
+
+def write_atomic(directory, stem, extension, data, fsync=False):
+    """Writes data to a collision-free file in directory via a temp file.
+
+    Readers never see a partially written screenshot: the data goes to a
+    hidden temp file first and is only linked into place once complete.
+
+    Args:
+        directory (Path): the destination directory, created if missing.
+        stem (str): the preferred file name without extension.
+        extension (str): the file extension, without the dot.
+        data (bytes): the encoded image.
+        fsync (bool): flush the file and directory to disk before returning.
+
+    Returns:
+        Path: the path the data was written to.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+
+    fd, tmp_path = create_temp_file(directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        path = _link_unique(tmp_path, directory, stem, extension)
+    finally:
+        with suppress(FileNotFoundError):
+            os.unlink(tmp_path)
+
+    if fsync:
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    return path
+
+
+class SaveJob:
+    __slots__ = ("image", "encode", "extension", "timestamp", "monitor", "on_saved")
+
+    def __init__(self, image, encode, extension, timestamp, monitor, on_saved):
+        self.image = image
+        self.encode = encode
+        self.extension = extension
+        self.timestamp = timestamp
+        self.monitor = monitor
+        self.on_saved = on_saved
+
+
+class SaveWorker:
+    """
+    Encodes and writes finished screenshots on a background thread so the
+    overlay can disappear as soon as the user confirms.
+
+    Completion callbacks are called as on_saved(path, error) from the worker
+    thread; exactly one of path and error is None.
+    """
+
+    def __init__(self, conf, on_saved=None):
+        self.save_dir = resolve_save_dir(conf)
+        self.fsync = conf['behavior'].get('fsync_on_save', False)
+        self.on_saved = on_saved
+        # Imported here to avoid a circular import; the store reuses
+        # _link_unique.
+        from storage.store import create_store
+        self.store = create_store(conf, self.save_dir)
+        history_conf = conf.get('history', {})
+        self.record_history = history_conf.get('enabled', False)
+        self.thumbnail_size = history_conf.get('thumbnail_size', 256)
+        # Opened on the worker thread, since SQLite connections are bound
+        # to the thread that created them.
+        self._history = None
+
+        self._jobs = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="screen-short-saver", daemon=True)
+        self._thread.start()
+
+    def submit(self, image, encode, extension="png", monitor=None, on_saved=None):
+        """Queues an image to be encoded and written.
+
+        Args:
+            image: the finished image, handed to encode() on the worker thread.
+            encode (Callable): turns the image into the encoded file bytes.
+            extension (str): the file extension to save with.
+            monitor (str, optional): the captured output, for the history.
+            on_saved (Callable, optional): per-job completion callback, called
+                in addition to the worker-wide one.
+        """
+        # The name is based on when the user confirmed, not when the
+        # worker got around to it.
+        self._jobs.put(SaveJob(image, encode, extension, datetime.now(), monitor, on_saved))
+
+    def wait(self):
+        """Blocks until every queued screenshot has been written."""
+        self._jobs.join()
+
+    def shutdown(self, wait=True):
+        self._jobs.put(None)
+        if wait:
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            try:
+                if job is None:
+                    if self._history is not None:
+                        self._history.close()
+                    return
+                self._process(job)
+            finally:
+                self._jobs.task_done()
+
+    def _record(self, path, job):
+        # The screenshot is already safely on disk; a history failure is
+        # only worth a warning.
+        try:
+            if self._history is None:
+                from storage.history import HistoryIndex
+                self._history = HistoryIndex(thumbnail_size=self.thumbnail_size)
+            self._history.record(path, job.image, job.monitor, job.timestamp.timestamp())
+        except Exception as e:
+            logger.warning(f"Could not add {path} to the history: {e}")
+
+    def _process(self, job):
+        path, error = None, None
+
+        def encode(image):
+            with tracer.span("encode", format=job.extension):
+                return job.encode(image)
+
+        save_span = tracer.start("save")
+        try:
+            stem = f"screenshot-{job.timestamp.strftime(TIMESTAMP_FORMAT)}"
+            if self.store is not None:
+                path, duplicate = self.store.save(job.image, encode, job.extension, stem)
+                if duplicate:
+                    logger.info(f"Screenshot is a duplicate, linked as: {path}")
+                else:
+                    logger.info(f"Screenshot saved to: {path}")
+            else:
+                data = encode(job.image)
+                path = write_atomic(self.save_dir, stem, job.extension, data, fsync=self.fsync)
+                logger.info(f"Screenshot saved to: {path}")
+        except Exception as e:
+            error = e
+            logger.error(f"Error saving screenshot: {e}")
+        tracer.stop(save_span)
+
+        for callback in (self.on_saved, job.on_saved):
+            if callback is None:
+                continue
+            try:
+                callback(path, error)
+            except Exception as e:
+                logger.error(f"Save callback failed: {e}")
+
+        # After the callbacks, so thumbnailing never delays them.
+        if path is not None and self.record_history:
+            with tracer.span("history"):
+                self._record(path, job)
+        # Saving is the last stage of a capture.
+        tracer.flush()
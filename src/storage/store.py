@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from contextlib import suppress
+from logging import getLogger
+
+from storage.saver import _link_unique, create_temp_file
+
+
+logger = getLogger(__name__)
+
+DEDUP_MODES = ("off", "exact", "perceptual")
+
+OBJECTS_DIR = ".objects"
+INDEX_NAME = "index.jsonl"
+
+
+def pixel_digest(image):
+    """Hashes the raw pixels of a finished image.
+
+    Only the visible bytes of each row are hashed, so stride padding (which
+    may hold garbage) never makes identical images look different.
+
+    Args:
+        image: either a capture Frame or a QImage.
+
+    Returns:
+        str: a hex digest that also covers the size and pixel format.
+    """
+    if hasattr(image, "constBits"):
+        width, height = image.width(), image.height()
+        stride = image.bytesPerLine()
+        row_bytes = width * image.depth() // 8
+        pixel_format = str(image.format())
+        pixels = image.constBits()
+    else:
+        width, height = image.width, image.height
+        stride = image.stride
+        row_bytes = width * 3
+        pixel_format = image.format
+        pixels = image.buffer
+
+    hasher = hashlib.blake2b(digest_size=20)
+    hasher.update(f"{width}x{height}:{pixel_format}".encode())
+    view = memoryview(pixels)
+    if stride == row_bytes:
+        hasher.update(view[:stride * height])
+    else:
+        for y in range(height):
+            hasher.update(view[y * stride:y * stride + row_bytes])
+    return hasher.hexdigest()
+
+
+def perceptual_hash(image):
+    """Computes a 64 bit difference hash (dHash) of an image.
+
+    Visually identical images (e.g. a blinking cursor or a clock that
+    ticked over) land within a few bits of each other.
+
+    Args:
+        image: either a capture Frame or a QImage.
+
+    Returns:
+        int: the hash.
+    """
+    from PIL import Image
+    from storage.encoders import to_pil_image
+
+    small = to_pil_image(image).convert("L").resize((9, 8), Image.Resampling.BOX)
+    pixels = small.tobytes()
+    value = 0
+    for y in range(8):
+        row = pixels[y * 9:(y + 1) * 9]
+        for x in range(8):
+            value = (value << 1) | (row[x] > row[x + 1])
+    return value
+
+
+def _image_size(image):
+    if hasattr(image, "constBits"):
+        return image.width(), image.height()
+    return image.width, image.height
+
+
+def _symlink_fallback(source, target):
+    # Without hard links the object has to stay where it is, so publish a
+    # relative symlink to it instead of moving it.
+    os.symlink(os.path.relpath(source, target.parent), target)
+
+
+class ContentStore:
+    """
+    Stores each distinct screenshot once, under its pixel hash, in a hidden
+    '.objects' directory inside the save directory. The usual timestamped
+    names are hard links (or symlinks) to those objects, and every save is
+    appended to '.objects/index.jsonl'.
+
+    A capture whose pixels match a stored object is neither encoded nor
+    written again. In "perceptual" mode, a capture of the same size whose
+    dHash is within max_distance bits of a stored one is still stored, but
+    its index entry names that object under "similar_to": 64 bits can't
+    tell apart screens that differ by a line of text, so a near match is
+    never allowed to replace new content.
+    """
+
+    def __init__(self, directory, mode="exact", max_distance=4, fsync=False):
+        if mode not in DEDUP_MODES or mode == "off":
+            raise ValueError(f"Unknown dedup mode '{mode}'")
+        self.directory = directory
+        self.objects_dir = directory / OBJECTS_DIR
+        self.index_path = self.objects_dir / INDEX_NAME
+        self.mode = mode
+        self.max_distance = max_distance
+        self.fsync = fsync
+
+        self._lock = threading.Lock()
+        # (width, height, extension) -> [(phash, digest)], for perceptual mode.
+        self._perceptual = {}
+        # How much of the index has been read; other processes (e.g. the
+        # daemon and a one-shot capture) may append to it.
+        self._index_offset = 0
+
+    def object_path(self, digest, extension):
+        return self.objects_dir / digest[:2] / f"{digest}.{extension}"
+
+    def save(self, image, encode, extension, stem):
+        """Stores image unless an equal one is already stored, then links it
+        under a collision-free '<stem>[-N].<extension>' name.
+
+        Args:
+            image: the finished image (a Frame or QImage).
+            encode (Callable): turns the image into the encoded file bytes;
+                only called if no duplicate is found.
+            extension (str): the file extension to save with.
+            stem (str): the preferred file name without extension.
+
+        Returns:
+            tuple[Path, bool]: the published path and whether the capture's
+            pixels were already stored.
+        """
+        with self._lock:
+            digest = pixel_digest(image)
+            object_path = self.object_path(digest, extension)
+            duplicate = object_path.exists()
+
+            phash = similar_to = None
+            if not duplicate and self.mode == "perceptual":
+                phash = perceptual_hash(image)
+                similar_to = self._find_similar(_image_size(image), extension, phash)
+
+            if not duplicate:
+                self._write_object(object_path, encode(image))
+
+            path = _link_unique(object_path, self.directory, stem, extension, fallback=_symlink_fallback)
+            self._append_index(path, digest, extension, _image_size(image), phash, similar_to)
+            return path, duplicate
+
+    def _write_object(self, object_path, data):
+        object_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = create_temp_file(object_path.parent)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            try:
+                os.link(tmp_path, object_path)
+            except FileExistsError:
+                # Another process stored the same pixels first.
+                pass
+            except OSError:
+                os.replace(tmp_path, object_path)
+        finally:
+            with suppress(FileNotFoundError):
+                os.unlink(tmp_path)
+
+    def _find_similar(self, size, extension, phash):
+        self._read_new_index_entries()
+        candidates = self._perceptual.get((*size, extension), ())
+        for known_phash, digest in candidates:
+            if (known_phash ^ phash).bit_count() <= self.max_distance:
+                if self.object_path(digest, extension).exists():
+                    return digest
+        return None
+
+    def _read_new_index_entries(self):
+        try:
+            with open(self.index_path, "rb") as f:
+                f.seek(self._index_offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # A writer is mid-append; pick it up next time.
+                        break
+                    self._index_offset += len(line)
+                    self._remember(json.loads(line))
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            logger.warning(f"Ignoring corrupt screenshot index {self.index_path}: {e}")
+
+    def _remember(self, entry):
+        phash = entry.get("phash")
+        if phash is None:
+            return
+        key = (entry["width"], entry["height"], entry["extension"])
+        self._perceptual.setdefault(key, []).append((int(phash, 16), entry["digest"]))
+
+    def _append_index(self, path, digest, extension, size, phash, similar_to=None):
+        entry = {
+            "name": path.name,
+            "digest": digest,
+            "extension": extension,
+            "width": size[0],
+            "height": size[1],
+            "phash": None if phash is None else f"{phash:016x}",
+            "similar_to": similar_to,
+            "time": time.time(),
+        }
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        # A single O_APPEND write keeps concurrent writers' lines intact.
+        line = (json.dumps(entry) + "\n").encode()
+        fd = os.open(self.index_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+
+def create_store(conf, directory):
+    """
+    Returns a ContentStore for directory, or None when deduplication is
+    turned off in the config.
+    """
+    storage_conf = conf.get('storage', {})
+    mode = storage_conf.get('dedup', "off")
+    if mode == "off":
+        return None
+    if mode not in DEDUP_MODES:
+        logger.error(f"Unknown dedup mode '{mode}', expected one of {', '.join(DEDUP_MODES)}. Saving without dedup.")
+        return None
+    return ContentStore(
+        directory, mode,
+        max_distance=storage_conf.get('perceptual_distance', 4),
+        fsync=conf['behavior'].get('fsync_on_save', False),
+    )
@@ -0,0 +1,404 @@
+import os
+import json
+import time
+import random
+import threading
+import mimetypes
+import http.client
+from pathlib import Path
+from urllib.parse import urlsplit
+from logging import getLogger
+
+from utils.tracing import tracer
+
+
+logger = getLogger(__name__)
+
+# Status codes worth retrying; any other failure status is final.
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+# The longest wait between two attempts, however many failed.
+MAX_BACKOFF_SECONDS = 3600
+
+# Queue entries are '<id>.json' while free, and '<id>.<pid>.claimed' while
+# an Uploader in process pid works on them.
+QUEUE_SUFFIX = ".json"
+CLAIM_SUFFIX = ".claimed"
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Alive, just not ours.
+        return True
+    return True
+
+
+class UploadError(Exception):
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class ConnectionPool:
+    """
+    Keeps one HTTP connection open per host, so consecutive uploads skip
+    the TCP (and TLS) handshake, which dominates over a slow VPN.
+
+    A kept connection the server has meanwhile closed is detected on
+    first use and replaced once, transparently.
+    """
+
+    def __init__(self, timeout=30, chunk_size=64 * 1024):
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        # (scheme, netloc) -> HTTPConnection
+        self._connections = {}
+
+    def _connection(self, url):
+        key = (url.scheme, url.netloc)
+        connection = self._connections.get(key)
+        if connection is not None:
+            return connection, True
+
+        if url.scheme == "https":
+            connection_class = http.client.HTTPSConnection
+        elif url.scheme == "http":
+            connection_class = http.client.HTTPConnection
+        else:
+            raise UploadError(f"Unsupported upload URL scheme '{url.scheme}'", retryable=False)
+        # blocksize is how much of a file body is read and sent at a time,
+        # so the upload is streamed rather than loaded into memory.
+        connection = connection_class(url.hostname, url.port, timeout=self.timeout, blocksize=self.chunk_size)
+        self._connections[key] = connection
+        return connection, False
+
+    def _discard(self, url):
+        connection = self._connections.pop((url.scheme, url.netloc), None)
+        if connection is not None:
+            connection.close()
+
+    def send_file(self, method, url, path, headers):
+        """Sends a file as the request body.
+
+        Args:
+            method (str): the HTTP method, e.g. "POST".
+            url (str): the full request URL.
+            path (Path): the file to stream.
+            headers (dict[str, str]): extra request headers.
+
+        Returns:
+            tuple[int, dict[str, str], bytes]: the status, response headers
+            and response body.
+
+        Raises:
+            UploadError: if the request couldn't be sent or answered.
+        """
+        url = urlsplit(url)
+        target = url.path or "/"
+        if url.query:
+            target += f"?{url.query}"
+
+        while True:
+            connection, reused = self._connection(url)
+            try:
+                with open(path, "rb") as f:
+                    connection.request(method, target, body=f, headers=headers)
+                    response = connection.getresponse()
+                    # Reading the whole body leaves the connection reusable.
+                    body = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                self._discard(url)
+                if reused:
+                    # The server closed the idle connection; try once more
+                    # on a fresh one.
+                    continue
+                raise UploadError(f"Connection lost: {e}") from e
+            except (OSError, http.client.HTTPException) as e:
+                self._discard(url)
+                raise UploadError(f"Upload request failed: {e}") from e
+
+            if response.will_close:
+                self._discard(url)
+            return response.status, dict(response.getheaders()), body
+
+    def close(self):
+        for connection in self._connections.values():
+            connection.close()
+        self._connections.clear()
+
+
+class UploadJob:
+    __slots__ = ("job_id", "path", "attempts", "next_attempt", "on_uploaded")
+
+    def __init__(self, job_id, path, attempts=0, next_attempt=0.0, on_uploaded=None):
+        self.job_id = job_id
+        self.path = path
+        self.attempts = attempts
+        self.next_attempt = next_attempt
+        self.on_uploaded = on_uploaded
+
+
+class Uploader:
+    """
+    Uploads saved screenshots to an HTTP image host on a background thread.
+
+    Every job is written to an on-disk queue before its first attempt and
+    only removed once it succeeded or failed for good, so uploads that
+    fail (or are cut short by the process exiting) are retried with
+    exponential backoff, by this process or the next one to start an
+    Uploader.
+
+    The queue is shared by every process (e.g. the daemon and a one-shot
+    capture), so each entry is claimed by renaming it before it is
+    worked on. Claims are handed back on shutdown, and claims left by a
+    process that died are taken over by the next Uploader to start.
+
+    The host is sent the raw file, with its MIME type and name in the
+    headers, and is expected to reply with the image URL: either as the
+    whole body or, for JSON replies, under the configured key.
+    """
+
+    def __init__(self, conf, queue_dir=None):
+        upload_conf = conf['upload']
+        self.url = upload_conf['url']
+        self.method = upload_conf['method'].upper()
+        self.authorization = upload_conf['authorization']
+        self.response_url_key = upload_conf['response_url_key']
+        self.max_attempts = max(1, upload_conf['max_attempts'])
+        self.retry_backoff = max(1, upload_conf['retry_backoff'])
+        self.pool = ConnectionPool(upload_conf['timeout'], upload_conf['chunk_size'])
+
+        if queue_dir is None:
+            from storage.history import get_cache_dir
+            queue_dir = get_cache_dir() / "uploads"
+        self.queue_dir = Path(queue_dir)
+        self.queue_dir.mkdir(parents=True, exist_ok=True)
+
+        self._jobs = {}
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._load_queue()
+
+        self._thread = threading.Thread(target=self._run, name="upload", daemon=True)
+        self._thread.start()
+
+    def _claimed_path(self, job_id):
+        return self.queue_dir / f"{job_id}.{os.getpid()}{CLAIM_SUFFIX}"
+
+    def _claim(self, entry):
+        """
+        Takes over a queue entry by renaming it to this process's claim, or
+        returns None if it isn't free. The rename is atomic, so of several
+        processes trying at once exactly one succeeds.
+        """
+        if entry.name.startswith("."):
+            return None
+        job_id, *owner = entry.name.split(".")[:-1]
+        if entry.suffix == CLAIM_SUFFIX:
+            try:
+                owner_pid = int(owner[0])
+            except (IndexError, ValueError):
+                return None
+            if _process_alive(owner_pid):
+                return None
+        elif entry.suffix != QUEUE_SUFFIX:
+            return None
+
+        claimed = self._claimed_path(job_id)
+        try:
+            os.rename(entry, claimed)
+        except FileNotFoundError:
+            # Someone else claimed it first.
+            return None
+        return job_id, claimed
+
+    def _load_queue(self):
+        for entry in sorted(self.queue_dir.iterdir()):
+            claim = self._claim(entry)
+            if claim is None:
+                continue
+            job_id, claimed = claim
+            try:
+                with open(claimed) as f:
+                    record = json.load(f)
+                job = UploadJob(job_id, Path(record["path"]), record["attempts"], record["next_attempt"])
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Dropping unreadable upload queue entry {entry.name}: {e}")
+                claimed.unlink(missing_ok=True)
+                continue
+            self._jobs[job.job_id] = job
+        if self._jobs:
+            logger.info(f"{len(self._jobs)} queued uploads pending")
+
+    def _persist(self, job):
+        path = self._claimed_path(job.job_id)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"path": str(job.path), "attempts": job.attempts, "next_attempt": job.next_attempt}, f)
+        os.replace(tmp_path, path)
+
+    def _forget(self, job):
+        self._claimed_path(job.job_id).unlink(missing_ok=True)
+
+    def _release(self):
+        # Hands the pending jobs back to the shared queue. Called with the
+        # condition held.
+        for job in self._jobs.values():
+            try:
+                os.rename(self._claimed_path(job.job_id), self.queue_dir / f"{job.job_id}{QUEUE_SUFFIX}")
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not release queued upload {job.job_id}: {e}")
+        self._jobs.clear()
+
+    def submit(self, path, on_uploaded=None):
+        """Queues a saved file for upload.
+
+        Args:
+            path (Path): the file to upload.
+            on_uploaded (Callable, optional): called on the upload thread
+                as on_uploaded(url, error) after the first attempt; url is
+                None if it failed.
+        """
+        job = UploadJob(f"{time.time_ns()}-{os.getpid()}", Path(path), on_uploaded=on_uploaded)
+        try:
+            self._persist(job)
+        except OSError as e:
+            # Still worth one attempt, it just won't survive a restart.
+            logger.warning(f"Could not queue the upload on disk: {e}")
+        with self._condition:
+            self._jobs[job.job_id] = job
+            self._condition.notify()
+
+    def shutdown(self, wait=True):
+        """
+        Stops the upload thread. Pending retries stay queued on disk, free
+        for the next Uploader to claim.
+        """
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if wait:
+            self._thread.join()
+        with self._condition:
+            self._release()
+        self.pool.close()
+
+    def _next_due(self):
+        # Called with the condition held; returns a due job or waits.
+        while not self._stopping:
+            now = time.time()
+            if self._jobs:
+                job = min(self._jobs.values(), key=lambda job: job.next_attempt)
+                if job.next_attempt <= now:
+                    return job
+                self._condition.wait(job.next_attempt - now)
+            else:
+                self._condition.wait()
+        return None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                job = self._next_due()
+            if job is None:
+                return
+            self._attempt(job)
+
+    def _attempt(self, job):
+        url, error = None, None
+        try:
+            with tracer.span("upload", attempt=job.attempts + 1):
+                url = self.upload(job.path)
+        except UploadError as e:
+            error = e
+
+        with self._condition:
+            job.attempts += 1
+            # False if shutdown() released the job while it was attempted.
+            claimed = job.job_id in self._jobs
+            if error is None or not error.retryable or job.attempts >= self.max_attempts:
+                self._jobs.pop(job.job_id, None)
+                self._forget(job)
+                if not claimed:
+                    (self.queue_dir / f"{job.job_id}{QUEUE_SUFFIX}").unlink(missing_ok=True)
+                if error is None:
+                    logger.info(f"Uploaded {job.path.name}: {url}")
+                else:
+                    logger.error(f"Giving up on uploading {job.path.name} after {job.attempts} attempts: {error}")
+            else:
+                # Jitter keeps many clients from retrying in lockstep after
+                # an outage.
+                delay = min(MAX_BACKOFF_SECONDS, self.retry_backoff * 2 ** (job.attempts - 1))
+                job.next_attempt = time.time() + delay * random.uniform(1.0, 1.25)
+                logger.warning(f"Upload of {job.path.name} failed ({error}), retrying in {delay:.0f} s")
+                if claimed:
+                    try:
+                        self._persist(job)
+                    except OSError as e:
+                        logger.warning(f"Could not update the upload queue: {e}")
+
+        callback, job.on_uploaded = job.on_uploaded, None
+        if callback is not None:
+            try:
+                callback(url, error)
+            except Exception as e:
+                logger.error(f"Upload callback failed: {e}")
+
+    def upload(self, path):
+        """Uploads one file right away.
+
+        Returns:
+            str: the URL the host returned.
+
+        Raises:
+            UploadError: if the upload failed; retryable tells whether
+            trying again later could help.
+        """
+        try:
+            size = os.path.getsize(path)
+        except OSError as e:
+            raise UploadError(f"Cannot read {path}: {e}", retryable=False) from e
+
+        headers = {
+            "Content-Type": mimetypes.guess_type(path.name)[0] or "application/octet-stream",
+            "Content-Length": str(size),
+            "X-Filename": path.name,
+        }
+        if self.authorization:
+            headers["Authorization"] = self.authorization
+
+        status, response_headers, body = self.pool.send_file(self.method, self.url, path, headers)
+        if not 200 <= status < 300:
+            raise UploadError(f"Server replied {status}", retryable=status in RETRYABLE_STATUSES)
+        return self._parse_url(response_headers, body)
+
+    def _parse_url(self, headers, body):
+        content_type = next((value for key, value in headers.items() if key.lower() == "content-type"), "")
+        text = body.decode(errors="replace").strip()
+        if "json" in content_type:
+            try:
+                text = str(json.loads(text)[self.response_url_key])
+            except (ValueError, KeyError, TypeError) as e:
+                raise UploadError(f"No '{self.response_url_key}' in the server's reply", retryable=False) from e
+        if not text:
+            raise UploadError("The server replied without a URL", retryable=False)
+        return text
+
+
+def create_uploader(conf):
+    """
+    Returns an Uploader if uploads are enabled and configured, else None.
+    """
+    upload_conf = conf.get('upload', {})
+    if not upload_conf.get('enabled', False):
+        return None
+    if not upload_conf.get('url'):
+        logger.error("Uploads are enabled but [upload] url is empty.")
+        return None
+    return Uploader(conf)
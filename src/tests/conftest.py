@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The modules import each other from the src directory, as main.py does.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
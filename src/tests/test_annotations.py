@@ -0,0 +1,70 @@
+from ui.annotations import AnnotationLayer, Shape
+
+
+def snapshot(layer):
+    return [(shape.id, shape.type, shape.x1, shape.y1, shape.x2, shape.y2) for shape in layer]
+
+
+def test_undo_redo_add_move_remove():
+    layer = AnnotationLayer()
+    rect = Shape('rect', 10, 10, 100, 80)
+    arrow = Shape('arrow', 200, 200, 300, 250)
+    layer.add(rect)
+    layer.add(arrow)
+
+    layer.begin_move(rect)
+    rect.translate(50, 5)
+    layer.end_move()
+    layer.remove(arrow)
+
+    states = [snapshot(layer)]
+    while layer.undo():
+        states.append(snapshot(layer))
+    assert states == [
+        [(0, 'rect', 60, 15, 150, 85)],
+        [(0, 'rect', 60, 15, 150, 85), (1, 'arrow', 200, 200, 300, 250)],
+        [(0, 'rect', 10, 10, 100, 80), (1, 'arrow', 200, 200, 300, 250)],
+        [(0, 'rect', 10, 10, 100, 80)],
+        [],
+    ]
+
+    redone = [snapshot(layer)]
+    while layer.redo():
+        redone.append(snapshot(layer))
+    assert redone == states[::-1]
+
+
+def test_undo_restores_z_order():
+    layer = AnnotationLayer()
+    shapes = [Shape('rect', 0, 0, 50, 50) for _ in range(3)]
+    for shape in shapes:
+        layer.add(shape)
+    layer.remove(shapes[1])
+    layer.undo()
+    assert [shape.id for shape in layer] == [0, 1, 2]
+    # Overlapping outlines: the topmost shape wins.
+    assert layer.shape_at(0, 25) is shapes[2]
+
+
+def test_new_change_clears_redo():
+    layer = AnnotationLayer()
+    layer.add(Shape('rect', 0, 0, 10, 10))
+    layer.undo()
+    layer.add(Shape('circle', 0, 0, 10, 10))
+    assert not layer.redo()
+    assert [shape.type for shape in layer] == ['circle']
+
+
+def test_moved_shape_is_found_at_its_new_place():
+    layer = AnnotationLayer()
+    shape = Shape('pixelate', 0, 0, 40, 40)
+    layer.add(shape)
+    layer.begin_move(shape)
+    shape.translate(500, 500)
+    layer.end_move()
+    assert layer.shape_at(20, 20) is None
+    assert layer.shape_at(520, 520) is shape
+
+    layer.undo()
+    assert layer.shape_at(20, 20) is shape
+    assert layer.shape_at(520, 520) is None
@@ -0,0 +1,118 @@
+import random
+
+import pytest
+from PIL import Image, ImageSequence
+
+import storage.archive
+from capture.backend import Frame
+from capture.burst import changed_tiles
+from storage.archive import (
+    ArchiveError, BurstArchiveWriter, export_animation, iter_frames, read_header, read_timestamps, tile_grid,
+)
+
+
+WIDTH, HEIGHT, TILE_SIZE = 100, 70, 32
+
+
+def make_frames(count):
+    rng = random.Random(1)
+    buffer = bytearray(rng.randbytes(WIDTH * HEIGHT * 3))
+    frames = []
+    for _ in range(count):
+        frames.append(Frame(WIDTH, HEIGHT, WIDTH * 3, "RGB888", bytearray(buffer)))
+        # Touch a couple of pixels, including ones in the cropped edge tiles.
+        for _ in range(2):
+            x, y = rng.randrange(WIDTH), rng.randrange(HEIGHT)
+            buffer[(y * WIDTH + x) * 3] ^= 0xff
+    return frames
+
+
+def test_tile_grid_covers_the_frame():
+    tiles = tile_grid(WIDTH, HEIGHT, TILE_SIZE)
+    assert len(tiles) == 4 * 3
+    assert tiles[3] == (96, 0, 4, 32)
+    assert tiles[-1] == (96, 64, 4, 6)
+    assert sum(width * height for _, _, width, height in tiles) == WIDTH * HEIGHT
+
+
+def test_changed_tiles():
+    tiles = tile_grid(WIDTH, HEIGHT, TILE_SIZE)
+    first = make_frames(1)[0]
+    assert len(changed_tiles(None, first, tiles, TILE_SIZE)) == len(tiles)
+    assert changed_tiles(first, first, tiles, TILE_SIZE) == []
+
+    second = Frame(WIDTH, HEIGHT, WIDTH * 3, "RGB888", bytearray(first.buffer))
+    second.buffer[(65 * WIDTH + 97) * 3 + 1] ^= 1
+    changes = changed_tiles(first, second, tiles, TILE_SIZE)
+    assert [index for index, _ in changes] == [len(tiles) - 1]
+    assert len(changes[0][1]) == 4 * 6 * 3
+
+
+def test_archive_round_trip(tmp_path):
+    frames = make_frames(6)
+    tiles = tile_grid(WIDTH, HEIGHT, TILE_SIZE)
+    path = tmp_path / "burst.ssb"
+    with BurstArchiveWriter(path, WIDTH, HEIGHT, TILE_SIZE, output="DP-1") as writer:
+        previous = None
+        for number, frame in enumerate(frames):
+            writer.write_frame(number / 2, changed_tiles(previous, frame, tiles, TILE_SIZE))
+            previous = frame
+
+    with open(path, "rb") as f:
+        header = read_header(f)
+    assert (header["width"], header["height"], header["output"]) == (WIDTH, HEIGHT, "DP-1")
+
+    replayed = [(timestamp, bytes(frame.buffer)) for timestamp, frame in iter_frames(path)]
+    assert replayed == [(number / 2, bytes(frame.buffer)) for number, frame in enumerate(frames)]
+
+
+def write_archive(path, frames, interval=0.25):
+    tiles = tile_grid(WIDTH, HEIGHT, TILE_SIZE)
+    with BurstArchiveWriter(path, WIDTH, HEIGHT, TILE_SIZE) as writer:
+        previous = None
+        for number, frame in enumerate(frames):
+            writer.write_frame(number * interval, changed_tiles(previous, frame, tiles, TILE_SIZE))
+            previous = frame
+
+
+@pytest.mark.parametrize("extension", ["png", "webp"])
+def test_export_animation(tmp_path, extension):
+    frames = make_frames(5)
+    write_archive(tmp_path / "burst.ssb", frames)
+    target = tmp_path / f"burst.{extension}"
+    assert export_animation(tmp_path / "burst.ssb", target) == 5
+
+    with Image.open(target) as animation:
+        exported = [
+            (image.convert("RGB").tobytes(), image.info["duration"]) for image in ImageSequence.Iterator(animation)
+        ]
+    assert exported == [(bytes(frame.buffer), 250) for frame in frames]
+
+
+def test_export_gif(tmp_path):
+    write_archive(tmp_path / "burst.ssb", make_frames(4))
+    assert export_animation(tmp_path / "burst.ssb", tmp_path / "burst.gif") == 4
+    with Image.open(tmp_path / "burst.gif") as animation:
+        assert animation.n_frames == 4
+
+
+def test_export_refuses_animations_too_large_for_memory(tmp_path, monkeypatch):
+    write_archive(tmp_path / "burst.ssb", make_frames(4))
+    monkeypatch.setattr(storage.archive, "MAX_ANIMATION_BYTES", 3 * WIDTH * HEIGHT * 3)
+    with pytest.raises(ArchiveError, match="too long"):
+        export_animation(tmp_path / "burst.ssb", tmp_path / "burst.gif")
+    assert not (tmp_path / "burst.gif").exists()
+
+
+def test_truncated_archive_stops_early(tmp_path):
+    frames = make_frames(3)
+    tiles = tile_grid(WIDTH, HEIGHT, TILE_SIZE)
+    path = tmp_path / "burst.ssb"
+    with BurstArchiveWriter(path, WIDTH, HEIGHT, TILE_SIZE) as writer:
+        writer.write_frame(0.0, changed_tiles(None, frames[0], tiles, TILE_SIZE))
+        writer.write_frame(0.5, changed_tiles(frames[0], frames[1], tiles, TILE_SIZE))
+    path.write_bytes(path.read_bytes()[:-5])
+
+    replayed = [bytes(frame.buffer) for _, frame in iter_frames(path)]
+    assert replayed == [bytes(frames[0].buffer)]
+    assert read_timestamps(path) == [0.0]
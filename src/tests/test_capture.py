@@ -0,0 +1,57 @@
+import io
+
+import pytest
+
+from bench.fakes import synthetic_frame
+from capture.backend import CaptureError, Frame, crop_frame, read_ppm
+
+
+def numbered_frame(width, height):
+    # Every pixel holds its own coordinates, so crops are easy to check.
+    buffer = bytearray()
+    for y in range(height):
+        for x in range(width):
+            buffer += bytes((x, y, 7))
+    return Frame(width, height, width * 3, "RGB888", buffer)
+
+
+def test_read_ppm():
+    data = synthetic_frame(64, 48)
+    frame = read_ppm(io.BytesIO(data))
+    assert (frame.width, frame.height, frame.stride, frame.format) == (64, 48, 192, "RGB888")
+    assert bytes(frame.buffer) == data[-64 * 48 * 3:]
+
+
+def test_read_ppm_skips_comments():
+    frame = read_ppm(io.BytesIO(b"P6\n# made by grim\n2 1\n255\n" + bytes(range(6))))
+    assert (frame.width, frame.height) == (2, 1)
+    assert bytes(frame.buffer) == bytes(range(6))
+
+
+@pytest.mark.parametrize("data", [
+    b"P6\n2 2\n255\n" + bytes(11),
+    b"P6\n2 2",
+    b"P5\n2 2\n255\n" + bytes(4),
+    b"P6\n2 2\n65535\n" + bytes(24),
+])
+def test_read_ppm_rejects_bad_input(data):
+    with pytest.raises(CaptureError):
+        read_ppm(io.BytesIO(data))
+
+
+def test_crop_frame():
+    cropped = crop_frame(numbered_frame(10, 8), 2, 3, 4, 2)
+    assert (cropped.width, cropped.height, cropped.stride) == (4, 2, 12)
+    assert bytes(cropped.buffer) == b"".join(bytes((x, y, 7)) for y in (3, 4) for x in range(2, 6))
+
+
+def test_crop_frame_clips_to_the_frame():
+    cropped = crop_frame(numbered_frame(10, 8), -3, 6, 5, 10)
+    assert (cropped.width, cropped.height) == (2, 2)
+    assert bytes(cropped.buffer[:3]) == bytes((0, 6, 7))
+
+
+def test_crop_frame_outside_the_frame():
+    with pytest.raises(CaptureError):
+        crop_frame(numbered_frame(10, 8), 10, 0, 5, 5)
+
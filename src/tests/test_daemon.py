@@ -0,0 +1,111 @@
+import os
+import time
+import threading
+
+import pytest
+
+from bench.fakes import FakeDesktop
+from capture.backend import CaptureBackend, CaptureError, Frame
+from config.config import get_default_config
+from daemon.client import send_command
+
+
+class SlowBackend(CaptureBackend):
+    def __init__(self, delay, fail=False):
+        self.delay = delay
+        self.fail = fail
+
+    def capture(self, output):
+        time.sleep(self.delay)
+        if self.fail:
+            raise CaptureError("grim exited with status 1")
+        return Frame(64, 48, 64 * 3, "RGB888", bytearray(64 * 48 * 3))
+
+
+@pytest.fixture(scope="module")
+def app():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+def run_client(app, client, timeout=10):
+    """Runs client() on a thread while the Qt event loop spins, and returns its result."""
+    result = {}
+    done = threading.Event()
+
+    def target():
+        try:
+            result["value"] = client()
+        finally:
+            done.set()
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    deadline = time.monotonic() + timeout
+    while not done.is_set() and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.005)
+    thread.join(1)
+    return result.get("value")
+
+
+# Kept alive for the whole session: Qt may still deliver events to a
+# daemon's sockets after its test ends.
+_DAEMONS = []
+
+
+@pytest.fixture
+def daemon_factory(app, tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    from daemon.server import ScreenShortDaemon
+
+    daemons = []
+
+    def make(backend):
+        conf = get_default_config()
+        conf['paths']['save_dir'] = str(tmp_path / "shots")
+        daemon = ScreenShortDaemon(app, conf, socket_path=tmp_path / "daemon.sock", backend=backend)
+        assert daemon.start()
+        daemons.append(daemon)
+        return daemon
+
+    with FakeDesktop():
+        yield make
+    for daemon in daemons:
+        daemon.overlay.hide()
+        daemon.stop()
+    _DAEMONS.extend(daemons)
+
+
+def test_socket_is_served_while_grim_runs(app, daemon_factory):
+    daemon = daemon_factory(SlowBackend(delay=1.0))
+    socket_path = daemon.socket_path
+
+    def client():
+        replies = {}
+        capture = threading.Thread(target=lambda: replies.update(capture=send_command("capture", socket_path, 5)))
+        capture.start()
+        time.sleep(0.2)
+        started = time.monotonic()
+        replies["ping"] = send_command("ping", socket_path, 5)
+        replies["ping_seconds"] = time.monotonic() - started
+        replies["second"] = send_command("capture", socket_path, 5)
+        capture.join()
+        return replies
+
+    replies = run_client(app, client)
+    assert replies["ping"] == "pong"
+    assert replies["ping_seconds"] < 0.5
+    assert replies["second"] == "busy"
+    assert replies["capture"] == "ok"
+    assert daemon.overlay.isVisible()
+
+
+def test_failed_capture_is_reported(app, daemon_factory):
+    daemon = daemon_factory(SlowBackend(delay=0.1, fail=True))
+    assert run_client(app, lambda: send_command("capture", daemon.socket_path, 5)) == "error: capture failed"
+    assert not daemon.overlay.isVisible()
+    # The next capture isn't refused as busy.
+    daemon.backend.fail = False
+    assert run_client(app, lambda: send_command("capture", daemon.socket_path, 5)) == "ok"
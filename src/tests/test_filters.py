@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+import pytest
+
+from config.config import get_default_config
+from utils.filters import box_blur, pixelate
+
+
+def random_image(height, width, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+
+def test_pixelate_uses_block_means():
+    rgb = np.zeros((3, 5, 3), dtype=np.uint8)
+    rgb[0, 0] = (40, 80, 120)
+    result = pixelate(rgb, 2)
+    assert result.shape == rgb.shape
+    assert (result[:2, :2] == (10, 20, 30)).all()
+    assert (result[:2, 2:] == 0).all()
+    assert (result[2:] == 0).all()
+
+
+def test_box_blur_keeps_flat_images():
+    rgb = np.full((20, 30, 3), 77, dtype=np.uint8)
+    assert (box_blur(rgb, 4) == 77).all()
+
+
+def test_box_blur_is_deterministic():
+    rgb = random_image(40, 50)
+    assert np.array_equal(box_blur(rgb, 3), box_blur(rgb.copy(), 3))
+
+
+@pytest.fixture(scope="module")
+def app():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.mark.parametrize("kind", ["pixelate", "blur"])
+def test_redactor_tiles_match_the_whole_image_filter(app, kind):
+    from PySide6.QtGui import QImage, QPixmap
+    from ui.redact import BLUR_PASSES, Redactor
+
+    rgb = random_image(150, 230, seed=1)
+    image = QImage(rgb.tobytes(), 230, 150, 230 * 3, QImage.Format.Format_RGB888)
+    conf = get_default_config()
+    conf['editing'].update(pixelate_block_size=7, blur_radius=3)
+    redactor = Redactor(QPixmap.fromImage(image), conf, tile_size=64)
+
+    if kind == "pixelate":
+        expected = pixelate(rgb, 7)
+    else:
+        expected = box_blur(rgb, 3, BLUR_PASSES)
+
+    size = redactor.tile_size
+    assert size % 7 == 0
+    for row in range(-(-150 // size)):
+        for column in range(-(-230 // size)):
+            redactor._tile(kind, column, row)
+            _, pixels = redactor._tiles[(kind, column, row)]
+            top, left = row * size, column * size
+            assert np.array_equal(pixels, expected[top:top + size, left:left + size])
@@ -0,0 +1,99 @@
+import os
+import time
+from datetime import datetime
+
+import pytest
+from PIL import Image
+
+from capture.backend import Frame
+from storage.history import HistoryIndex, capture_time, parse_since
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = HistoryIndex(tmp_path / "history.sqlite3", tmp_path / "thumbnails", thumbnail_size=32)
+    yield history
+    history.close()
+
+
+def write_image(path, size=(64, 48), colour=(200, 30, 30)):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.new("RGB", size, colour).save(path)
+    return path
+
+
+def test_scan_only_indexes_changed_files(history, tmp_path):
+    shots = tmp_path / "shots"
+    for number in range(5):
+        write_image(shots / f"screenshot-2024-01-0{number + 1}_10-00-00.png")
+    (shots / "notes.txt").write_text("not an image")
+    (shots / ".hidden.png").write_bytes(b"")
+
+    assert history.scan(shots, max_workers=1) == (5, 0)
+    assert history.scan(shots, max_workers=1) == (0, 0)
+
+    changed = shots / "screenshot-2024-01-02_10-00-00.png"
+    write_image(changed, size=(80, 40))
+    stat = changed.stat()
+    os.utime(changed, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    (shots / "screenshot-2024-01-05_10-00-00.png").unlink()
+    assert history.scan(shots, max_workers=1) == (1, 1)
+
+    rows = history.query(directory=shots)
+    assert len(rows) == 4
+    row = next(row for row in rows if row["path"] == str(changed))
+    assert (row["width"], row["height"]) == (80, 40)
+    assert os.path.exists(row["thumbnail"])
+
+
+def test_scan_keeps_unreadable_files_listed(history, tmp_path):
+    shots = tmp_path / "shots"
+    shots.mkdir()
+    (shots / "broken.png").write_bytes(b"not a png")
+    assert history.scan(shots, max_workers=1) == (1, 0)
+    row, = history.query(directory=shots)
+    assert row["width"] is None and row["thumbnail"] is None
+
+
+def test_scan_of_missing_directory(history, tmp_path):
+    assert history.scan(tmp_path / "missing", max_workers=1) == (0, 0)
+
+
+def test_record_uses_the_saved_image(history, tmp_path):
+    path = write_image(tmp_path / "shot.png", size=(4, 2))
+    frame = Frame(4, 2, 12, "RGB888", bytearray(b"\x10" * 24))
+    history.record(path, frame, monitor="DP-1", captured_at=1000.0)
+
+    row, = history.query()
+    assert (row["width"], row["height"], row["monitor"], row["captured_at"]) == (4, 2, "DP-1", 1000.0)
+    with Image.open(row["thumbnail"]) as thumbnail:
+        assert thumbnail.size == (4, 2)
+
+
+def test_query_filters(history, tmp_path):
+    for number, monitor in enumerate(["DP-1", "HDMI-A-1", "DP-1", "DP-1"]):
+        path = write_image(tmp_path / ("work" if number < 2 else "home") / f"shot-{number}.png")
+        history.record(path, monitor=monitor, captured_at=1000.0 + number)
+
+    def names(**filters):
+        return [os.path.basename(row["path"]) for row in history.query(**filters)]
+
+    assert names() == ["shot-3.png", "shot-2.png", "shot-1.png", "shot-0.png"]
+    assert names(limit=2) == ["shot-3.png", "shot-2.png"]
+    assert names(since=1001.0, until=1003.0) == ["shot-2.png", "shot-1.png"]
+    assert names(monitor="DP-1") == ["shot-3.png", "shot-2.png", "shot-0.png"]
+    assert names(match="shot-1") == ["shot-1.png"]
+    assert names(directory=tmp_path / "work", monitor="DP-1") == ["shot-0.png"]
+
+
+def test_capture_time():
+    expected = datetime(2024, 3, 4, 5, 6, 7).timestamp()
+    assert capture_time("/x/screenshot-2024-03-04_05-06-07-2.png", 1.0) == expected
+    assert capture_time("/x/holiday.png", 1.0) == 1.0
+
+
+def test_parse_since():
+    assert abs(parse_since("2h") - (time.time() - 7200)) < 5
+    assert parse_since("2024-03-04") == datetime(2024, 3, 4).timestamp()
+    with pytest.raises(ValueError):
+        parse_since("yesterday")
@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+import utils.utils
+from bench.fakes import FakeDesktop
+from ipc.fake import FakeHyprlandServer
+from ipc.hyprland import BATCH_PREFIX, HyprlandIPC, HyprlandIPCError
+
+
+MONITORS = [{"name": "DP-1", "x": 0, "y": 0, "width": 2560, "height": 1440, "scale": 1.0}]
+CLIENTS = [{"at": [10, 10], "size": [500, 400]}, {"at": [600, 10], "size": [500, 400]}]
+WORKSPACE = {"id": 3, "monitor": "DP-1"}
+
+
+@pytest.fixture
+def server():
+    with FakeHyprlandServer({"monitors": MONITORS, "clients": CLIENTS, "activeworkspace": WORKSPACE}) as server:
+        yield server
+
+
+def test_single_query(server):
+    client = HyprlandIPC(socket_path=server.socket_path)
+    assert client.query("monitors") == [MONITORS]
+    assert server.requests == ["j/monitors"]
+
+
+def test_batched_query_is_one_round_trip(server):
+    client = HyprlandIPC(socket_path=server.socket_path)
+    assert client.query("clients", "monitors", "activeworkspace") == [CLIENTS, MONITORS, WORKSPACE]
+    assert server.requests == [f"{BATCH_PREFIX}j/clients;j/monitors;j/activeworkspace"]
+
+
+def test_repeated_command_is_requested_once(server):
+    client = HyprlandIPC(socket_path=server.socket_path)
+    assert client.query("monitors", "monitors") == [MONITORS, MONITORS]
+    assert server.requests == ["j/monitors"]
+
+
+def test_replies_are_cached_for_ttl(server):
+    client = HyprlandIPC(socket_path=server.socket_path, ttl=0.2)
+    client.query("monitors")
+    # Only the command that isn't cached yet goes to the socket.
+    assert client.query("monitors", "clients") == [MONITORS, CLIENTS]
+    assert server.requests == ["j/monitors", "j/clients"]
+
+    time.sleep(0.25)
+    client.query("monitors")
+    client.invalidate()
+    client.query("clients")
+    assert server.requests == ["j/monitors", "j/clients", "j/monitors", "j/clients"]
+
+
+def test_unknown_command_is_an_error(server):
+    client = HyprlandIPC(socket_path=server.socket_path)
+    with pytest.raises(HyprlandIPCError):
+        client.query("monitors", "nonsense")
+
+
+def test_missing_socket_is_an_error(tmp_path):
+    client = HyprlandIPC(socket_path=tmp_path / "missing.sock")
+    with pytest.raises(HyprlandIPCError):
+        client.query("monitors")
+
+
+def test_hyprland_query_uses_the_socket(server, monkeypatch):
+    monkeypatch.setattr(utils.utils, "get_client", lambda: HyprlandIPC(socket_path=server.socket_path))
+    monkeypatch.setenv("PATH", "")
+    assert utils.utils.hyprland_query("activeworkspace", "monitors") == [WORKSPACE, MONITORS]
+
+
+def test_hyprland_query_falls_back_to_hyprctl(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils.utils, "get_client", lambda: HyprlandIPC(socket_path=tmp_path / "missing.sock"))
+    with FakeDesktop(monitors=2) as desktop:
+        assert utils.utils.hyprland_query("activeworkspace", "monitors") == [
+            desktop.replies["activeworkspace"], desktop.replies["monitors"]
+        ]
+        assert utils.utils.get_monitor_data() == {
+            "FAKE-1": (0, 0, 1920, 1080, 1.0),
+            "FAKE-2": (1920, 0, 1920, 1080, 1.0),
+        }
@@ -0,0 +1,84 @@
+import pytest
+
+from capture.backend import CaptureError, Frame
+from capture.multi import capture_region, desktop_bounds, stitch_frames, to_frame_rect
+
+
+def solid_frame(width, height, colour):
+    return Frame(width, height, width * 3, "RGB888", bytearray(bytes(colour) * (width * height)))
+
+
+def pixel(frame, x, y):
+    start = y * frame.stride + x * 3
+    return tuple(frame.buffer[start:start + 3])
+
+
+class FakeBackend:
+    def __init__(self, frames):
+        self.frames = frames
+        self.captured = []
+
+    def capture(self, output):
+        self.captured.append(output)
+        return self.frames[output]
+
+
+def test_to_frame_rect():
+    assert to_frame_rect(1930, 10, 100, 50, 1920, 0, 1.0) == (10, 10, 100, 50)
+    assert to_frame_rect(10, 20, 100, 50, 0, 0, 2.0) == (20, 40, 200, 100)
+    # Fractional scales round outwards, so the whole region is covered.
+    assert to_frame_rect(1, 1, 3, 3, 0, 0, 1.5) == (1, 1, 5, 5)
+
+
+def test_desktop_bounds():
+    monitors = {"A": (0, 0, 1920, 1080, 2.0), "B": (1920, -200, 1280, 1024, 1.0)}
+    assert desktop_bounds(monitors) == (0, -200, 3200, 1280)
+
+
+def test_stitch_mixed_scales():
+    # A is a 40x20 panel at scale 2, B a 30x10 one at scale 1 to its right.
+    geometry = {"A": (0, 0, 20, 10, 2.0), "B": (20, 0, 30, 10, 1.0)}
+    frames = {"A": solid_frame(40, 20, (255, 0, 0)), "B": solid_frame(30, 10, (0, 0, 255))}
+    stitched, origin = stitch_frames(frames, geometry)
+
+    assert origin == (0, 0)
+    assert (stitched.width, stitched.height) == (100, 20)
+    assert pixel(stitched, 39, 19) == (255, 0, 0)
+    assert pixel(stitched, 40, 0) == (0, 0, 255)
+    assert pixel(stitched, 99, 19) == (0, 0, 255)
+
+
+def test_stitch_leaves_gaps_black():
+    geometry = {"A": (100, 100, 10, 10, 1.0), "B": (110, 105, 10, 10, 1.0)}
+    frames = {"A": solid_frame(10, 10, (9, 9, 9)), "B": solid_frame(10, 10, (9, 9, 9))}
+    stitched, origin = stitch_frames(frames, geometry)
+    assert origin == (100, 100)
+    assert (stitched.width, stitched.height) == (20, 15)
+    assert pixel(stitched, 15, 0) == (0, 0, 0)
+    assert pixel(stitched, 5, 12) == (0, 0, 0)
+
+
+def test_capture_region_on_one_scaled_output():
+    monitors = {"A": (0, 0, 20, 10, 2.0), "B": (20, 0, 30, 10, 1.0)}
+    backend = FakeBackend({"A": solid_frame(40, 20, (255, 0, 0)), "B": solid_frame(30, 10, (0, 0, 255))})
+    frame, name = capture_region(backend, monitors, 5, 2, 10, 5)
+    assert name == "A"
+    assert backend.captured == ["A"]
+    assert (frame.width, frame.height) == (20, 10)
+
+
+def test_capture_region_across_outputs():
+    monitors = {"A": (0, 0, 20, 10, 2.0), "B": (20, 0, 30, 10, 1.0)}
+    backend = FakeBackend({"A": solid_frame(40, 20, (255, 0, 0)), "B": solid_frame(30, 10, (0, 0, 255))})
+    frame, name = capture_region(backend, monitors, 15, 0, 10, 10)
+    assert name is None
+    assert sorted(backend.captured) == ["A", "B"]
+    assert (frame.width, frame.height) == (20, 20)
+    assert pixel(frame, 9, 0) == (255, 0, 0)
+    assert pixel(frame, 10, 0) == (0, 0, 255)
+
+
+def test_capture_region_off_every_output():
+    monitors = {"A": (0, 0, 20, 10, 1.0)}
+    with pytest.raises(CaptureError):
+        capture_region(FakeBackend({}), monitors, 50, 50, 5, 5)
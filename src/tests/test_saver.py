@@ -0,0 +1,116 @@
+import os
+import errno
+import threading
+
+import pytest
+
+import storage.saver
+from config.config import get_default_config
+from storage.saver import FILE_MODE, SaveWorker, _link_unique, write_atomic
+
+
+def hidden_files(directory):
+    return [entry.name for entry in directory.iterdir() if entry.name.startswith(".")]
+
+
+def test_same_stem_gets_a_suffix(tmp_path):
+    first = write_atomic(tmp_path, "shot", "png", b"one")
+    second = write_atomic(tmp_path, "shot", "png", b"two")
+    third = write_atomic(tmp_path, "shot", "png", b"three")
+    assert [first.name, second.name, third.name] == ["shot.png", "shot-1.png", "shot-2.png"]
+    assert [path.read_bytes() for path in (first, second, third)] == [b"one", b"two", b"three"]
+    assert hidden_files(tmp_path) == []
+
+
+def test_existing_file_is_never_overwritten(tmp_path):
+    (tmp_path / "shot.png").write_bytes(b"precious")
+    path = write_atomic(tmp_path, "shot", "png", b"new")
+    assert path.name == "shot-1.png"
+    assert (tmp_path / "shot.png").read_bytes() == b"precious"
+
+
+def test_creates_missing_directory(tmp_path):
+    path = write_atomic(tmp_path / "a" / "b", "shot", "png", b"data", fsync=True)
+    assert path.read_bytes() == b"data"
+
+
+def test_mode_follows_the_umask(tmp_path):
+    plain = tmp_path / "plain"
+    plain.write_bytes(b"")
+    path = write_atomic(tmp_path, "shot", "png", b"data")
+    assert path.stat().st_mode & 0o777 == FILE_MODE == plain.stat().st_mode & 0o777
+
+
+def test_without_hard_links_falls_back_without_overwriting(tmp_path, monkeypatch):
+    def no_links(source, target):
+        raise OSError(errno.EPERM, "Operation not permitted")
+
+    (tmp_path / "shot.png").write_bytes(b"precious")
+    tmp = tmp_path / ".tmp"
+    tmp.write_bytes(b"new")
+    monkeypatch.setattr(os, "link", no_links)
+    path = _link_unique(tmp, tmp_path, "shot", "png")
+    assert path.name == "shot-1.png"
+    assert path.read_bytes() == b"new"
+    assert (tmp_path / "shot.png").read_bytes() == b"precious"
+
+
+def make_worker(tmp_path, on_saved=None):
+    conf = get_default_config()
+    conf['paths']['save_dir'] = str(tmp_path)
+    conf['history']['enabled'] = False
+    return SaveWorker(conf, on_saved)
+
+
+def test_worker_saves_and_calls_back(tmp_path):
+    calls = []
+    worker = make_worker(tmp_path, lambda path, error: calls.append(("worker", path, error)))
+    worker.submit("image", lambda image: image.encode(), "png",
+                  on_saved=lambda path, error: calls.append(("job", path, error)))
+    worker.shutdown()
+
+    (_, path, error), second = calls
+    assert error is None
+    assert path.parent == tmp_path and path.name.startswith("screenshot-") and path.suffix == ".png"
+    assert path.read_bytes() == b"image"
+    # The worker-wide callback runs first.
+    assert second == ("job", path, None)
+
+
+def test_encode_error_reaches_the_callbacks(tmp_path):
+    calls = []
+
+    def encode(image):
+        raise ValueError("no encoder")
+
+    worker = make_worker(tmp_path, lambda path, error: calls.append(("worker", path, error)))
+    worker.submit("image", encode, on_saved=lambda path, error: calls.append(("job", path, error)))
+    worker.shutdown()
+
+    assert [(name, path, str(error)) for name, path, error in calls] == [
+        ("worker", None, "no encoder"), ("job", None, "no encoder")
+    ]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_failing_callback_does_not_stop_the_worker(tmp_path):
+    saved = threading.Event()
+
+    def broken(path, error):
+        raise RuntimeError("callback bug")
+
+    worker = make_worker(tmp_path, broken)
+    worker.submit(b"1", bytes)
+    worker.submit(b"2", bytes, on_saved=lambda path, error: saved.set())
+    assert saved.wait(5)
+    worker.shutdown()
+    assert sorted(path.read_bytes() for path in tmp_path.iterdir()) == [b"1", b"2"]
+
+
+@pytest.mark.parametrize("umask", [0o022, 0o077])
+def test_file_mode_is_taken_from_the_umask(umask):
+    previous = os.umask(umask)
+    try:
+        assert storage.saver._current_umask() == umask
+    finally:
+        os.umask(previous)
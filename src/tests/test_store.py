@@ -0,0 +1,114 @@
+import json
+
+import pytest
+
+import storage.store
+from capture.backend import Frame
+from config.config import get_default_config
+from storage.saver import FILE_MODE
+from storage.store import ContentStore, create_store, pixel_digest
+
+
+def desktop_frame(width=320, height=200):
+    # Stripes with some structure, so the perceptual hash has edges to see.
+    buffer = bytearray()
+    for y in range(height):
+        for x in range(width):
+            value = (x * 7 + (y // 20) * 40) % 256
+            buffer += bytes((value, 255 - value, (x + y) % 256))
+    return Frame(width, height, width * 3, "RGB888", buffer)
+
+
+def with_line_of_text(frame):
+    buffer = bytearray(frame.buffer)
+    y = frame.height // 2
+    for x in range(20, 120):
+        buffer[y * frame.stride + x * 3] ^= 0xff
+    return Frame(frame.width, frame.height, frame.stride, frame.format, buffer)
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, image):
+        self.calls += 1
+        return bytes(image.buffer[:64])
+
+
+def read_index(directory):
+    with open(directory / ".objects" / "index.jsonl") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_identical_capture_is_stored_once(tmp_path):
+    store = ContentStore(tmp_path, "exact")
+    encode = CountingEncoder()
+    frame = desktop_frame()
+
+    first, first_duplicate = store.save(frame, encode, "png", "shot")
+    second, second_duplicate = store.save(desktop_frame(), encode, "png", "shot")
+
+    assert (first.name, first_duplicate) == ("shot.png", False)
+    assert (second.name, second_duplicate) == ("shot-1.png", True)
+    assert encode.calls == 1
+    assert first.stat().st_ino == second.stat().st_ino
+    assert store.object_path(pixel_digest(frame), "png").stat().st_nlink == 3
+    assert [entry["digest"] for entry in read_index(tmp_path)] == [pixel_digest(frame)] * 2
+
+
+def test_objects_get_the_usual_permissions(tmp_path):
+    store = ContentStore(tmp_path, "exact")
+    path, _ = store.save(desktop_frame(), CountingEncoder(), "png", "shot")
+    assert path.stat().st_mode & 0o777 == FILE_MODE
+    assert [entry.name for entry in path.parent.iterdir() if entry.name.endswith(".tmp")] == []
+
+
+def test_exact_mode_skips_the_perceptual_hash(tmp_path, monkeypatch):
+    def fail(image):
+        raise AssertionError("perceptual_hash called in exact mode")
+
+    monkeypatch.setattr(storage.store, "perceptual_hash", fail)
+    store = ContentStore(tmp_path, "exact")
+    store.save(desktop_frame(), CountingEncoder(), "png", "shot")
+    assert read_index(tmp_path)[0]["phash"] is None
+
+
+def test_near_duplicate_is_still_stored(tmp_path):
+    store = ContentStore(tmp_path, "perceptual", max_distance=4)
+    encode = CountingEncoder()
+    original, edited = desktop_frame(), with_line_of_text(desktop_frame())
+    assert storage.store.perceptual_hash(original) == storage.store.perceptual_hash(edited)
+
+    first, _ = store.save(original, encode, "png", "shot")
+    second, duplicate = store.save(edited, encode, "png", "shot")
+
+    assert not duplicate
+    assert encode.calls == 2
+    assert first.stat().st_ino != second.stat().st_ino
+    entries = read_index(tmp_path)
+    assert entries[0]["similar_to"] is None
+    assert entries[1]["digest"] == pixel_digest(edited)
+    assert entries[1]["similar_to"] == pixel_digest(original)
+
+
+def test_near_duplicates_are_found_across_stores(tmp_path):
+    # E.g. the daemon and a one-shot capture sharing the directory.
+    ContentStore(tmp_path, "perceptual").save(desktop_frame(), CountingEncoder(), "png", "shot")
+    ContentStore(tmp_path, "perceptual").save(with_line_of_text(desktop_frame()), CountingEncoder(), "png", "shot")
+    assert read_index(tmp_path)[1]["similar_to"] == pixel_digest(desktop_frame())
+
+
+def test_other_sizes_are_never_similar(tmp_path):
+    store = ContentStore(tmp_path, "perceptual")
+    store.save(desktop_frame(), CountingEncoder(), "png", "shot")
+    store.save(desktop_frame(160, 100), CountingEncoder(), "png", "shot")
+    assert read_index(tmp_path)[1]["similar_to"] is None
+
+
+@pytest.mark.parametrize("mode, expected", [("off", None), ("bogus", None), ("exact", "exact")])
+def test_create_store(tmp_path, mode, expected):
+    conf = get_default_config()
+    conf['storage']['dedup'] = mode
+    store = create_store(conf, tmp_path)
+    assert (store and store.mode) == expected
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from utils.tracing import MAX_PENDING_EVENTS, NULL_SPAN, Tracer, load_samples, timing_summary
+
+
+@pytest.fixture
+def tracer(monkeypatch, tmp_path):
+    monkeypatch.delenv("SCREEN_SHORT_TRACE", raising=False)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    return Tracer()
+
+
+def test_undecided_tracer_buffers_a_bounded_number_of_spans(tracer):
+    for _ in range(MAX_PENDING_EVENTS + 10):
+        with tracer.span("capture"):
+            pass
+    assert len(tracer._events) == MAX_PENDING_EVENTS
+
+
+def test_disabling_drops_buffered_spans(tracer, tmp_path):
+    with tracer.span("capture"):
+        pass
+    tracer.configure({"tracing": {"enabled": False}})
+    assert tracer._events == []
+    assert tracer.span("capture") is NULL_SPAN
+    assert tracer.start("save") is None
+    tracer.flush()
+    assert not (tmp_path / "screen-short").exists()
+
+
+def test_enabled_flush_writes_trace_and_samples(tracer, tmp_path):
+    with tracer.span("capture", output="DP-1"):
+        pass
+    tracer.configure({"tracing": {"enabled": True, "histogram_samples": 2}})
+    tracer.stop(tracer.start("save"))
+    tracer.flush()
+    tracer.stop(tracer.start("save"))
+    tracer.stop(tracer.start("save"))
+    tracer.flush()
+
+    cache_dir = tmp_path / "screen-short"
+    traces = sorted((cache_dir / "traces").glob("trace-*.json"))
+    assert len(traces) == 2
+    events = json.loads(traces[0].read_text())["traceEvents"]
+    assert [event["name"] for event in events if event["ph"] == "X"] == ["capture", "save"]
+
+    samples = load_samples(cache_dir / "timings.json")
+    assert len(samples["capture"]) == 1
+    assert len(samples["save"]) == 2
+
+
+def test_environment_overrides_the_config(monkeypatch):
+    monkeypatch.setenv("SCREEN_SHORT_TRACE", "1")
+    tracer = Tracer()
+    tracer.configure({"tracing": {"enabled": False}})
+    assert tracer.enabled
+
+
+def test_timing_summary():
+    summary = timing_summary({"save": [float(value) for value in range(1, 101)], "empty": []})
+    assert summary == {"save": {"count": 100, "p50_ms": 51.0, "p95_ms": 96.0, "max_ms": 100.0}}
@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import threading
+import subprocess
+import sys
+
+import pytest
+
+from bench.fakes import FakeImageHost
+from config.config import get_default_config
+from storage.upload import UploadError, Uploader
+
+
+def make_conf(url, **upload):
+    conf = get_default_config()
+    conf['upload'].update(enabled=True, url=url, retry_backoff=1, **upload)
+    return conf
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def queue_entries(queue_dir):
+    return sorted(entry.name for entry in queue_dir.iterdir() if not entry.name.startswith("."))
+
+
+def write_entry(queue_dir, name, path):
+    queue_dir.mkdir(exist_ok=True)
+    (queue_dir / name).write_text(json.dumps({"path": str(path), "attempts": 0, "next_attempt": 0.0}))
+
+
+@pytest.fixture
+def host():
+    with FakeImageHost() as host:
+        yield host
+
+
+@pytest.fixture
+def screenshot(tmp_path):
+    path = tmp_path / "shot.png"
+    path.write_bytes(b"\x89PNG" + bytes(100_000))
+    return path
+
+
+def test_uploads_reuse_one_connection(host, screenshot, tmp_path):
+    uploader = Uploader(make_conf(host.url), queue_dir=tmp_path / "queue")
+    try:
+        urls = [uploader.upload(screenshot) for _ in range(3)]
+    finally:
+        uploader.shutdown()
+
+    assert urls == [f"{host.url}i/{n}/shot.png" for n in (1, 2, 3)]
+    assert host.uploads == [("shot.png", screenshot.stat().st_size)] * 3
+    assert host.connections == 1
+
+
+def test_failed_upload_is_retried_with_backoff(host, screenshot, tmp_path):
+    host.fail_next = 1
+    queue_dir = tmp_path / "queue"
+    uploader = Uploader(make_conf(host.url), queue_dir=queue_dir)
+    first_attempt = threading.Event()
+    results = []
+
+    def on_uploaded(url, error):
+        results.append((url, error))
+        first_attempt.set()
+
+    try:
+        started = time.time()
+        uploader.submit(screenshot, on_uploaded)
+        assert first_attempt.wait(5)
+        url, error = results[0]
+        assert url is None and error.retryable
+
+        # The job stays queued on disk until the retry succeeds.
+        entry, = queue_dir.glob(f"*.{os.getpid()}.claimed")
+        record = json.loads(entry.read_text())
+        assert record["attempts"] == 1
+        assert record["next_attempt"] >= started + 1
+
+        assert wait_until(lambda: host.uploads)
+        assert time.time() - started >= 1
+        assert wait_until(lambda: not queue_entries(queue_dir))
+    finally:
+        uploader.shutdown()
+    assert results == [(None, error)]
+
+
+def test_gives_up_after_max_attempts(host, screenshot, tmp_path):
+    host.fail_next = 2
+    queue_dir = tmp_path / "queue"
+    uploader = Uploader(make_conf(host.url, max_attempts=2), queue_dir=queue_dir)
+    try:
+        uploader.submit(screenshot)
+        assert wait_until(lambda: host.fail_next == 0)
+        assert wait_until(lambda: not queue_entries(queue_dir))
+    finally:
+        uploader.shutdown()
+    assert host.uploads == []
+
+
+def test_queued_upload_survives_a_restart(host, screenshot, tmp_path):
+    queue_dir = tmp_path / "queue"
+    host.fail_next = 1
+    first = Uploader(make_conf(host.url), queue_dir=queue_dir)
+    first_attempt = threading.Event()
+    first.submit(screenshot, lambda url, error: first_attempt.set())
+    assert first_attempt.wait(5)
+    first.shutdown()
+    # Shutting down hands the pending retry back to the shared queue.
+    assert [name.endswith(".json") for name in queue_entries(queue_dir)] == [True]
+    assert host.uploads == []
+
+    second = Uploader(make_conf(host.url), queue_dir=queue_dir)
+    try:
+        assert wait_until(lambda: host.uploads)
+        assert wait_until(lambda: not queue_entries(queue_dir))
+    finally:
+        second.shutdown()
+    assert host.uploads == [("shot.png", screenshot.stat().st_size)]
+
+
+def test_shared_queue_entry_is_uploaded_once(host, screenshot, tmp_path):
+    queue_dir = tmp_path / "queue"
+    for number in range(3):
+        write_entry(queue_dir, f"100{number}-1.json", screenshot)
+
+    # Like the daemon and a one-shot capture starting side by side.
+    uploaders = [Uploader(make_conf(host.url), queue_dir=queue_dir) for _ in range(4)]
+    try:
+        assert wait_until(lambda: len(host.uploads) >= 3 and not queue_entries(queue_dir))
+        time.sleep(0.2)
+    finally:
+        for uploader in uploaders:
+            uploader.shutdown()
+    assert len(host.uploads) == 3
+
+
+def test_claim_of_a_live_process_is_left_alone(host, screenshot, tmp_path):
+    queue_dir = tmp_path / "queue"
+    write_entry(queue_dir, f"1000-1.{os.getppid()}.claimed", screenshot)
+
+    uploader = Uploader(make_conf(host.url), queue_dir=queue_dir)
+    time.sleep(0.2)
+    uploader.shutdown()
+    assert host.uploads == []
+    assert queue_entries(queue_dir) == [f"1000-1.{os.getppid()}.claimed"]
+
+
+def test_claim_of_a_dead_process_is_taken_over(host, screenshot, tmp_path):
+    finished = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                              capture_output=True, text=True, check=True)
+    queue_dir = tmp_path / "queue"
+    write_entry(queue_dir, f"1000-1.{finished.stdout.strip()}.claimed", screenshot)
+
+    uploader = Uploader(make_conf(host.url), queue_dir=queue_dir)
+    try:
+        assert wait_until(lambda: host.uploads and not queue_entries(queue_dir))
+    finally:
+        uploader.shutdown()
+    assert host.uploads == [("shot.png", screenshot.stat().st_size)]
+
+
+def test_parse_url(tmp_path):
+    uploader = Uploader(make_conf("http://127.0.0.1:1/", response_url_key="link"), queue_dir=tmp_path)
+    try:
+        json_headers = {"Content-Type": "application/json; charset=utf-8"}
+        assert uploader._parse_url(json_headers, b'{"link": "https://img/a.png"}') == "https://img/a.png"
+        assert uploader._parse_url({"content-type": "text/plain"}, b"https://img/b.png\n") == "https://img/b.png"
+        assert uploader._parse_url({}, b"  https://img/c.png ") == "https://img/c.png"
+
+        for headers, body in ((json_headers, b'{"url": "https://img/a.png"}'), (json_headers, b"not json"),
+                              ({"Content-Type": "text/plain"}, b"\n")):
+            with pytest.raises(UploadError) as raised:
+                uploader._parse_url(headers, body)
+            assert not raised.value.retryable
+    finally:
+        uploader.shutdown()
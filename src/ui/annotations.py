@@ -0,0 +1,263 @@
+import math
+from PySide6.QtCore import Qt, QPoint, QRect, QSize
+from PySide6.QtGui import QPixmap, QPainter
+
+from utils.spatial import SpatialGrid
+from .render import draw_shape, REDACTION_TYPES
+
+
+# Arrow heads reach up to 15px past the end point.
+SHAPE_MARGIN = 16
+
+
+class Shape:
+    """
+    A single annotation. Coordinates are plain ints in overlay space;
+    QPoints are only built when the shape is drawn.
+    """
+
+    __slots__ = ("id", "type", "x1", "y1", "x2", "y2")
+
+    def __init__(self, shape_type, x1, y1, x2, y2, shape_id=None):
+        self.id = shape_id
+        self.type = shape_type
+        self.x1 = x1
+        self.y1 = y1
+        self.x2 = x2
+        self.y2 = y2
+
+    @classmethod
+    def from_points(cls, shape_type, start, end):
+        return cls(shape_type, start.x(), start.y(), end.x(), end.y())
+
+    @property
+    def start_pos(self):
+        return QPoint(self.x1, self.y1)
+
+    @property
+    def end_pos(self):
+        return QPoint(self.x2, self.y2)
+
+    def set_end(self, point):
+        self.x2 = point.x()
+        self.y2 = point.y()
+
+    def translate(self, dx, dy):
+        self.x1 += dx
+        self.y1 += dy
+        self.x2 += dx
+        self.y2 += dy
+
+    def bounds(self, margin=0):
+        """
+        Returns (left, top, right, bottom), grown by margin on every side.
+        """
+        return (
+            min(self.x1, self.x2) - margin,
+            min(self.y1, self.y2) - margin,
+            max(self.x1, self.x2) + margin,
+            max(self.y1, self.y2) + margin,
+        )
+
+    def bounding_rect(self, margin=0):
+        left, top, right, bottom = self.bounds(margin)
+        return QRect(QPoint(left, top), QPoint(right, bottom))
+
+    def hit(self, x, y, tolerance):
+        """
+        Returns True if (x, y) lies within tolerance of the shape's outline.
+        """
+        left, top, right, bottom = self.bounds()
+
+        if self.type in REDACTION_TYPES:
+            # Redactions are filled, so they can be grabbed anywhere.
+            return left - tolerance <= x <= right + tolerance and top - tolerance <= y <= bottom + tolerance
+
+        if self.type == 'rect':
+            inside_outer = left - tolerance <= x <= right + tolerance and top - tolerance <= y <= bottom + tolerance
+            inside_inner = left + tolerance < x < right - tolerance and top + tolerance < y < bottom - tolerance
+            return inside_outer and not inside_inner
+
+        if self.type == 'circle':
+            rx = (right - left) / 2
+            ry = (bottom - top) / 2
+            if rx < 1 or ry < 1:
+                return abs(x - (left + right) / 2) <= tolerance + rx and abs(y - (top + bottom) / 2) <= tolerance + ry
+            dx = (x - (left + right) / 2) / rx
+            dy = (y - (top + bottom) / 2) / ry
+            return abs(math.hypot(dx, dy) - 1) * min(rx, ry) <= tolerance
+
+        # Arrows (and anything line-like): distance to the segment.
+        sx, sy = self.x2 - self.x1, self.y2 - self.y1
+        length_sq = sx * sx + sy * sy
+        if length_sq == 0:
+            return math.hypot(x - self.x1, y - self.y1) <= tolerance
+        t = max(0.0, min(1.0, ((x - self.x1) * sx + (y - self.y1) * sy) / length_sq))
+        return math.hypot(x - (self.x1 + t * sx), y - (self.y1 + t * sy)) <= tolerance
+
+
+class AnnotationLayer:
+    """
+    The committed annotations of a capture.
+
+    Shapes are kept in z-order and indexed in a spatial grid for hit-testing.
+    They are rasterized into a cached pixmap that is only rebuilt when they
+    change, and every change is recorded as a small delta on the undo stack.
+    """
+
+    def __init__(self):
+        self._shapes = []
+        self._by_id = {}
+        self._index = SpatialGrid()
+        self._next_id = 0
+
+        self._undo_stack = []
+        self._redo_stack = []
+
+        self._cache = None
+        self._cache_dirty = True
+
+        # A shape being dragged is drawn live by the overlay and left out of
+        # the cache so moving it doesn't rebuild the cache every frame.
+        self.floating = None
+        self._float_origin = None
+
+    def __len__(self):
+        return len(self._shapes)
+
+    def __iter__(self):
+        return iter(self._shapes)
+
+    def ids(self):
+        return self._by_id.keys()
+
+    def clear(self):
+        self._shapes.clear()
+        self._by_id.clear()
+        self._index.clear()
+        self._undo_stack.clear()
+        self._redo_stack.clear()
+        self.floating = None
+        self._float_origin = None
+        self._cache = None
+        self._cache_dirty = True
+
+    def _insert(self, shape, position):
+        self._shapes.insert(position, shape)
+        self._by_id[shape.id] = shape
+        self._index.insert(shape.id, shape.bounds(SHAPE_MARGIN))
+        self._cache_dirty = True
+
+    def _remove(self, shape):
+        position = self._shapes.index(shape)
+        del self._shapes[position]
+        del self._by_id[shape.id]
+        self._index.remove(shape.id)
+        self._cache_dirty = True
+        return position
+
+    def _translate(self, shape, dx, dy):
+        shape.translate(dx, dy)
+        self._index.insert(shape.id, shape.bounds(SHAPE_MARGIN))
+        self._cache_dirty = True
+
+    def _record(self, operation):
+        self._undo_stack.append(operation)
+        self._redo_stack.clear()
+
+    def add(self, shape):
+        shape.id = self._next_id
+        self._next_id += 1
+        position = len(self._shapes)
+        self._insert(shape, position)
+        self._record(('add', shape, position))
+
+    def remove(self, shape):
+        position = self._remove(shape)
+        self._record(('remove', shape, position))
+
+    def begin_move(self, shape):
+        self.floating = shape
+        self._float_origin = (shape.x1, shape.y1)
+        self._cache_dirty = True
+
+    def end_move(self):
+        shape = self.floating
+        if shape is None:
+            return
+
+        dx = shape.x1 - self._float_origin[0]
+        dy = shape.y1 - self._float_origin[1]
+        self.floating = None
+        self._float_origin = None
+        self._index.insert(shape.id, shape.bounds(SHAPE_MARGIN))
+        self._cache_dirty = True
+        if dx or dy:
+            self._record(('move', shape, dx, dy))
+
+    def _apply(self, operation, reverse):
+        kind, shape = operation[0], operation[1]
+        if kind == 'move':
+            dx, dy = operation[2], operation[3]
+            if reverse:
+                dx, dy = -dx, -dy
+            self._translate(shape, dx, dy)
+        elif (kind == 'add') != reverse:
+            self._insert(shape, operation[2])
+        else:
+            self._remove(shape)
+
+    def undo(self):
+        if not self._undo_stack:
+            return False
+        operation = self._undo_stack.pop()
+        self._apply(operation, reverse=True)
+        self._redo_stack.append(operation)
+        return True
+
+    def redo(self):
+        if not self._redo_stack:
+            return False
+        operation = self._redo_stack.pop()
+        self._apply(operation, reverse=False)
+        self._undo_stack.append(operation)
+        return True
+
+    def shape_at(self, x, y, tolerance=6):
+        """
+        Returns the topmost shape whose outline is under (x, y), or None.
+        """
+        # Shapes only ever enter the list in id order (undo re-inserts them
+        # where they were), so the highest id is the topmost.
+        for shape_id in sorted(self._index.query_point(x, y), reverse=True):
+            shape = self._by_id[shape_id]
+            if shape.hit(x, y, tolerance):
+                return shape
+        return None
+
+    def cached_pixmap(self, size, pen, redactor=None, device_pixel_ratio=1.0):
+        """
+        Returns a transparent pixmap of the given logical size with every
+        committed shape (except the floating one) drawn onto it, at
+        device_pixel_ratio times that many pixels.
+        """
+        physical_size = QSize(
+            math.ceil(size.width() * device_pixel_ratio), math.ceil(size.height() * device_pixel_ratio)
+        )
+        if self._cache is not None and not self._cache_dirty and self._cache.size() == physical_size:
+            return self._cache
+
+        self._cache = QPixmap(physical_size)
+        self._cache.setDevicePixelRatio(device_pixel_ratio)
+        self._cache.fill(Qt.GlobalColor.transparent)
+
+        painter = QPainter(self._cache)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(pen)
+        for shape in self._shapes:
+            if shape is not self.floating:
+                draw_shape(painter, shape, redactor)
+        painter.end()
+
+        self._cache_dirty = False
+        return self._cache
@@ -0,0 +1,163 @@
+import threading
+from logging import getLogger
+
+from PySide6.QtCore import QByteArray, QMetaType, QMimeData, QTimer, QUrl
+from PySide6.QtWidgets import QApplication
+
+from utils.tracing import tracer
+
+
+logger = getLogger(__name__)
+
+QT_IMAGE_MIME_TYPE = "application/x-qt-image"
+URI_LIST_MIME_TYPE = "text/uri-list"
+
+# Offered besides the configured clipboard format, for applications that
+# only accept one of them.
+EXTRA_IMAGE_FORMATS = ("png", "webp")
+
+
+class ClipboardImageData(QMimeData):
+    """
+    Clipboard contents for a capture, encoded lazily.
+
+    Every format is advertised up front, but an image format is only
+    encoded when an application asks for it, and is cached from then on,
+    so copying costs nothing and each paste pays only for the format it
+    uses. Qt applications get the raw image; file managers and chat
+    clients get a file:// URI once the save worker has written the file.
+    Pastes are served on the GUI thread, so a URI asked for before then
+    comes back empty rather than waiting for the save.
+    """
+
+    def __init__(self, image, encoders):
+        """
+        Args:
+            image (QImage): the finished capture.
+            encoders (list[Encoder]): the image encoders to offer, preferred
+                first.
+        """
+        super().__init__()
+        self.image = image
+        self._encoders = {}
+        for encoder in encoders:
+            self._encoders.setdefault(encoder.mime_type, encoder)
+        # mime type -> encoded bytes
+        self._encoded = {}
+
+        self._saved = threading.Event()
+        self._file_path = None
+
+    def set_file(self, path, error=None):
+        """
+        SaveWorker callback: makes the saved file available as a URI. Runs
+        on the save worker's thread.
+        """
+        self._file_path = path
+        self._saved.set()
+
+    def formats(self):
+        return [*self._encoders, QT_IMAGE_MIME_TYPE, URI_LIST_MIME_TYPE]
+
+    def hasFormat(self, mime_type):
+        return mime_type in self.formats()
+
+    def hasImage(self):
+        return True
+
+    def retrieveData(self, mime_type, preferred_type):
+        if mime_type == QT_IMAGE_MIME_TYPE:
+            return self.image
+
+        if mime_type == URI_LIST_MIME_TYPE:
+            if not self._saved.is_set() or self._file_path is None:
+                return None
+            url = QUrl.fromLocalFile(str(self._file_path))
+            if preferred_type.id() == QMetaType.Type.QByteArray.value:
+                return QByteArray(bytes(url.toEncoded()) + b"\r\n")
+            # QMimeData.urls() asks for a list.
+            return [url]
+
+        encoder = self._encoders.get(mime_type)
+        if encoder is None:
+            return None
+        data = self._encoded.get(mime_type)
+        if data is None:
+            with tracer.span("clipboard encode", format=encoder.extension):
+                data = self._encoded[mime_type] = QByteArray(encoder.encode(self.image))
+        return data
+
+
+class ClipboardTextData(QMimeData):
+    """
+    Plain text we put on the clipboard, e.g. an upload URL. A subclass only
+    so it can be told apart from text another application copied.
+    """
+
+    def __init__(self, text):
+        super().__init__()
+        self.setText(text)
+
+
+def get_clipboard_encoders(conf):
+    """
+    Returns the configured clipboard encoder followed by the other offered
+    formats, all with the clipboard preset.
+    """
+    from storage.encoders import EncoderError, create_encoder, get_clipboard_encoder
+
+    encoders = [get_clipboard_encoder(conf)]
+    for image_format in EXTRA_IMAGE_FORMATS:
+        try:
+            encoders.append(create_encoder(conf, image_format, conf['output']['clipboard_preset']))
+        except EncoderError as e:
+            logger.warning(f"Not offering {image_format} on the clipboard: {e}")
+    return encoders
+
+
+def copy_image(image, encoders):
+    """
+    Puts image on the clipboard without encoding anything yet, and returns
+    the mime data so the saved file can be attached with set_file().
+    """
+    mime_data = ClipboardImageData(image, encoders)
+    QApplication.clipboard().setMimeData(mime_data)
+    return mime_data
+
+
+def copy_text(text):
+    QApplication.clipboard().setMimeData(ClipboardTextData(text))
+
+
+def quit_when_clipboard_released(keep_alive):
+    """
+    Quits the application once it no longer needs to serve the clipboard:
+    when another application takes it over, or after keep_alive seconds.
+    On Wayland and X11 the clipboard contents live in the process that
+    set them, so quitting straight away would empty the clipboard.
+    """
+    clipboard = QApplication.clipboard()
+    if keep_alive <= 0 or not isinstance(clipboard.mimeData(), (ClipboardImageData, ClipboardTextData)):
+        QApplication.quit()
+        return
+
+    def on_changed():
+        if not isinstance(clipboard.mimeData(), (ClipboardImageData, ClipboardTextData)):
+            QApplication.quit()
+
+    clipboard.dataChanged.connect(on_changed)
+    QTimer.singleShot(int(keep_alive * 1000), QApplication.quit)
+
+
+def release_clipboard():
+    """
+    Replaces our clipboard data with a Qt-owned copy of the image. Call this
+    after the event loop exits: PySide6 crashes during interpreter shutdown
+    if the clipboard still holds a QMimeData created from Python.
+    """
+    clipboard = QApplication.clipboard()
+    mime_data = clipboard.mimeData()
+    if isinstance(mime_data, ClipboardImageData):
+        clipboard.setImage(mime_data.image)
+    elif isinstance(mime_data, ClipboardTextData):
+        clipboard.setText(mime_data.text())
@@ -1,22 +1,80 @@
-import io
-import math
 from PySide6.QtWidgets import QWidget, QApplication
-from PySide6.QtCore import Qt, QRect, QPoint, QBuffer
-from PySide6.QtGui import QPixmap, QPainter, QColor, QPen, QCursor, QImage
+from PySide6.QtCore import Qt, QRect, QPoint, QTimer, Signal
+from PySide6.QtGui import QPixmap, QPainter, QColor, QPen, QCursor, QKeySequence
 
 from .toolbar import EditingToolbar
-from PIL import Image, ImageDraw
+from .render import draw_shape, render_selection, shape_pen, frame_to_image
+from .annotations import Shape, AnnotationLayer, SHAPE_MARGIN
+from .clipboard import copy_image, copy_text, get_clipboard_encoders, quit_when_clipboard_released
+from .windows import WindowIndex
+from .redact import Redactor
+from .scaling import PixelMapping
+
+from capture.backend import Frame, start_in_background
+from utils.profiling import FrameStats
+from utils.tracing import tracer
+from logging import getLogger
+
+
+logger = getLogger(__name__)
+
+
+def build_edge_map(frame, distance):
+    # Imported here so NumPy is only needed when edge snapping is enabled.
+    from utils.edges import EdgeMap
+    return EdgeMap.from_frame(frame, distance)
+
+
+def find_screen(monitor_name):
+    """
+    Returns the QScreen matching a compositor monitor name, falling back
+    to the primary screen.
+    """
+    for screen in QApplication.screens():
+        if screen.name() == monitor_name:
+            return screen
+    logger.warning(f"Could not find a screen named '{monitor_name}'. Defaulting to primary screen.")
+    return QApplication.primaryScreen()
 
-from datetime import datetime
-from pathlib import Path
 
 class ScreenshotOverlay(QWidget):
-    def __init__(self, fullscreen_capture_data, conf):
+    # Emitted from the upload thread with the URL, or "" if it failed.
+    upload_finished = Signal(str)
+
+    def __init__(self, fullscreen_capture, conf, persistent=False, saver=None):
         super().__init__()
         self.conf = conf
+        # Created on the first confirmed capture; see the saver property.
+        self._saver = saver
+        self._uploader = None
+        # A one-shot overlay quits only once its upload has finished.
+        self._awaiting_upload = False
+        self.upload_finished.connect(self._on_upload_finished)
+        # Called once after the first frame has been painted.
+        self.on_first_paint = None
+        # Traced once per capture; set when a new background is loaded.
+        self._first_paint_pending = False
+        # A persistent overlay belongs to the daemon: finishing a capture
+        # hides and resets it instead of quitting the application.
+        self.persistent = persistent
 
         self.background_pixmap = QPixmap()
-        self.background_pixmap.loadFromData(fullscreen_capture_data)
+        self.dimmed_pixmap = QPixmap()
+        # The output being captured, recorded in the history.
+        self.monitor_name = None
+        # Logical <-> physical coordinates; the ratio is set whenever the
+        # overlay is placed on screen.
+        self.mapping = PixelMapping()
+        # Built in the background from the capture when edge snapping is
+        # on; until it's ready, points just don't snap.
+        self.edge_map = None
+        self._pending_edge_map = None
+        # Paints pixelate/blur shapes; created with each background.
+        self.redactor = None
+        # Offset from the cursor to the selection corner being resized.
+        self._handle_offset = QPoint()
+        if fullscreen_capture is not None:
+            self._set_background(fullscreen_capture)
 
         self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.WindowStaysOnTopHint)
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
@@ -24,15 +82,241 @@ class ScreenshotOverlay(QWidget):
         self.setCursor(Qt.CursorShape.CrossCursor)
 
         self.selection_rect = None
-        self.shape_edits = []
+        self.annotations = AnnotationLayer()
+        self.selected_shape = None
         self.current_drawing_shape = None
         
         self.current_action = 'selecting' 
         self.drag_start_position = None
 
+        # Windows visible at capture time (global geometry, bottom to top)
+        # and the hit-test index built from them once the overlay is placed.
+        self.windows = []
+        self.focused_window = None
+        self.window_index = None
+        self.hovered_window = None
+        # The window under the cursor when a selection drag started; a
+        # click without a drag selects it.
+        self._press_window = None
+        # True while the selection is the one from initial_selection rather
+        # than one the user made. Pressing inside it starts a new selection
+        # instead of moving it.
+        self._provisional_selection = False
+
+        # The area painted by the last frame's selection and in-progress
+        # shape; repaints only invalidate its union with the new one.
+        self._painted_bounds = QRect()
+
+        # Mouse moves are coalesced to at most one state update (and thus
+        # one repaint) per display frame.
+        self._pending_move_pos = None
+        self._move_timer = QTimer(self)
+        self._move_timer.setSingleShot(True)
+        self._move_timer.setInterval(16)
+        self._move_timer.timeout.connect(self._flush_pending_move)
+
+        self.frame_stats = FrameStats("overlay paint")
+
         self.toolbar = EditingToolbar(self.conf, self)
         self.toolbar.hide()
 
+    @property
+    def saver(self):
+        if self._saver is None:
+            # Only needed once the user confirms, so keep it off the
+            # startup path.
+            from storage.saver import SaveWorker
+            self._saver = SaveWorker(self.conf)
+        return self._saver
+
+    def shutdown_saver(self):
+        """
+        Waits for queued saves to finish, if anything was ever saved.
+        """
+        if self._saver is not None:
+            self._saver.shutdown()
+
+    @property
+    def uploader(self):
+        if self._uploader is None:
+            from storage.upload import create_uploader
+            self._uploader = create_uploader(self.conf)
+        return self._uploader
+
+    def shutdown_uploader(self):
+        """
+        Waits for a running upload attempt; queued retries stay on disk.
+        """
+        if self._uploader is not None:
+            self._uploader.shutdown()
+
+    def _on_upload_finished(self, url):
+        if url and self.conf['upload'].get('copy_url', True):
+            copy_text(url)
+        if self._awaiting_upload:
+            self._awaiting_upload = False
+            self._finish()
+
+    def _set_background(self, fullscreen_capture):
+        # Accepts either a raw capture Frame or encoded image data.
+        self.edge_map = None
+        self._pending_edge_map = None
+        if isinstance(fullscreen_capture, Frame):
+            with tracer.span("decode", width=fullscreen_capture.width, height=fullscreen_capture.height):
+                self.background_pixmap = QPixmap.fromImage(frame_to_image(fullscreen_capture))
+            if self.conf['behavior'].get('snap_to_edges', False):
+                self._pending_edge_map = start_in_background(
+                    build_edge_map, fullscreen_capture, self.conf['behavior'].get('snap_distance', 8)
+                )
+        else:
+            with tracer.span("decode"):
+                self.background_pixmap = QPixmap()
+                self.background_pixmap.loadFromData(fullscreen_capture)
+        self.redactor = Redactor(self.background_pixmap, self.conf, self.mapping)
+
+        # Dim once up front instead of filling a translucent layer over the
+        # whole screen on every frame.
+        with tracer.span("dim"):
+            self.dimmed_pixmap = QPixmap(self.background_pixmap)
+            painter = QPainter(self.dimmed_pixmap)
+            painter.fillRect(self.dimmed_pixmap.rect(), QColor(0, 0, 0, 100))
+            painter.end()
+        self._first_paint_pending = True
+
+    def load_capture(self, fullscreen_capture):
+        self.reset()
+        self._set_background(fullscreen_capture)
+
+    def reset(self):
+        self.selection_rect = None
+        self.annotations.clear()
+        self.selected_shape = None
+        self.current_drawing_shape = None
+        self.current_action = 'selecting'
+        self.drag_start_position = None
+        self._pending_move_pos = None
+        self._move_timer.stop()
+        self._painted_bounds = QRect()
+        self.windows = []
+        self.focused_window = None
+        self.window_index = None
+        self.hovered_window = None
+        self._press_window = None
+        self._provisional_selection = False
+        self.toolbar.uncheck_all_except(None)
+        self.toolbar.hide()
+        self.update()
+
+    def set_windows(self, windows, focused=None):
+        """
+        Sets the windows that can be hovered and clicked to select them, as
+        returned by get_visible_windows(). Call before showing the overlay.
+        """
+        self.windows = windows
+        self.focused_window = focused
+
+    def _prepare_selection(self):
+        """
+        Indexes the windows relative to where the overlay now sits and
+        applies the initial_selection setting.
+        """
+        origin = self.geometry().topLeft()
+        self.window_index = WindowIndex(self.windows, origin.x(), origin.y(), self.focused_window)
+        self.hovered_window = None
+
+        initial = self.conf['appearance'].get('initial_selection', "fullscreen")
+        selection = None
+        if initial == "window":
+            selection = self.window_index.focused_rect()
+        if initial == "fullscreen" or (initial == "window" and selection is None):
+            selection = self.rect()
+        if selection is not None:
+            self.selection_rect = selection.intersected(self.rect())
+            self._provisional_selection = True
+            self.current_action = None
+            self.update_toolbar_position()
+        self._invalidate()
+
+    def _apply_device_pixel_ratio(self):
+        """
+        Tags the capture pixmaps with the ratio between the capture's
+        physical pixels and the overlay's logical size, so painting them on
+        a HiDPI screen is a 1:1 copy instead of a rescale of the whole
+        screenshot every frame.
+        """
+        self.mapping.ratio = PixelMapping.for_capture(self.background_pixmap.width(), self.width()).ratio
+        self.background_pixmap.setDevicePixelRatio(self.mapping.ratio)
+        self.dimmed_pixmap.setDevicePixelRatio(self.mapping.ratio)
+
+    def show_on_screen(self, screen):
+        self.monitor_name = screen.name()
+        self.setScreen(screen)
+        self.setGeometry(screen.geometry())
+        self._apply_device_pixel_ratio()
+        self._prepare_selection()
+        self._move_timer.setInterval(max(1, int(1000 / (screen.refreshRate() or 60))))
+        self.showFullScreen()
+        self.raise_()
+        self.activateWindow()
+
+    def show_spanning(self, geometry):
+        """
+        Shows the overlay over a virtual-desktop rectangle covering several
+        outputs. Such a window can't be fullscreen on any single output.
+        """
+        self.monitor_name = "all"
+        self.setGeometry(geometry)
+        self._apply_device_pixel_ratio()
+        self._prepare_selection()
+        self._move_timer.setInterval(max(1, int(1000 / (QApplication.primaryScreen().refreshRate() or 60))))
+        self.show()
+        self.raise_()
+        self.activateWindow()
+
+    def cancel(self):
+        self.hide()
+        self.toolbar.hide()
+        self._finish()
+
+    def _finish(self):
+        self.frame_stats.report()
+        if not self.persistent:
+            if self._awaiting_upload:
+                return
+            # Stays in the background, hidden, while the clipboard may
+            # still be pasted from.
+            quit_when_clipboard_released(self.conf['behavior'].get('clipboard_keep_alive', 0))
+            return
+
+        self.hide()
+        self.reset()
+        # Drop the previous capture so an idle daemon doesn't hold a
+        # full-monitor pixmap in memory.
+        self.background_pixmap = QPixmap()
+        self.dimmed_pixmap = QPixmap()
+        self.edge_map = None
+        self._pending_edge_map = None
+        self.redactor = None
+
+    def _snap(self, pos):
+        """
+        Returns pos moved onto the nearest strong edges of the capture, or
+        unchanged if snapping is off or the edge map isn't ready yet.
+        """
+        if self.edge_map is None:
+            pending = self._pending_edge_map
+            if pending is None or not pending.done():
+                return pos
+            self._pending_edge_map = None
+            try:
+                self.edge_map = pending.result()
+            except Exception as e:
+                logger.warning(f"Edge snapping unavailable: {e}")
+                return pos
+        # The edge map is in capture pixels.
+        physical = self.mapping.to_physical_point(pos)
+        return self.mapping.to_logical_point(QPoint(*self.edge_map.snap(physical.x(), physical.y())))
+
     def set_active_tool(self, tool_name):
         if self.current_action == tool_name:
             self.current_action = None
@@ -40,6 +324,10 @@ class ScreenshotOverlay(QWidget):
         else:
             self.current_action = tool_name
             self.toolbar.uncheck_all_except(tool_name)
+
+        if self.current_action != 'select' and self.selected_shape is not None:
+            self.selected_shape = None
+            self._invalidate()
         self.update_cursor()
 
     def update_toolbar_position(self):
@@ -51,6 +339,10 @@ class ScreenshotOverlay(QWidget):
         
         if pos_y + self.toolbar.height() > self.height():
             pos_y = self.selection_rect.top() - self.toolbar.height() - 10
+        if pos_y < 0:
+            # No room above or below (e.g. a fullscreen selection), so
+            # keep the toolbar inside the selection.
+            pos_y = self.selection_rect.bottom() - self.toolbar.height() - 10
 
         self.toolbar.move(pos_x, pos_y)
         if not self.toolbar.isVisible():
@@ -70,6 +362,14 @@ class ScreenshotOverlay(QWidget):
         return None
 
     def update_cursor(self):
+        if self.current_action == 'select':
+            pos = self.mapFromGlobal(QCursor.pos())
+            if self.annotations.shape_at(pos.x(), pos.y()):
+                self.setCursor(Qt.CursorShape.SizeAllCursor)
+            else:
+                self.setCursor(Qt.CursorShape.ArrowCursor)
+            return
+
         if self.current_action and 'draw' in self.current_action:
             if self.selection_rect and self.selection_rect.contains(self.mapFromGlobal(QCursor.pos())):
                  self.setCursor(Qt.CursorShape.CrossCursor)
@@ -80,7 +380,7 @@ class ScreenshotOverlay(QWidget):
         hover_handle = self.get_handle_at_pos(self.mapFromGlobal(QCursor.pos()))
         if hover_handle == 'resize_br' or hover_handle == 'resize_tl':
             self.setCursor(Qt.CursorShape.SizeFDiagCursor)
-        elif hover_handle == 'move':
+        elif hover_handle == 'move' and not self._provisional_selection:
             self.setCursor(Qt.CursorShape.SizeAllCursor)
         else:
             self.setCursor(Qt.CursorShape.CrossCursor)
@@ -98,191 +398,319 @@ class ScreenshotOverlay(QWidget):
             if self.selection_rect and self.selection_rect.isValid():
                 self.capture_and_exit()
         elif event.key() == Qt.Key.Key_Escape:
-            QApplication.quit()
+            self.cancel()
+        elif event.key() in (Qt.Key.Key_Delete, Qt.Key.Key_Backspace):
+            self.delete_selected_shape()
+        elif event.matches(QKeySequence.StandardKey.Undo):
+            self.undo()
+        elif event.matches(QKeySequence.StandardKey.Redo):
+            self.redo()
+
+    def delete_selected_shape(self):
+        if self.selected_shape is None:
+            return
+        self.update(self.selected_shape.bounding_rect(self._shape_margin()))
+        self.annotations.remove(self.selected_shape)
+        self.selected_shape = None
+        self._invalidate()
+
+    def undo(self):
+        if self.annotations.undo():
+            self._after_history_change()
+
+    def redo(self):
+        if self.annotations.redo():
+            self._after_history_change()
+
+    def _after_history_change(self):
+        # Undo/redo can touch any shape; a full repaint is fine for a
+        # discrete key press.
+        if self.selected_shape is not None and self.selected_shape.id not in self.annotations.ids():
+            self.selected_shape = None
+        self.update()
+
+    def closeEvent(self, event):
+        if self.persistent:
+            # The compositor closed us (e.g. killactive); keep the window
+            # alive for the next capture.
+            event.ignore()
+            self.cancel()
+            return
+        super().closeEvent(event)
 
     def mousePressEvent(self, event):
         if event.button() != Qt.MouseButton.LeftButton:
             return
 
         self.drag_start_position = event.pos()
+        snapped = self._snap(event.pos())
 
-        if self.current_action and 'draw' in self.current_action:
+        if self.current_action == 'select':
+            self.selected_shape = self.annotations.shape_at(event.pos().x(), event.pos().y())
+            if self.selected_shape is None:
+                self.drag_start_position = None
+            else:
+                self.annotations.begin_move(self.selected_shape)
+                self.current_action = 'move_shape'
+                self.update(self.selected_shape.bounding_rect(self._shape_margin()))
+        elif self.current_action and 'draw' in self.current_action:
             if not self.selection_rect or not self.selection_rect.contains(event.pos()):
                 self.drag_start_position = None
                 return
 
             shape_type = self.current_action.split('_')[1]
-            self.current_drawing_shape = {
-                'type': shape_type,
-                'start_pos': event.pos(),
-                'end_pos': event.pos()
-            }
+            self.current_drawing_shape = Shape.from_points(shape_type, snapped, snapped)
         else:
             handle = self.get_handle_at_pos(event.pos())
+            if handle == 'move' and self._provisional_selection:
+                handle = None
+            self._provisional_selection = False
             if handle:
                 self.current_action = handle
+                if handle == 'resize_br':
+                    self._handle_offset = self.selection_rect.bottomRight() - event.pos()
+                elif handle == 'resize_tl':
+                    self._handle_offset = self.selection_rect.topLeft() - event.pos()
             else:
                 self.current_action = 'selecting'
-                self.selection_rect = QRect(self.drag_start_position, self.drag_start_position)
+                self._press_window = self.hovered_window or self._window_at(event.pos())
+                self.hovered_window = None
+                self.drag_start_position = snapped
+                self.selection_rect = QRect(snapped, snapped)
                 self.toolbar.hide()
         
-        self.update()
+        self._invalidate()
 
 
     def mouseMoveEvent(self, event):
+        self._pending_move_pos = event.pos()
+        if not self._move_timer.isActive():
+            self._flush_pending_move()
+            self._move_timer.start()
+
+    def _flush_pending_move(self):
+        if self._pending_move_pos is None:
+            return
+        pos = self._pending_move_pos
+        self._pending_move_pos = None
+        self._handle_move(pos)
+
+    def _handle_move(self, pos):
         if not self.drag_start_position:
+            self._update_hover(pos)
             self.update_cursor()
             return
         
-        delta = event.pos() - self.drag_start_position
+        delta = pos - self.drag_start_position
+        selection_changed = True
 
         if self.current_drawing_shape:
-            clamped_pos = self._clamp_point_to_selection(event.pos())
-            self.current_drawing_shape['end_pos'] = clamped_pos
+            clamped_pos = self._clamp_point_to_selection(self._snap(pos))
+            self.current_drawing_shape.set_end(clamped_pos)
+            selection_changed = False
+        elif self.current_action == 'move_shape':
+            self.selected_shape.translate(delta.x(), delta.y())
+            self.drag_start_position = pos
+            selection_changed = False
         elif self.current_action == 'selecting':
-            self.selection_rect = QRect(self.drag_start_position, event.pos()).normalized()
+            self.selection_rect = QRect(self.drag_start_position, self._snap(pos)).normalized()
         elif self.current_action == 'move':
             self.selection_rect.translate(delta)
-            self.drag_start_position = event.pos()
+            self.drag_start_position = pos
         elif self.current_action == 'resize_br':
-            self.selection_rect.setBottomRight(self.selection_rect.bottomRight() + delta)
-            self.drag_start_position = event.pos()
+            # An edge belongs to the pixel after it, so the last selected
+            # pixel is the one before the snapped position.
+            corner = self._snap(pos + self._handle_offset + QPoint(1, 1)) - QPoint(1, 1)
+            self.selection_rect.setBottomRight(corner)
         elif self.current_action == 'resize_tl':
-            self.selection_rect.setTopLeft(self.selection_rect.topLeft() + delta)
-            self.drag_start_position = event.pos()
+            self.selection_rect.setTopLeft(self._snap(pos + self._handle_offset))
+        else:
+            selection_changed = False
             
-        if self.selection_rect and self.selection_rect.isValid():
+        if selection_changed and self.selection_rect and self.selection_rect.isValid():
              self.update_toolbar_position()
 
-        self.update()
+        self._invalidate()
 
     def mouseReleaseEvent(self, event):
         if event.button() != Qt.MouseButton.LeftButton:
             return
 
+        self._flush_pending_move()
+
+        next_action = None
         if self.current_drawing_shape:
-            self.shape_edits.append(self.current_drawing_shape)
+            self.annotations.add(self.current_drawing_shape)
             self.current_drawing_shape = None
             self.toolbar.uncheck_all_except(None)
+        elif self.current_action == 'move_shape':
+            self.annotations.end_move()
+            # The select tool stays active so several shapes can be moved.
+            next_action = 'select'
+        elif self.current_action == 'select':
+            next_action = 'select'
         elif self.current_action == 'selecting':
-             if not self.selection_rect or not self.selection_rect.isValid():
+             if self._press_window is not None and self._is_click(event.pos()):
+                 self.selection_rect = self._press_window.intersected(self.rect())
+                 self.update_toolbar_position()
+             elif not self.selection_rect or not self.selection_rect.isValid():
                  self.selection_rect = None
+             self._press_window = None
         
-        self.current_action = None
+        self.current_action = next_action
         self.drag_start_position = None
         self.update_cursor()
-        self.update()
+        self._invalidate()
+
+    def _is_click(self, pos):
+        distance = (pos - self.drag_start_position).manhattanLength()
+        return distance < QApplication.startDragDistance()
+
+    def _window_at(self, pos):
+        if self.window_index is None:
+            return None
+        return self.window_index.window_at(pos.x(), pos.y())
+
+    def _update_hover(self, pos):
+        """
+        Highlights the window under the cursor while no other tool is
+        active and the cursor isn't over the current selection.
+        """
+        hovered = None
+        if self.current_action in (None, 'selecting'):
+            over_selection = self.selection_rect and self.selection_rect.contains(pos)
+            if self._provisional_selection or not over_selection:
+                hovered = self._window_at(pos)
+
+        if hovered != self.hovered_window:
+            self.hovered_window = hovered
+            self._invalidate()
+
+    def _overlay_bounds(self):
+        """
+        Returns the area covered by the selection (with its border and
+        handles) and the shape being drawn.
+        """
+        bounds = QRect()
+        if self.selection_rect and self.selection_rect.isValid():
+            margin = self.conf['appearance']['selection_border_width'] + 6
+            bounds = self.selection_rect.adjusted(-margin, -margin, margin, margin)
+
+        if self.hovered_window is not None:
+            bounds = bounds.united(self.hovered_window.adjusted(-2, -2, 2, 2))
+
+        for shape in (self.current_drawing_shape, self.selected_shape):
+            if shape is not None:
+                bounds = bounds.united(shape.bounding_rect(self._shape_margin()))
+
+        return bounds
+
+    def _shape_margin(self):
+        return self.conf['editing']['shape_border_width'] + SHAPE_MARGIN
+
+    def _invalidate(self):
+        bounds = self._overlay_bounds()
+        dirty = bounds.united(self._painted_bounds)
+        self._painted_bounds = bounds
+        if not dirty.isEmpty():
+            self.update(dirty)
 
     def paintEvent(self, event):
+        started = self.frame_stats.start()
+        span = tracer.start("first paint") if self._first_paint_pending else None
+        self._first_paint_pending = False
+
         painter = QPainter(self)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
 
-        painter.drawPixmap(self.rect(), self.background_pixmap)
-        painter.fillRect(self.rect(), QColor(0, 0, 0, 100))
+        dirty = event.rect()
+        self.mapping.blit(painter, dirty, self.dimmed_pixmap)
+
+        if self.hovered_window is not None and self.hovered_window != self.selection_rect:
+            visible = self.hovered_window.intersected(dirty)
+            if not visible.isEmpty():
+                self.mapping.blit(painter, visible, self.background_pixmap)
+            border_color = QColor(self.conf['appearance']['selection_border_color'])
+            painter.setPen(QPen(border_color, 1, Qt.PenStyle.DashLine))
+            painter.drawRect(self.hovered_window)
 
         if self.selection_rect and self.selection_rect.isValid():
-            painter.drawPixmap(self.selection_rect, self.background_pixmap, self.selection_rect)
+            visible = self.selection_rect.intersected(dirty)
+            if not visible.isEmpty():
+                self.mapping.blit(painter, visible, self.background_pixmap)
             
             border_color = QColor(self.conf['appearance']['selection_border_color'])
             border_width = self.conf['appearance']['selection_border_width']
             painter.setPen(QPen(border_color, border_width))
             painter.drawRect(self.selection_rect)
 
-        shape_pen = QPen(
-            QColor(self.conf['editing']['shape_border_color']), 
-            self.conf['editing']['shape_border_width']
-        )
-        painter.setPen(shape_pen)
+        pen = shape_pen(self.conf)
+        if len(self.annotations):
+            layer = self.annotations.cached_pixmap(self.size(), pen, self.redactor, self.mapping.ratio)
+            self.mapping.blit(painter, dirty, layer)
 
-        for shape in self.shape_edits:
-            self.draw_shape(painter, shape)
+        painter.setPen(pen)
+        if self.annotations.floating:
+            self.draw_shape(painter, self.annotations.floating)
         if self.current_drawing_shape:
             self.draw_shape(painter, self.current_drawing_shape)
 
+        if self.selected_shape is not None:
+            painter.setPen(QPen(pen.color(), 1, Qt.PenStyle.DashLine))
+            painter.drawRect(self.selected_shape.bounding_rect(pen.width() + 2))
+
+        painter.end()
+        self.frame_stats.stop(started)
+        tracer.stop(span)
+
+        if self.on_first_paint is not None:
+            callback, self.on_first_paint = self.on_first_paint, None
+            callback()
+
     def draw_shape(self, painter, shape_data):
-        start = shape_data['start_pos']
-        end = shape_data['end_pos']
-        rect = QRect(start, end).normalized()
-        
-        if shape_data['type'] == 'rect':
-            painter.drawRect(rect)
-        elif shape_data['type'] == 'circle':
-            painter.drawEllipse(rect)
-        elif shape_data['type'] == 'arrow':
-            painter.drawLine(start, end)
-            angle = math.atan2(start.y() - end.y(), start.x() - end.x())
-            arrow_head_length = 15
-            arrow_head_angle = math.pi / 6
-            p1 = QPoint(
-                end.x() + arrow_head_length * math.cos(angle + arrow_head_angle),
-                end.y() + arrow_head_length * math.sin(angle + arrow_head_angle)
-            )
-            p2 = QPoint(
-                end.x() + arrow_head_length * math.cos(angle - arrow_head_angle),
-                end.y() + arrow_head_length * math.sin(angle - arrow_head_angle)
-            )
-            painter.drawLine(end, p1)
-            painter.drawLine(end, p2)
+        draw_shape(painter, shape_data, self.redactor)
 
     def capture_and_exit(self):
         self.hide()
-        self.toolbar.close()
+        self.toolbar.hide()
         
         try:
-            cropped_pixmap = self.background_pixmap.copy(self.selection_rect.normalized())
+            selection = self.selection_rect.normalized()
+            with tracer.span("render", shapes=len(self.annotations)):
+                final_image = render_selection(
+                    self.background_pixmap, selection, list(self.annotations), shape_pen(self.conf),
+                    self.redactor, self.mapping
+                )
 
-            buffer = QBuffer()
-            buffer.open(QBuffer.OpenModeFlag.ReadWrite)
-            cropped_pixmap.save(buffer, "PNG")
-            image_data = buffer.data()
-            
-            image = Image.open(io.BytesIO(image_data))
-            draw = ImageDraw.Draw(image)
-
-            crop_x, crop_y = self.selection_rect.x(), self.selection_rect.y()
-            color = self.conf['editing']['shape_border_color']
-            width = self.conf['editing']['shape_border_width']
-
-            for shape in self.shape_edits:
-                start_local = (shape['start_pos'].x() - crop_x, shape['start_pos'].y() - crop_y)
-                end_local = (shape['end_pos'].x() - crop_x, shape['end_pos'].y() - crop_y)
-                
-                if shape['type'] == 'rect':
-                    draw.rectangle([start_local, end_local], outline=color, width=width)
-                elif shape['type'] == 'circle':
-                    draw.ellipse([start_local, end_local], outline=color, width=width)
-                elif shape['type'] == 'arrow':
-                    draw.line([start_local, end_local], fill=color, width=width)
-            
-            final_image_buffer = io.BytesIO()
-            image.save(final_image_buffer, format="PNG")
-            final_image_data = final_image_buffer.getvalue()
+            # Imported here since it's only needed once the user confirms.
+            from storage.encoders import get_file_encoder
 
+            clipboard_data = None
             if self.conf['behavior'].get('copy_to_clipboard', True):
-                q_img = QImage.fromData(final_image_data)
-                QApplication.clipboard().setImage(q_img)
-
-            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            image_name = f"screenshot-{timestamp}.png"
-
-            config_save_dir = self.conf['paths']['save_dir']
-            
-            save_path_obj = Path(config_save_dir).expanduser()
-
-            if not save_path_obj.is_absolute():
-                full_directory = Path.home() / save_path_obj
-            else:
-                full_directory = save_path_obj
-
-            full_directory.mkdir(parents=True, exist_ok=True)
-
-            save_path = full_directory / image_name
-            with open(save_path, "wb") as f:
-                f.write(final_image_data)
-            
-            print(f"Screenshot saved to: {save_path}")
-
+                # Nothing is encoded until an application pastes.
+                with tracer.span("clipboard"):
+                    clipboard_data = copy_image(final_image, get_clipboard_encoders(self.conf))
+            uploader = self.uploader if self.conf['upload'].get('enabled', False) else None
+
+            def on_saved(path, error):
+                # Runs on the save worker.
+                if clipboard_data is not None:
+                    clipboard_data.set_file(path, error)
+                if uploader is None:
+                    return
+                if path is None:
+                    self.upload_finished.emit("")
+                else:
+                    uploader.submit(path, lambda url, error: self.upload_finished.emit(url or ""))
+
+            # The file encoder runs on the save worker, so a slow, strong
+            # compression doesn't hold up the clipboard.
+            file_encoder = get_file_encoder(self.conf)
+            self.saver.submit(
+                final_image, file_encoder.encode, file_encoder.extension, self.monitor_name, on_saved
+            )
+            self._awaiting_upload = uploader is not None and not self.persistent
         except Exception as e:
-            print(f"Error saving screenshot: {e}")
-        
-        QApplication.quit()
\ No newline at end of file
+            logger.error(f"Error capturing screenshot: {e}")
+
+        self._finish()
\ No newline at end of file
@@ -0,0 +1,105 @@
+from PySide6.QtCore import QRect, QRectF, QPointF
+from PySide6.QtGui import QImage
+
+from .scaling import PixelMapping
+
+
+BLUR_PASSES = 2
+
+
+class Redactor:
+    """
+    Pixelated and blurred versions of a capture, used to draw redaction
+    shapes.
+
+    The filtered image is split into tiles that are computed the first time
+    a redaction covers them and cached, so growing a redaction while
+    dragging only filters the newly covered tiles. Tiles are cut with
+    enough surrounding pixels that every tile matches the whole-image
+    filter exactly; the live preview and the exported image therefore copy
+    the very same pixels.
+    """
+
+    def __init__(self, background_pixmap, conf, mapping=None, tile_size=256):
+        self.block_size = max(1, conf['editing']['pixelate_block_size'])
+        self.blur_radius = max(1, conf['editing']['blur_radius'])
+        # A whole number of pixelation blocks per tile keeps blocks aligned
+        # to the image rather than to the tile.
+        self.tile_size = -(-tile_size // self.block_size) * self.block_size
+
+        # Filtering happens on the capture's physical pixels; shapes are
+        # given in overlay coordinates and mapped through this.
+        self.mapping = mapping or PixelMapping()
+        self.width, self.height = background_pixmap.width(), background_pixmap.height()
+        self._pixmap = background_pixmap
+        # The RGB pixels of the capture, converted on first use so that
+        # captures without redactions never pay for it.
+        self._source = None
+        self.rgb = None
+
+        # (kind, column, row) -> (QImage, the array backing it)
+        self._tiles = {}
+
+    def _load_source(self):
+        # NumPy is imported on the first redaction rather than at startup.
+        import numpy as np
+
+        self._source = self._pixmap.toImage().convertToFormat(QImage.Format.Format_RGB888)
+        rows = np.frombuffer(self._source.constBits(), dtype=np.uint8)
+        rows = rows.reshape(self.height, self._source.bytesPerLine())
+        self.rgb = rows[:, :self.width * 3].reshape(self.height, self.width, 3)
+
+    def _filter(self, kind, left, top, right, bottom):
+        from utils.filters import pixelate, box_blur
+
+        if kind == 'pixelate':
+            return pixelate(self.rgb[top:bottom, left:right], self.block_size)
+
+        # Each blur pass spreads by the radius, so this much context makes
+        # the tile's own pixels exact.
+        margin = self.blur_radius * BLUR_PASSES
+        outer_left, outer_top = max(0, left - margin), max(0, top - margin)
+        outer_right, outer_bottom = min(self.width, right + margin), min(self.height, bottom + margin)
+        blurred = box_blur(self.rgb[outer_top:outer_bottom, outer_left:outer_right], self.blur_radius, BLUR_PASSES)
+        return blurred[top - outer_top:bottom - outer_top, left - outer_left:right - outer_left]
+
+    def _tile(self, kind, column, row):
+        key = (kind, column, row)
+        tile = self._tiles.get(key)
+        if tile is None:
+            if self.rgb is None:
+                self._load_source()
+            left, top = column * self.tile_size, row * self.tile_size
+            right, bottom = min(self.width, left + self.tile_size), min(self.height, top + self.tile_size)
+            pixels = self._filter(kind, left, top, right, bottom).copy()
+            image = QImage(pixels.data, right - left, bottom - top, (right - left) * 3, QImage.Format.Format_RGB888)
+            tile = self._tiles[key] = (image, pixels)
+        return tile[0]
+
+    def draw(self, painter, kind, rect):
+        """Paints the filtered pixels under rect.
+
+        Args:
+            painter (QPainter): the target painter, in overlay coordinates;
+                it may be translated.
+            kind (str): "pixelate" or "blur".
+            rect (QRect): the area to redact, in overlay coordinates.
+        """
+        rect = self.mapping.to_physical_rect(rect).intersected(QRect(0, 0, self.width, self.height))
+        if rect.isEmpty():
+            return
+
+        ratio = self.mapping.ratio
+        size = self.tile_size
+        for row in range(rect.top() // size, rect.bottom() // size + 1):
+            for column in range(rect.left() // size, rect.right() // size + 1):
+                tile_rect = QRect(column * size, row * size, size, size)
+                part = rect.intersected(tile_rect)
+                tile = self._tile(kind, column, row)
+                # Same ratio as the capture, so this is a 1:1 copy on
+                # the overlay and on the exported image alike.
+                tile.setDevicePixelRatio(ratio)
+                painter.drawImage(
+                    QPointF(part.x() / ratio, part.y() / ratio), tile,
+                    QRectF(part.translated(-tile_rect.topLeft()))
+                )
@@ -0,0 +1,94 @@
+import math
+from PySide6.QtCore import QRect, QPoint, QPointF
+from PySide6.QtGui import QPainter, QColor, QPen, QImage
+
+
+def frame_to_image(frame):
+    """
+    Wraps a capture Frame's buffer in a QImage without copying the pixels.
+    The QImage is only valid while the frame is alive.
+    """
+    return QImage(frame.buffer, frame.width, frame.height, frame.stride, QImage.Format.Format_RGB888)
+
+
+# Shapes that replace the pixels under them instead of drawing an outline.
+REDACTION_TYPES = ('pixelate', 'blur')
+
+
+def shape_pen(conf):
+    return QPen(
+        QColor(conf['editing']['shape_border_color']),
+        conf['editing']['shape_border_width']
+    )
+
+
+def draw_shape(painter, shape, redactor=None):
+    """
+    Draws a single annotation with the painter's current pen. Used both for
+    the live preview and for the exported image so the two always match.
+    Redaction shapes are painted from redactor and skipped without one.
+    """
+    start = shape.start_pos
+    end = shape.end_pos
+    rect = QRect(start, end).normalized()
+
+    if shape.type in REDACTION_TYPES:
+        if redactor is not None:
+            redactor.draw(painter, shape.type, rect)
+    elif shape.type == 'rect':
+        painter.drawRect(rect)
+    elif shape.type == 'circle':
+        painter.drawEllipse(rect)
+    elif shape.type == 'arrow':
+        painter.drawLine(start, end)
+        angle = math.atan2(start.y() - end.y(), start.x() - end.x())
+        arrow_head_length = 15
+        arrow_head_angle = math.pi / 6
+        p1 = QPoint(
+            end.x() + arrow_head_length * math.cos(angle + arrow_head_angle),
+            end.y() + arrow_head_length * math.sin(angle + arrow_head_angle)
+        )
+        p2 = QPoint(
+            end.x() + arrow_head_length * math.cos(angle - arrow_head_angle),
+            end.y() + arrow_head_length * math.sin(angle - arrow_head_angle)
+        )
+        painter.drawLine(end, p1)
+        painter.drawLine(end, p2)
+
+
+def render_selection(background_pixmap, selection_rect, shapes, pen, redactor=None, mapping=None):
+    """Crops the selection out of the background and paints the annotations
+    straight onto the cropped pixels, at the capture's native resolution.
+
+    Args:
+        background_pixmap (QPixmap): the full monitor capture, with its
+            device pixel ratio set to mapping's ratio.
+        selection_rect (QRect): the area to export, in overlay coordinates.
+        shapes (Iterable[Shape]): the annotations, in overlay coordinates.
+        pen (QPen): the pen used to draw the annotations.
+        redactor (Redactor, optional): paints pixelate and blur shapes.
+        mapping (PixelMapping, optional): overlay to capture coordinates;
+            defaults to 1:1.
+
+    Returns:
+        QImage: the final, uncompressed image with a device pixel ratio of 1.
+    """
+    ratio = mapping.ratio if mapping is not None else 1.0
+    physical = mapping.to_physical_rect(selection_rect) if mapping is not None else selection_rect
+    image = background_pixmap.copy(physical).toImage()
+    image.setDevicePixelRatio(ratio)
+
+    if shapes:
+        # The image keeps the capture's device pixel ratio, so annotations
+        # are drawn in overlay coordinates but rasterized at full resolution.
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.translate(-QPointF(physical.x() / ratio, physical.y() / ratio))
+        painter.setPen(pen)
+        for shape in shapes:
+            draw_shape(painter, shape, redactor)
+        painter.end()
+
+    image.setDevicePixelRatio(1.0)
+    return image
+
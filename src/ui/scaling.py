@@ -0,0 +1,62 @@
+import math
+
+from PySide6.QtCore import QPoint, QPointF, QRect, QRectF
+
+
+class PixelMapping:
+    """
+    Converts between the overlay's logical coordinates (what Qt widgets,
+    mouse events and annotations use) and the physical pixels of the
+    capture (what grim produced).
+
+    Everything that crosses between the two spaces goes through here, so
+    HiDPI and fractional scaling are handled in one place.
+    """
+
+    def __init__(self, ratio=1.0):
+        self.ratio = ratio
+
+    @classmethod
+    def for_capture(cls, physical_width, logical_width):
+        """
+        Derives the ratio from the capture and overlay widths, which is
+        exact even where the compositor and Qt round the scale differently.
+        """
+        if physical_width <= 0 or logical_width <= 0:
+            return cls()
+        return cls(physical_width / logical_width)
+
+    def to_physical_point(self, point):
+        return QPoint(round(point.x() * self.ratio), round(point.y() * self.ratio))
+
+    def to_logical_point(self, point):
+        return QPoint(round(point.x() / self.ratio), round(point.y() / self.ratio))
+
+    def to_physical_rect(self, rect):
+        """
+        Returns the smallest physical rect covering a logical one, e.g. for
+        cropping the capture to a selection.
+        """
+        left = math.floor(rect.x() * self.ratio)
+        top = math.floor(rect.y() * self.ratio)
+        right = math.ceil((rect.x() + rect.width()) * self.ratio)
+        bottom = math.ceil((rect.y() + rect.height()) * self.ratio)
+        return QRect(left, top, right - left, bottom - top)
+
+    def to_physical_rectf(self, rect):
+        """
+        Returns the exact physical area of a logical rect, as the source
+        rect for a 1:1 blit from a pixmap whose device pixel ratio is set.
+        """
+        return QRectF(rect.x() * self.ratio, rect.y() * self.ratio, rect.width() * self.ratio, rect.height() * self.ratio)
+
+    def to_logical_rectf(self, rect):
+        return QRectF(rect.x() / self.ratio, rect.y() / self.ratio, rect.width() / self.ratio, rect.height() / self.ratio)
+
+    def blit(self, painter, logical_rect, pixmap):
+        """
+        Draws the part of a capture-sized pixmap (with this mapping's device
+        pixel ratio) under logical_rect, without rescaling when the painter's
+        device has the same ratio.
+        """
+        painter.drawPixmap(QPointF(logical_rect.topLeft()), pixmap, self.to_physical_rectf(logical_rect))
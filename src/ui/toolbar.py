@@ -12,6 +12,11 @@ class EditingToolbar(QWidget):
         layout.setContentsMargins(5, 5, 5, 5)
         layout.setSpacing(5)
 
+        self.select_button = QPushButton("Select")
+        self.select_button.setCheckable(True)
+        self.select_button.clicked.connect(lambda: self.parent_widget.set_active_tool('select'))
+        layout.addWidget(self.select_button)
+
         if self.conf.get('shape_rect', False):
             self.rect_button = QPushButton("Rectangle")
             self.rect_button.setCheckable(True) 
@@ -30,13 +35,33 @@ class EditingToolbar(QWidget):
             self.circle_button.clicked.connect(lambda: self.parent_widget.set_active_tool('draw_circle'))
             layout.addWidget(self.circle_button)
 
+        if self.conf.get('shape_pixelate', False):
+            self.pixelate_button = QPushButton("Pixelate")
+            self.pixelate_button.setCheckable(True)
+            self.pixelate_button.clicked.connect(lambda: self.parent_widget.set_active_tool('draw_pixelate'))
+            layout.addWidget(self.pixelate_button)
+
+        if self.conf.get('shape_blur', False):
+            self.blur_button = QPushButton("Blur")
+            self.blur_button.setCheckable(True)
+            self.blur_button.clicked.connect(lambda: self.parent_widget.set_active_tool('draw_blur'))
+            layout.addWidget(self.blur_button)
+
+        self.undo_button = QPushButton("Undo")
+        self.undo_button.clicked.connect(self.parent_widget.undo)
+        layout.addWidget(self.undo_button)
+
+        self.redo_button = QPushButton("Redo")
+        self.redo_button.clicked.connect(self.parent_widget.redo)
+        layout.addWidget(self.redo_button)
+
         layout.addStretch() 
         self.confirm_button = QPushButton("Confirm")
         self.confirm_button.clicked.connect(self.parent_widget.capture_and_exit)
         layout.addWidget(self.confirm_button)
 
         self.cancel_button = QPushButton("Cancel")
-        self.cancel_button.clicked.connect(self.parent_widget.close)
+        self.cancel_button.clicked.connect(self.parent_widget.cancel)
         layout.addWidget(self.cancel_button)
 
         self.setLayout(layout)
@@ -65,9 +90,12 @@ class EditingToolbar(QWidget):
     def uncheck_all_except(self, tool_name):
         """Ensures only one tool button is active at a time."""
         buttons = {
+            'select': self.select_button,
             'draw_rect': getattr(self, 'rect_button', None),
             'draw_arrow': getattr(self, 'arrow_button', None),
-            'draw_circle': getattr(self, 'circle_button', None)
+            'draw_circle': getattr(self, 'circle_button', None),
+            'draw_pixelate': getattr(self, 'pixelate_button', None),
+            'draw_blur': getattr(self, 'blur_button', None)
         }
         for name, button in buttons.items():
             if button and name != tool_name:
@@ -0,0 +1,48 @@
+from PySide6.QtCore import QRect
+
+from utils.spatial import SpatialGrid
+
+
+class WindowIndex:
+    """
+    Hit-testing for the windows visible at capture time, in overlay
+    coordinates.
+
+    Built once per capture; each window's key in the grid is its stacking
+    position, so the topmost window under a point is simply the largest
+    key returned by the grid.
+    """
+
+    def __init__(self, windows, origin_x=0, origin_y=0, focused=None, cell_size=128):
+        """
+        Args:
+            windows (list[tuple[int, int, int, int]]): global (x, y, w, h)
+                of each window, bottom to top, as from get_visible_windows().
+            origin_x, origin_y (int): the overlay's global top-left corner.
+            focused (int, optional): the index of the focused window.
+            cell_size (int): the grid cell size in pixels.
+        """
+        self.rects = [QRect(x - origin_x, y - origin_y, width, height) for x, y, width, height in windows]
+        self.focused = focused
+
+        self._grid = SpatialGrid(cell_size)
+        for z, rect in enumerate(self.rects):
+            if rect.isValid():
+                self._grid.insert(z, (rect.left(), rect.top(), rect.right(), rect.bottom()))
+
+    def __len__(self):
+        return len(self._grid)
+
+    def window_at(self, x, y):
+        """
+        Returns the rect of the topmost window containing (x, y), or None.
+        """
+        hits = self._grid.query_point(x, y)
+        if not hits:
+            return None
+        return QRect(self.rects[max(hits)])
+
+    def focused_rect(self):
+        if self.focused is None or self.focused not in self._grid:
+            return None
+        return QRect(self.rects[self.focused])
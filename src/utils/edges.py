@@ -0,0 +1,116 @@
+import numpy as np
+
+
+# Sentinel offset meaning "no edge within reach".
+NO_EDGE = np.iinfo(np.int8).max
+
+
+def _nearest_offsets(edges, distance):
+    """
+    For every pixel, returns the signed offset along axis 1 to the nearest
+    True pixel of edges within distance, or NO_EDGE. Ties go to the
+    smaller offset, and exact hits win.
+    """
+    offsets = np.full(edges.shape, NO_EDGE, dtype=np.int8)
+    width = edges.shape[1]
+    # Assign the farthest candidates first so nearer ones overwrite them.
+    for step in range(distance, 0, -1):
+        if step >= width:
+            continue
+        # An edge step pixels to the right of x...
+        offsets[:, :width - step][edges[:, step:]] = step
+        # ...and one step pixels to the left, preferred on ties.
+        offsets[:, step:][edges[:, :width - step]] = -step
+    offsets[edges] = 0
+    return offsets
+
+
+def _dilate(mask, distance, axis):
+    """
+    Returns mask with every True pixel spread up to distance pixels in
+    both directions along axis.
+    """
+    result = mask.copy()
+    length = mask.shape[axis]
+    for step in range(1, min(distance, length - 1) + 1):
+        ahead = [slice(None)] * 2
+        behind = [slice(None)] * 2
+        ahead[axis], behind[axis] = slice(step, None), slice(None, length - step)
+        result[tuple(behind)] |= mask[tuple(ahead)]
+        result[tuple(ahead)] |= mask[tuple(behind)]
+    return result
+
+
+class EdgeMap:
+    """
+    Where the strong edges of a capture are, precomputed so snapping a
+    point costs two table lookups.
+
+    x_offsets[y, x] is the signed horizontal distance from (x, y) to the
+    nearest vertical edge in row y, and y_offsets[x, y] the vertical
+    distance to the nearest horizontal edge in column x, both limited to
+    distance pixels. Offsets are int8, so the tables cost two bytes per
+    pixel in total.
+    """
+
+    def __init__(self, x_offsets, y_offsets):
+        self.x_offsets = x_offsets
+        self.y_offsets = y_offsets
+        self.height, self.width = x_offsets.shape
+
+    @classmethod
+    def from_frame(cls, frame, distance=8, threshold=40):
+        """Builds the edge map of a capture.
+
+        Args:
+            frame (Frame): an RGB888 capture.
+            distance (int): how far (in pixels) a point may snap, at most 126.
+            threshold (int): the minimum brightness step (0-255) between
+                neighbouring pixels that counts as an edge.
+
+        Returns:
+            EdgeMap: the edge map.
+        """
+        distance = min(distance, NO_EDGE - 1)
+        rows = np.frombuffer(frame.buffer, dtype=np.uint8).reshape(frame.height, frame.stride)
+        rgb = rows[:, :frame.width * 3].reshape(frame.height, frame.width, 3)
+
+        # Integer BT.601 luma; int16 so the differences below can't wrap.
+        luma = (
+            rgb[..., 0].astype(np.uint16) * 77 + rgb[..., 1].astype(np.uint16) * 150
+            + rgb[..., 2].astype(np.uint16) * 29
+        ) >> 8
+        luma = luma.astype(np.int16)
+
+        # A vertical edge sits between two horizontally adjacent pixels that
+        # differ strongly; it's attributed to the right-hand pixel, which is
+        # where a selection's left edge has to go to include it.
+        vertical = np.zeros(luma.shape, dtype=bool)
+        vertical[:, 1:] = np.abs(np.diff(luma, axis=1)) >= threshold
+        horizontal = np.zeros(luma.shape, dtype=bool)
+        horizontal[1:, :] = np.abs(np.diff(luma, axis=0)) >= threshold
+
+        # Let each edge reach distance pixels past its ends, so a point just
+        # outside a box's corner still snaps onto both of its sides.
+        vertical = _dilate(vertical, distance, axis=0)
+        horizontal = _dilate(horizontal, distance, axis=1)
+
+        x_offsets = _nearest_offsets(vertical, distance)
+        # Work on the transpose so both tables are scanned along rows.
+        y_offsets = _nearest_offsets(np.ascontiguousarray(horizontal.T), distance)
+        return cls(x_offsets, y_offsets)
+
+    def snap(self, x, y):
+        """
+        Returns (x, y) moved onto the nearest vertical and horizontal edges
+        within reach, each axis independently.
+        """
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return x, y
+        dx = int(self.x_offsets[y, x])
+        dy = int(self.y_offsets[x, y])
+        if dx != NO_EDGE:
+            x += dx
+        if dy != NO_EDGE:
+            y += dy
+        return x, y
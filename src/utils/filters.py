@@ -0,0 +1,70 @@
+import numpy as np
+
+
+def pixelate(rgb, block_size):
+    """Replaces every block_size x block_size block with its mean colour.
+
+    Blocks are aligned to the image's top-left corner, so a block looks
+    the same however the region covering it was drawn. Blocks along the
+    right and bottom edges may be smaller.
+
+    Args:
+        rgb (np.ndarray): an (height, width, 3) uint8 image.
+        block_size (int): the block edge length in pixels.
+
+    Returns:
+        np.ndarray: a new (height, width, 3) uint8 image.
+    """
+    height, width = rgb.shape[:2]
+    row_starts = np.arange(0, height, block_size)
+    column_starts = np.arange(0, width, block_size)
+    row_sizes = np.diff(np.append(row_starts, height))
+    column_sizes = np.diff(np.append(column_starts, width))
+
+    sums = np.add.reduceat(np.add.reduceat(rgb, row_starts, axis=0, dtype=np.uint32), column_starts, axis=1)
+    counts = (row_sizes[:, None] * column_sizes[None, :])[..., None]
+    means = ((sums + counts // 2) // counts).astype(np.uint8)
+
+    return np.repeat(np.repeat(means, row_sizes, axis=0), column_sizes, axis=1)
+
+
+def _box_blur_axis(values, radius, axis):
+    # A running sum over a window of 2 * radius + 1 pixels, with the edge
+    # pixels repeated so the borders don't darken.
+    pad = [(0, 0)] * values.ndim
+    pad[axis] = (radius + 1, radius)
+    padded = np.pad(values, pad, mode="edge")
+    sums = np.cumsum(padded, axis=axis, dtype=np.uint32)
+
+    size = values.shape[axis]
+    window = 2 * radius + 1
+    upper = [slice(None)] * values.ndim
+    lower = [slice(None)] * values.ndim
+    upper[axis] = slice(window, window + size)
+    lower[axis] = slice(0, size)
+    totals = sums[tuple(upper)] - sums[tuple(lower)]
+    totals += radius
+    totals //= window
+    return totals.astype(np.uint8)
+
+
+def box_blur(rgb, radius, passes=2):
+    """Blurs an image with repeated separable box filters.
+
+    Two passes already give a smooth, tent-shaped kernel; three are a close
+    approximation of a Gaussian. Integer arithmetic keeps the result
+    identical on every run.
+
+    Args:
+        rgb (np.ndarray): an (height, width, 3) uint8 image.
+        radius (int): the box radius in pixels.
+        passes (int): how many times to apply the box filter.
+
+    Returns:
+        np.ndarray: a new (height, width, 3) uint8 image.
+    """
+    result = rgb
+    for _ in range(passes):
+        result = _box_blur_axis(result, radius, axis=1)
+        result = _box_blur_axis(result, radius, axis=0)
+    return result
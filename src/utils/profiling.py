@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+from logging import getLogger
+
+
+logger = getLogger(__name__)
+
+
+class FrameStats:
+    """
+    Collects paint durations so repaint performance can be measured.
+    Enabled by setting SCREEN_SHORT_FRAME_STATS=1 in the environment.
+    """
+
+    def __init__(self, name="frames"):
+        self.name = name
+        self.enabled = os.environ.get("SCREEN_SHORT_FRAME_STATS", "") not in ("", "0")
+        self.durations = []
+
+    def start(self):
+        return time.perf_counter() if self.enabled else None
+
+    def stop(self, started):
+        if started is not None:
+            self.durations.append(time.perf_counter() - started)
+
+    def summary(self):
+        """
+        Returns a dict with the frame count and mean/p50/p95/max frame time
+        in milliseconds, or None if nothing was recorded.
+        """
+        if not self.durations:
+            return None
+
+        ordered = sorted(self.durations)
+        count = len(ordered)
+        return {
+            "frames": count,
+            "mean_ms": sum(ordered) / count * 1000,
+            "p50_ms": ordered[count // 2] * 1000,
+            "p95_ms": ordered[min(count - 1, int(count * 0.95))] * 1000,
+            "max_ms": ordered[-1] * 1000,
+        }
+
+    def report(self):
+        summary = self.summary()
+        if summary:
+            logger.info(
+                f"{self.name}: {summary['frames']} frames, mean {summary['mean_ms']:.2f} ms, "
+                f"p50 {summary['p50_ms']:.2f} ms, p95 {summary['p95_ms']:.2f} ms, "
+                f"max {summary['max_ms']:.2f} ms"
+            )
+        self.durations.clear()
+
+
+class StartupProfiler:
+    """
+    Records how long each startup phase took, for --profile-startup.
+    Marks are free when the profiler is disabled.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.phases = []
+        self._started = time.perf_counter()
+        self._last = self._started
+
+    def mark(self, phase):
+        """
+        Ends the current phase, naming it phase.
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def report(self, file=None):
+        if not self.enabled or not self.phases:
+            return
+
+        file = file or sys.stderr
+        width = max(len(phase) for phase, _ in self.phases)
+        print("startup profile:", file=file)
+        for phase, duration in self.phases:
+            print(f"  {phase:<{width}}  {duration * 1000:8.2f} ms", file=file)
+        print(f"  {'total':<{width}}  {(self._last - self._started) * 1000:8.2f} ms", file=file)
@@ -0,0 +1,82 @@
+from collections import defaultdict
+
+
+class SpatialGrid:
+    """
+    A uniform-grid spatial index over axis-aligned rectangles.
+
+    Rectangles are given as (left, top, right, bottom) tuples and bucketed
+    into every cell they overlap, so a point query only has to look at the
+    handful of items sharing its cell instead of every item.
+    """
+
+    def __init__(self, cell_size=128):
+        self.cell_size = cell_size
+        self._cells = defaultdict(list)
+        self._items = {}
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def _cell_range(self, bounds):
+        left, top, right, bottom = bounds
+        size = self.cell_size
+        return range(left // size, right // size + 1), range(top // size, bottom // size + 1)
+
+    def insert(self, key, bounds):
+        if key in self._items:
+            self.remove(key)
+
+        self._items[key] = bounds
+        columns, rows = self._cell_range(bounds)
+        for cx in columns:
+            for cy in rows:
+                self._cells[(cx, cy)].append(key)
+
+    def remove(self, key):
+        bounds = self._items.pop(key, None)
+        if bounds is None:
+            return
+
+        columns, rows = self._cell_range(bounds)
+        for cx in columns:
+            for cy in rows:
+                bucket = self._cells[(cx, cy)]
+                bucket.remove(key)
+                if not bucket:
+                    del self._cells[(cx, cy)]
+
+    def clear(self):
+        self._cells.clear()
+        self._items.clear()
+
+    def query_point(self, x, y):
+        """
+        Returns the keys whose rectangles contain (x, y), in insertion order
+        of the cell they share.
+        """
+        bucket = self._cells.get((x // self.cell_size, y // self.cell_size), ())
+        result = []
+        for key in bucket:
+            left, top, right, bottom = self._items[key]
+            if left <= x <= right and top <= y <= bottom:
+                result.append(key)
+        return result
+
+    def query_rect(self, bounds):
+        """
+        Returns the set of keys whose rectangles intersect bounds.
+        """
+        left, top, right, bottom = bounds
+        columns, rows = self._cell_range(bounds)
+        result = set()
+        for cx in columns:
+            for cy in rows:
+                for key in self._cells.get((cx, cy), ()):
+                    item_left, item_top, item_right, item_bottom = self._items[key]
+                    if item_left <= right and left <= item_right and item_top <= bottom and top <= item_bottom:
+                        result.add(key)
+        return result
@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from logging import getLogger
+
+
+logger = getLogger(__name__)
+
+# Until the config decides, spans are kept (so the stages that run before
+# it is parsed aren't lost), but only this many.
+MAX_PENDING_EVENTS = 256
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "started")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer._add(self.name, self.started, time.perf_counter_ns(), self.args)
+        return False
+
+
+class Tracer:
+    """
+    Records how long each stage of a capture took, as spans.
+
+    Enabled by [tracing] enabled in the config or SCREEN_SHORT_TRACE=1 in
+    the environment, which also covers the stages before the config is
+    parsed. When disabled, span() returns a shared no-op context manager
+    and start() returns None, so instrumented code pays next to nothing.
+
+    flush() writes the spans recorded so far as a Chrome trace (open it in
+    chrome://tracing or Perfetto) and adds their durations to a rolling
+    per-stage sample file, from which timing_summary() reports p50/p95
+    across runs.
+    """
+
+    def __init__(self):
+        env = os.environ.get("SCREEN_SHORT_TRACE")
+        # None means "not decided yet": record, but don't write anything.
+        self.enabled = None if env is None else env not in ("", "0")
+        self.histogram_samples = 1000
+        self.keep_traces = 20
+        self._events = []
+        self._thread_names = {}
+        self._lock = threading.Lock()
+
+    def configure(self, conf):
+        """
+        Applies the [tracing] config section. The environment variable,
+        if set, takes precedence.
+        """
+        tracing_conf = conf.get('tracing', {})
+        self.histogram_samples = tracing_conf.get('histogram_samples', self.histogram_samples)
+        self.keep_traces = tracing_conf.get('keep_traces', self.keep_traces)
+        if self.enabled is None:
+            self.enabled = bool(tracing_conf.get('enabled', False))
+        if not self.enabled:
+            with self._lock:
+                self._events.clear()
+
+    def span(self, name, **args):
+        """
+        Returns a context manager timing its block as a span called name,
+        with args attached to the trace event.
+        """
+        if self.enabled is False:
+            return NULL_SPAN
+        return _Span(self, name, args)
+
+    def start(self, name):
+        """
+        Starts a span where a with-block doesn't fit; pass the result to
+        stop().
+        """
+        if self.enabled is False:
+            return None
+        return name, time.perf_counter_ns()
+
+    def stop(self, token, **args):
+        if token is not None:
+            self._add(token[0], token[1], time.perf_counter_ns(), args)
+
+    def _add(self, name, started, ended, args):
+        thread = threading.current_thread()
+        with self._lock:
+            if self.enabled is None and len(self._events) >= MAX_PENDING_EVENTS:
+                return
+            self._events.append((name, started, ended, thread.ident, args))
+            self._thread_names[thread.ident] = thread.name
+
+    def flush(self):
+        """
+        Writes the spans recorded since the last flush as one trace file
+        and adds them to the sample file. Does nothing when disabled or
+        if nothing was recorded.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            events, self._events = self._events, []
+            thread_names = dict(self._thread_names)
+        if not events:
+            return
+
+        from storage.history import get_cache_dir
+
+        cache_dir = get_cache_dir()
+        try:
+            path = self._write_trace(cache_dir / "traces", events, thread_names)
+            self._update_samples(cache_dir / "timings.json", events)
+        except OSError as e:
+            logger.warning(f"Could not write the trace: {e}")
+            return
+        logger.info(f"Trace written to: {path}")
+
+    def _write_trace(self, trace_dir, events, thread_names):
+        trace_dir.mkdir(parents=True, exist_ok=True)
+        pid = os.getpid()
+        trace_events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in thread_names.items()
+        ]
+        for name, started, ended, tid, args in events:
+            trace_events.append({
+                "name": name, "cat": "screen-short", "ph": "X", "pid": pid, "tid": tid,
+                "ts": started / 1000, "dur": (ended - started) / 1000, "args": args,
+            })
+
+        path = trace_dir / f"trace-{datetime.now().strftime('%Y-%m-%d_%H-%M-%S-%f')}-{pid}.json"
+        _write_json(path, {"traceEvents": trace_events, "displayTimeUnit": "ms"})
+
+        # Keep only the newest traces.
+        traces = sorted(trace_dir.glob("trace-*.json"), key=lambda trace: trace.stat().st_mtime)
+        for old in traces[:-max(1, self.keep_traces)]:
+            old.unlink(missing_ok=True)
+        return path
+
+    def _update_samples(self, path, events):
+        import fcntl
+
+        # Several processes (the daemon, one-shot runs) may flush at once.
+        with open(path.with_name(f"{path.name}.lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            samples = load_samples(path)
+            for name, started, ended, _, _ in events:
+                stage = samples.setdefault(name, [])
+                stage.append(round((ended - started) / 1e6, 3))
+                del stage[:-self.histogram_samples]
+            _write_json(path, samples)
+
+
+def _write_json(path, data):
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def load_samples(path=None):
+    """
+    Returns the recorded durations in milliseconds by stage, oldest first.
+    """
+    if path is None:
+        from storage.history import get_cache_dir
+        path = get_cache_dir() / "timings.json"
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def timing_summary(samples):
+    """
+    Returns {stage: {"count", "p50_ms", "p95_ms", "max_ms"}} for the
+    per-stage durations returned by load_samples().
+    """
+    summary = {}
+    for stage, durations in samples.items():
+        if not durations:
+            continue
+        ordered = sorted(durations)
+        count = len(ordered)
+        summary[stage] = {
+            "count": count,
+            "p50_ms": ordered[count // 2],
+            "p95_ms": ordered[min(count - 1, int(count * 0.95))],
+            "max_ms": ordered[-1],
+        }
+    return summary
+
+
+tracer = Tracer()
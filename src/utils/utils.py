@@ -3,20 +3,40 @@ import json
 import subprocess
 from logging import getLogger
 
+from ipc.hyprland import get_client, HyprlandIPCError
+from utils.tracing import tracer
+
 
 logger = getLogger(__name__)
 
 
+def hyprland_query(*commands):
+    """
+    Runs one or more hyprctl JSON queries (e.g. "monitors", "clients") and
+    returns their parsed replies in order.
+
+    Talks to Hyprland's socket directly, in a single batched round-trip, and
+    only falls back to forking hyprctl when the socket is unavailable.
+    """
+    with tracer.span("hyprland query", commands=",".join(commands)):
+        try:
+            return get_client().query(*commands)
+        except HyprlandIPCError as e:
+            logger.warning(f"Hyprland IPC unavailable ({e}), falling back to hyprctl.")
+
+        replies = []
+        for command in commands:
+            result = subprocess.run(['hyprctl', command, '-j'], capture_output=True, text=True, check=True)
+            replies.append(json.loads(result.stdout))
+        return replies
+
+
 def get_active_monitor_name():
     """
-    Gets the name of the monitor with the active window using hyprctl.
+    Gets the name of the monitor with the active window from Hyprland.
     """
     try:
-        result = subprocess.run(
-            ['hyprctl', 'activeworkspace', '-j'], 
-            capture_output=True, text=True, check=True
-        )
-        active_window_info = json.loads(result.stdout)
+        active_window_info, = hyprland_query('activeworkspace')
         return active_window_info.get('monitor')
     except (subprocess.CalledProcessError, FileNotFoundError, json.JSONDecodeError) as e:
         logger.error(f"Could not determine active monitor: {e}. Falling back.")
@@ -27,28 +47,79 @@ def get_active_monitor_name():
 
 def get_monitor_data():
     """
-    Retrieves monitor data from hyprctl in JSON format and parses it.
-    Returns a dictionary mapping monitor names to their geometry.
+    Retrieves monitor data from Hyprland in JSON format and parses it.
+
+    Returns:
+        dict[str, tuple[int, int, int, int, float]] | None: (x, y, w, h,
+        scale) per monitor name. The position and size are in logical
+        layout coordinates; the monitor's pixels are those times scale.
     """
     try:
-        result = subprocess.run(['hyprctl', 'monitors', '-j'], capture_output=True, text=True, check=True)
-        monitors_raw = json.loads(result.stdout)
-        
+        monitors_raw, = hyprland_query('monitors')
+
         monitors = {}
         for monitor in monitors_raw:
-            name = monitor['name']
-            width = monitor['width']
-            height = monitor['height']
-            x = monitor['x']
-            y = monitor['y']
-            monitors[name] = (x, y, width, height)
-            
+            scale = monitor.get('scale', 1.0) or 1.0
+            # width and height are the mode's pixels, before rotation.
+            width, height = monitor['width'], monitor['height']
+            if monitor.get('transform', 0) % 2:
+                width, height = height, width
+            monitors[monitor['name']] = (
+                monitor['x'], monitor['y'], round(width / scale), round(height / scale), scale
+            )
+
         return monitors
     except (subprocess.CalledProcessError, FileNotFoundError, json.JSONDecodeError) as e:
         logger.error(f"Failed to get monitor data: {e}")
         return None
 
 
+def get_visible_windows():
+    """
+    Lists the windows currently visible on any monitor, with their global
+    geometry, in one batched query.
+
+    Returns:
+        tuple[list[tuple[int, int, int, int]], int | None]: the (x, y, w, h)
+        of every visible window ordered bottom to top, and the index of the
+        focused window in that list (or None).
+    """
+    try:
+        clients, monitors = hyprland_query('clients', 'monitors')
+    except (subprocess.CalledProcessError, FileNotFoundError, json.JSONDecodeError) as e:
+        logger.error(f"Failed to list windows: {e}")
+        return [], None
+
+    visible_workspaces = set()
+    for monitor in monitors:
+        for key in ('activeWorkspace', 'specialWorkspace'):
+            workspace_id = monitor.get(key, {}).get('id')
+            if workspace_id:
+                visible_workspaces.add(workspace_id)
+
+    visible = [
+        client for client in clients
+        if client.get('mapped', True) and not client.get('hidden', False)
+        and (client.get('pinned') or client.get('workspace', {}).get('id') in visible_workspaces)
+    ]
+
+    # Hyprland doesn't report stacking order; fullscreen windows are on top,
+    # then floating ones, then tiled ones, each ordered by focus recency.
+    visible.sort(key=lambda client: (
+        bool(client.get('fullscreen')),
+        bool(client.get('floating') or client.get('pinned')),
+        -client.get('focusHistoryID', 0),
+    ))
+
+    windows, focused = [], None
+    for client in visible:
+        (x, y), (width, height) = client['at'], client['size']
+        if client.get('focusHistoryID') == 0:
+            focused = len(windows)
+        windows.append((x, y, width, height))
+    return windows, focused
+
+
 def parse_slurp_output(stdout: str) -> tuple[int, int, int, int]:
     """Parses slurp geometry stdout and returns a Tuple with four integers: (x, y, h, w)
 